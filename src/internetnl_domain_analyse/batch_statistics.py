@@ -0,0 +1,557 @@
+"""
+Berekening van de gewogen gemiddeldes en sommen van alle numerieke variabelen van een
+breakdown in een keer.
+
+WeightedSampleStatistics berekent per variabele een groupby met een hele reeks
+tussenresultaten. Voor variabelen zonder filter en zonder opties (geen dict) komt het
+resultaat neer op
+
+    gemiddelde = sum_g(w * x) / sum_g(w)    (maal 100 voor bool)
+    som        = sum_g(w * x)               (voor variabelen met een report_number)
+
+waarbij w de schaalfactor ratio_<gewicht> is en een ontbrekende x als 0 meetelt. Dit
+kunnen we voor alle variabelen tegelijk uitrekenen met de groep codes en een
+np.bincount.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+
+def get_group_codes(dataframe: pd.DataFrame, group_by: list):
+    """
+    Bepaal per record het nummer van zijn groep
+
+    Args:
+        dataframe: pd.DataFrame
+            De data met de breakdown variabelen in de index
+        group_by: list
+            De namen van de breakdown variabelen
+
+    Returns:
+        np.ndarray, pd.Index: de groep code per record (-1 als een van de groep waardes
+        ontbreekt) en de index van de groepen in dezelfde volgorde als een groupby
+    """
+    # de index van de groepen is gelijk aan die van een groupby sum. Bij categorische
+    # variabelen bevat die ook de categorieën die niet in de data voorkomen
+    group_index = dataframe.groupby(group_by, observed=False).size().index
+
+    if len(group_by) == 1:
+        record_keys = dataframe.index.get_level_values(group_by[0])
+    else:
+        record_keys = pd.MultiIndex.from_arrays(
+            [dataframe.index.get_level_values(name) for name in group_by]
+        )
+    # records met een ontbrekende groep waarde komen niet in de index voor en krijgen -1
+    codes = group_index.get_indexer(record_keys).astype(np.int64)
+    return codes, group_index
+
+
+def factorize_values(values: pd.Index):
+    """
+    Geef de waardes van een breakdown kolom een integer code. Een ontbrekende waarde
+    krijgt hier een eigen code, de groupby laat die later weg
+
+    Returns:
+        pd.Index, np.ndarray, int: de waardes, de code per record en het aantal codes
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return values, codes.astype(np.int64), len(uniques)
+
+
+def combine_column_codes(column_codes: list):
+    """
+    Combineer de codes van een aantal breakdown kolommen tot een code per cel
+
+    Args:
+        column_codes: list
+            Per kolom het resultaat van factorize_values
+
+    Returns:
+        np.ndarray, np.ndarray: de cel per record en per cel het eerste record
+    """
+    cell_per_record = np.zeros(column_codes[0][1].size, dtype=np.int64)
+    for _, codes, n_codes in column_codes:
+        cell_per_record, _ = pd.factorize(cell_per_record * n_codes + codes, sort=True)
+    _, first_record = np.unique(cell_per_record, return_index=True)
+    return cell_per_record, first_record
+
+
+def get_cell_keys(column_codes: list, names: list, first_record: np.ndarray):
+    """De waardes van de breakdown kolommen per cel, met hun oorspronkelijke type"""
+    return pd.DataFrame(
+        {
+            name: values.take(first_record)
+            for name, (values, _, _) in zip(names, column_codes)
+        }
+    )
+
+
+def get_group_codes_from_columns(column_codes: list, group_by: list):
+    """
+    Bepaal de groep code per record uit de al gefactoriseerde breakdown kolommen. De
+    groupby hoeft dan alleen over de combinaties die voorkomen, niet over alle records
+
+    Args:
+        column_codes: list
+            Per group_by kolom het resultaat van factorize_values
+        group_by: list
+            De namen van de breakdown variabelen
+
+    Returns:
+        np.ndarray, pd.Index: net als get_group_codes
+    """
+    cell_per_record, first_record = combine_column_codes(column_codes)
+    cell_keys = get_cell_keys(column_codes, group_by, first_record).set_index(group_by)
+    cell_codes, group_index = get_group_codes(cell_keys, group_by)
+    return cell_codes[cell_per_record], group_index
+
+
+def group_sums(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Tel de rijen van values per groep op
+
+    Args:
+        codes: np.ndarray
+            De groep code per rij. Rijen met code -1 tellen niet mee
+        values: np.ndarray
+            Matrix met een kolom per variabele
+        n_groups: int
+            Het aantal groepen
+
+    Returns:
+        np.ndarray: matrix met de sommen (groepen x variabelen)
+    """
+    valid = codes >= 0
+    valid_codes = codes[valid]
+    sums = np.zeros((n_groups, values.shape[1]))
+    # een bincount per kolom, zodat we geen codes per (rij, kolom) cel nodig hebben
+    for column_number in range(values.shape[1]):
+        sums[:, column_number] = np.bincount(
+            valid_codes, weights=values[valid, column_number], minlength=n_groups
+        )
+    return sums
+
+
+def weighted_group_sums(codes: np.ndarray, columns, weights: np.ndarray, n_groups: int):
+    """
+    Bereken per groep de gewogen som van alle kolommen en de som van de gewichten. De
+    kolommen worden een voor een opgeteld, zodat er naast de data alleen tijdelijke
+    arrays ter grootte van een kolom nodig zijn
+
+    Args:
+        codes: np.ndarray
+            De groep code per record. Records met code -1 tellen niet mee
+        columns: iterable
+            Per variabele een array met de waarde per record, bijvoorbeeld van
+            get_columns
+        weights: np.ndarray
+            Het gewicht per record
+        n_groups: int
+            Het aantal groepen
+
+    Returns:
+        np.ndarray, np.ndarray: matrix met de gewogen sommen (groepen x variabelen) en
+        de som van de gewichten per groep
+    """
+    valid = codes >= 0
+    valid_codes = codes[valid]
+    weights = np.where(np.isnan(weights), 0, weights)[valid]
+
+    column_sums = list()
+    for values in columns:
+        # net als in een groupby sum tellen ontbrekende waardes als 0
+        weighted_values = values[valid] * weights
+        weighted_values[np.isnan(weighted_values)] = 0
+        column_sums.append(
+            np.bincount(valid_codes, weights=weighted_values, minlength=n_groups)
+        )
+
+    sums = np.zeros((n_groups, len(column_sums)))
+    for column_number, column_sum in enumerate(column_sums):
+        sums[:, column_number] = column_sum
+    weight_sums = np.bincount(valid_codes, weights=weights, minlength=n_groups)
+    return sums, weight_sums
+
+
+def get_columns(dataframe: pd.DataFrame, var_keys: list):
+    """Geef de kolommen een voor een als float array, zonder een matrix te maken"""
+    for var_key in var_keys:
+        yield dataframe[var_key].to_numpy(dtype=float)
+
+
+def get_variables_per_weight(batch_variables: dict) -> dict:
+    """De variabelen met hetzelfde gewicht gaan samen in een matrix"""
+    variables_per_weight = dict()
+    for var_key, var_info in batch_variables.items():
+        weight_info = (var_info["weight_key"], var_info["unit_weights"])
+        variables_per_weight.setdefault(weight_info, list()).append(var_key)
+    return variables_per_weight
+
+
+def get_weights(dataframe: pd.DataFrame, weight_key: str, unit_weights: bool):
+    """Het gewicht per record. Een variabele die zelf een gewicht is krijgt gewicht 1"""
+    if unit_weights:
+        return np.ones(len(dataframe.index))
+    return dataframe[weight_key].to_numpy(dtype=float)
+
+
+def statistics_from_sums(
+    var_keys: list,
+    batch_variables: dict,
+    sums: np.ndarray,
+    weight_sums: np.ndarray,
+    group_index: pd.Index,
+) -> dict:
+    """
+    Maak van de gewogen sommen per groep de gemiddeldes of sommen per variabele
+
+    Returns:
+        dict: per variabele een DataFrame met een kolom en de groepen als index
+    """
+    # een groep met gewicht 0 geeft in WeightedSampleStatistics een gemiddelde 0
+    means = np.divide(
+        sums,
+        weight_sums[:, np.newaxis],
+        out=np.zeros_like(sums),
+        where=weight_sums[:, np.newaxis] != 0,
+    )
+
+    all_stats = dict()
+    for index, var_key in enumerate(var_keys):
+        var_info = batch_variables[var_key]
+        if var_info["report_number"]:
+            result = sums[:, index]
+        elif var_info["percentage"]:
+            result = 100 * means[:, index]
+        else:
+            result = means[:, index]
+        all_stats[var_key] = pd.DataFrame({var_key: result}, index=group_index.copy())
+    return all_stats
+
+
+def calculate_batch_statistics(
+    dataframe: pd.DataFrame, group_by: list, batch_variables: dict, group_codes=None
+) -> dict:
+    """
+    Bereken de statistieken van een breakdown voor een groep variabelen in een keer
+
+    Args:
+        dataframe: pd.DataFrame
+            De data met de breakdown variabelen en de be_id in de index
+        group_by: list
+            De namen van de breakdown variabelen
+        batch_variables: dict
+            Per variabele een dict met
+                weight_key: de kolom met de schaalfactor (ratio_<gewicht>)
+                unit_weights: True als de variabele zelf een gewicht is (gewicht 1)
+                report_number: True als we de som in plaats van het gemiddelde willen
+                percentage: True als het gemiddelde maal 100 moet (bool variabelen)
+        group_codes: tuple
+            De groep codes en groep index als die al bekend zijn (zie get_group_codes)
+
+    Returns:
+        dict: per variabele een DataFrame met een kolom en de groepen als index, gelijk
+        aan het resultaat van WeightedSampleStatistics
+    """
+    if group_codes is None:
+        group_codes = get_group_codes(dataframe, group_by)
+    codes, group_index = group_codes
+
+    all_stats = dict()
+    variables_per_weight = get_variables_per_weight(batch_variables)
+    for (weight_key, unit_weights), var_keys in variables_per_weight.items():
+        _logger.debug(f"Batch of {len(var_keys)} variables weighted with {weight_key}")
+        sums, weight_sums = weighted_group_sums(
+            codes=codes,
+            columns=get_columns(dataframe, var_keys),
+            weights=get_weights(dataframe, weight_key, unit_weights),
+            n_groups=group_index.size,
+        )
+        all_stats.update(
+            statistics_from_sums(
+                var_keys, batch_variables, sums, weight_sums, group_index
+            )
+        )
+
+    return all_stats
+
+
+class StatisticsCube:
+    """
+    De gewogen sommen van alle batch variabelen per cel van de fijnste indeling van alle
+    breakdown variabelen. Een breakdown die een vergroving van deze indeling is,
+    berekenen we door de cellen op te tellen in plaats van alle records te doorlopen.
+
+    Args:
+        dataframe: pd.DataFrame
+            De data met alle breakdown variabelen en de be_id in de index
+        group_columns: list
+            De breakdown variabelen die samen de cellen van de kubus vormen
+        batch_variables: dict
+            De variabelen zoals voor calculate_batch_statistics
+        column_codes: list
+            Per group kolom het resultaat van factorize_values, als die al bekend is
+    """
+
+    def __init__(
+        self,
+        dataframe: pd.DataFrame,
+        group_columns: list,
+        batch_variables: dict,
+        column_codes: list = None,
+    ):
+        self.group_columns = list(group_columns)
+        self.batch_variables = batch_variables
+
+        # een ontbrekende waarde is hier een gewone cel, die een breakdown later weglaat
+        if column_codes is None:
+            column_codes = [
+                factorize_values(dataframe.index.get_level_values(name))
+                for name in self.group_columns
+            ]
+        cell_per_record, first_record = combine_column_codes(column_codes)
+        self.n_cells = first_record.size
+
+        # de waardes van de breakdown variabelen per cel, met hun oorspronkelijke type
+        self.cell_keys = get_cell_keys(column_codes, self.group_columns, first_record)
+
+        self.sums_per_weight = dict()
+        variables_per_weight = get_variables_per_weight(batch_variables)
+        for (weight_key, unit_weights), var_keys in variables_per_weight.items():
+            sums, weight_sums = weighted_group_sums(
+                codes=cell_per_record,
+                columns=get_columns(dataframe, var_keys),
+                weights=get_weights(dataframe, weight_key, unit_weights),
+                n_groups=self.n_cells,
+            )
+            self.sums_per_weight[(weight_key, unit_weights)] = (
+                var_keys,
+                sums,
+                weight_sums,
+            )
+        _logger.info(
+            f"Statistics cube of {len(batch_variables)} variables "
+            f"in {self.n_cells} cells of {self.group_columns}"
+        )
+
+    def covers(self, group_by: list, var_keys) -> bool:
+        """Geef aan of we de breakdown voor deze variabelen uit de kubus kunnen halen"""
+        return set(group_by).issubset(self.group_columns) and set(var_keys).issubset(
+            self.batch_variables
+        )
+
+    def roll_up(self, group_by: list, var_keys) -> dict:
+        """
+        Bereken de breakdown door de cellen van de kubus per groep op te tellen
+
+        Returns:
+            dict: per variabele een DataFrame, net als calculate_batch_statistics
+        """
+        cell_keys = self.cell_keys.set_index(group_by)
+        codes, group_index = get_group_codes(cell_keys, group_by)
+        var_keys = set(var_keys)
+
+        all_stats = dict()
+        for weight_info, (cube_keys, sums, weight_sums) in self.sums_per_weight.items():
+            selection = [
+                i for i, var_key in enumerate(cube_keys) if var_key in var_keys
+            ]
+            if not selection:
+                continue
+            group_values = group_sums(
+                codes,
+                np.column_stack([sums[:, selection], weight_sums]),
+                group_index.size,
+            )
+            all_stats.update(
+                statistics_from_sums(
+                    [cube_keys[i] for i in selection],
+                    self.batch_variables,
+                    group_values[:, :-1],
+                    group_values[:, -1],
+                    group_index,
+                )
+            )
+        return all_stats
+
+
+def get_histogram_bins(values: np.ndarray, bin_edges: np.ndarray) -> np.ndarray:
+    """
+    Bepaal de bin van iedere waarde op dezelfde manier als np.histogram met gelijke
+    bins: de laatste bin bevat ook de rechter rand.
+
+    Args:
+        values: np.ndarray
+            De waardes (als float)
+        bin_edges: np.ndarray
+            De randen van de bins, gelijk verdeeld
+
+    Returns:
+        np.ndarray: de bin per waarde, -1 voor ontbrekende waardes en buiten de range
+    """
+    first_edge, last_edge = bin_edges[0], bin_edges[-1]
+    n_bins = bin_edges.size - 1
+
+    bins = np.full(values.shape, -1, dtype=np.intp)
+    keep = (values >= first_edge) & (values <= last_edge)
+    kept_values = values[keep]
+
+    indices = ((kept_values - first_edge) / (last_edge - first_edge) * n_bins).astype(
+        np.intp
+    )
+    indices[indices == n_bins] -= 1
+    # de berekende index kan op de rand van een bin een plek verkeerd zitten
+    decrement = kept_values < bin_edges[indices]
+    indices[decrement] -= 1
+    increment = (kept_values >= bin_edges[indices + 1]) & (indices != n_bins - 1)
+    indices[increment] += 1
+
+    bins[keep] = indices
+    return bins
+
+
+def calculate_histograms(
+    data: pd.DataFrame,
+    weights: np.ndarray,
+    n_bins: int = 100,
+    value_range=(0, 100),
+    group_codes=None,
+) -> dict:
+    """
+    Bereken de gewogen histogrammen van alle kolommen van data voor alle groepen van het
+    eerste index level. De bin van iedere waarde wordt bepaald met get_histogram_bins,
+    daarna geeft een np.bincount over (groep, bin) de histogrammen van alle groepen van
+    een kolom in een keer. We gaan kolom voor kolom, zodat er alleen tijdelijke arrays
+    ter grootte van een kolom nodig zijn.
+
+    Args:
+        data: pd.DataFrame
+            De data met de breakdown op de index
+        weights: np.ndarray
+            Het gewicht per record (de ratio_units)
+        n_bins: int
+            Aantal bins
+        value_range: tuple
+            De onder- en bovengrens van de bins
+        group_codes: tuple
+            De al bekende codes en index van de groepen van het eerste index level
+
+    Returns:
+        dict: per kolom een dict met per groep het histogram (counts, bin_edges) zoals
+        np.histogram die geeft. Groepen zonder records en kolommen die niet numeriek
+        zijn krijgen None
+    """
+    if group_codes is None:
+        group_codes = get_group_codes(data, data.index.names[:1])
+    codes, group_index = group_codes
+    n_groups = group_index.size
+    bin_edges = np.linspace(value_range[0], value_range[1], n_bins + 1)
+
+    valid_group = codes >= 0
+    # een groep zonder records heeft geen histogram, net als in een groupby
+    has_records = np.bincount(codes[valid_group], minlength=n_groups) > 0
+
+    histograms_per_column = dict()
+    for column in data.columns:
+        histogram_per_group = dict.fromkeys(group_index)
+        histograms_per_column[column] = histogram_per_group
+        try:
+            values = data[column].to_numpy(dtype=float)
+        except (TypeError, ValueError):
+            _logger.debug(f"Cannot make a histogram of {column}. Skip for now")
+            continue
+
+        bins = get_histogram_bins(values, bin_edges)
+        valid = (bins >= 0) & valid_group
+        column_histograms = (
+            np.bincount(
+                codes[valid] * n_bins + bins[valid],
+                weights=weights[valid],
+                minlength=n_groups * n_bins,
+            )
+            .reshape(n_groups, n_bins)
+            .astype(weights.dtype, copy=False)
+        )
+        for group_code, grp_key in enumerate(group_index):
+            if has_records[group_code]:
+                histogram_per_group[grp_key] = (
+                    column_histograms[group_code],
+                    bin_edges,
+                )
+    return histograms_per_column
+
+
+def calculate_correlations(data: pd.DataFrame, weights: np.ndarray = None):
+    """
+    Bereken de Pearson correlaties tussen alle kolommen in een keer uit het product
+    X^T W X. Iedere kolom wordt bij het vullen van de matrix gecentreerd op zijn gewogen
+    gemiddelde en met de wortel van het gewicht vermenigvuldigd, zodat het product van
+    de matrix met zichzelf direct de gewogen covariantie geeft. Door het centreren is er
+    geen verlies van precisie bij het aftrekken, zodat de matrix float32 kan zijn.
+
+    Args:
+        data: pd.DataFrame
+            De data zonder ontbrekende waardes, zoals de bool matrix van de verdicts
+        weights: np.ndarray
+            Optioneel het gewicht (>= 0) per record. Een ontbrekend gewicht telt als 0
+
+    Returns:
+        pd.DataFrame: de correlatie matrix, zonder gewichten gelijk aan data.corr() op
+        de float32 precisie na. Een kolom zonder variatie geeft NaN, net als alle
+        kolommen als er geen records met een gewicht zijn
+    """
+    n_records = len(data.index)
+    n_columns = len(data.columns)
+    if weights is None:
+        weights = np.ones(n_records)
+    else:
+        weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+    total = weights.sum()
+    root_weights = np.sqrt(weights)
+    has_weight = weights > 0
+
+    matrix = np.empty((n_records, n_columns), dtype=np.float32)
+    # met gewichten geeft afronding bij een constante kolom geen exacte 0 als variantie
+    no_variation = np.ones(n_columns, dtype=bool)
+    for column_number, column in enumerate(data.columns):
+        values = data[column].to_numpy(dtype=np.float64)
+        if has_weight.any():
+            weighted_values = values[has_weight]
+            no_variation[column_number] = weighted_values.min() == weighted_values.max()
+            values -= (weights @ values) / total
+        matrix[:, column_number] = values * root_weights
+
+    # de gecentreerde producten zijn de covariantie, de sommen per kolom zijn dan 0
+    covariance = (matrix.T @ matrix).astype(np.float64)
+
+    return correlations_from_products(
+        covariance, np.zeros(n_columns), 1.0, no_variation, columns=data.columns
+    )
+
+
+def correlations_from_products(
+    products: np.ndarray,
+    sums: np.ndarray,
+    total: float,
+    no_variation: np.ndarray,
+    columns,
+) -> pd.DataFrame:
+    """
+    Bereken de correlatie matrix uit de (gewogen) sommen van de producten X^T W X, de
+    sommen per kolom en de som van de gewichten. Kolommen zonder variatie krijgen NaN
+    """
+    # de covariantie maal total^2, de factor valt weg in de correlatie
+    covariance = products * total - np.outer(sums, sums)
+    variance = np.diag(covariance)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlations = covariance / np.sqrt(np.outer(variance, variance))
+    no_variation = no_variation | (variance <= 0)
+    correlations[no_variation, :] = np.nan
+    correlations[:, no_variation] = np.nan
+
+    return pd.DataFrame(correlations, index=columns, columns=columns)
@@ -0,0 +1,373 @@
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as pa_feather
+    import pyarrow.parquet as pa_parquet
+except ImportError:
+    pa = None
+    pa_feather = None
+    pa_parquet = None
+
+_logger = logging.getLogger(__name__)
+
+# de cache formaten die we ondersteunen met de bijbehorende extensie
+CACHE_FORMATS = {"pickle": ".pkl", "parquet": ".parquet", "feather": ".feather"}
+
+FINGERPRINT_SUFFIX = ".fingerprint"
+
+CLEAN_URL_TABLE = "clean_urls"
+
+# de naam waaronder we een index level als kolom opslaan
+INDEX_COLUMN = "__cache_index_{}__"
+
+
+def get_file_signature(file_name) -> dict:
+    """
+    Geef de handtekening van een bron bestand: naam, grootte en tijd van laatste
+    wijziging. Dit is veel sneller dan een hash van een sqlite file van een aantal GB en
+    verandert zodra de file opnieuw geschreven wordt.
+
+    Returns:
+        dict of None als de file niet bestaat
+    """
+    file_name = Path(file_name)
+    try:
+        stat = file_name.stat()
+    except OSError:
+        return None
+    return dict(name=file_name.name, size=stat.st_size, mtime=stat.st_mtime_ns)
+
+
+def normalise_for_fingerprint(item):
+    """
+    Zet een (geneste) structuur van settings om in iets wat we stabiel als json kunnen
+    schrijven. Dicts worden gesorteerde lijsten van paren zodat keys van gemengd type
+    (zoals jaren als int en als str) geen probleem geven.
+    """
+    if isinstance(item, dict):
+        pairs = [
+            (str(key), normalise_for_fingerprint(val)) for key, val in item.items()
+        ]
+        return sorted(pairs, key=lambda pair: pair[0])
+    if isinstance(item, (list, tuple)):
+        return [normalise_for_fingerprint(val) for val in item]
+    if isinstance(item, (set, frozenset)):
+        return sorted(str(val) for val in item)
+    if isinstance(item, pd.DataFrame):
+        return normalise_for_fingerprint(item.to_dict(orient="index"))
+    if isinstance(item, Path):
+        return item.as_posix()
+    if isinstance(item, (str, int, float, bool)) or item is None:
+        return item
+    return str(item)
+
+
+def make_fingerprint(*items) -> str:
+    """Maak een hash van alle items die de inhoud van een cache bepalen"""
+    normalised = normalise_for_fingerprint(list(items))
+    serialised = json.dumps(normalised, default=str)
+    return hashlib.sha256(serialised.encode("utf-8")).hexdigest()
+
+
+def hash_column(values: pd.Series) -> str:
+    """
+    Maak een hash van de inhoud van een kolom. Hiermee zien we of de data van een
+    variabele veranderd is, ongeacht welke settings daartoe geleid hebben
+    """
+    try:
+        hashes = pd.util.hash_pandas_object(values, index=False)
+    except TypeError:
+        # kolommen met bijvoorbeeld lijsten kunnen niet direct gehasht worden
+        hashes = pd.util.hash_pandas_object(values.astype(str), index=False)
+    digest = hashlib.sha256(hashes.to_numpy().tobytes())
+    digest.update(str(values.dtype).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_fingerprint_file_name(cache_file: Path) -> Path:
+    """De fingerprint van een cache file staat in een bestand ernaast"""
+    cache_file = Path(cache_file)
+    return cache_file.parent / Path(cache_file.name + FINGERPRINT_SUFFIX)
+
+
+def read_fingerprint(cache_file: Path) -> str:
+    """Lees de fingerprint die bij een cache file hoort. Geeft None als er geen is"""
+    try:
+        with open(get_fingerprint_file_name(cache_file), "r") as stream:
+            return stream.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_fingerprint(cache_file: Path, fingerprint: str):
+    """Sla de fingerprint van de inputs op naast de cache file"""
+    with open(get_fingerprint_file_name(cache_file), "w") as stream:
+        stream.write(fingerprint)
+
+
+def fingerprint_matches(cache_file: Path, fingerprint: str) -> bool:
+    """Een cache is geldig als de file bestaat en gemaakt is met dezelfde inputs"""
+    if not Path(cache_file).exists():
+        return False
+    stored_fingerprint = read_fingerprint(cache_file)
+    if stored_fingerprint != fingerprint:
+        _logger.info(f"Inputs of cache {cache_file} have changed. Cache is stale")
+        return False
+    return True
+
+
+def get_cache_suffix(cache_format: str) -> str:
+    """Geef de extensie die bij een cache formaat hoort"""
+    try:
+        return CACHE_FORMATS[cache_format]
+    except KeyError:
+        raise ValueError(
+            f"Cache format {cache_format} not supported. "
+            f"Use one of {list(CACHE_FORMATS)}"
+        )
+
+
+def get_object_cache_file_name(file_name: Path) -> Path:
+    """De pickle file met de kolommen die arrow niet aan kan"""
+    return file_name.parent / Path(file_name.stem + "_objects.pkl")
+
+
+def check_pyarrow(cache_format: str):
+    if pa is None:
+        raise ImportError(
+            f"Cache format {cache_format} requires pyarrow. Install it with "
+            f"'pip install internetnl_domain_analyse[parquet]'"
+        )
+
+
+def split_arrow_columns(dataframe: pd.DataFrame):
+    """
+    Splits de kolommen in kolommen die arrow kan opslaan en kolommen met gemengde types
+    (bijvoorbeeld floats en strings door elkaar) die we apart moeten pickelen
+
+    Returns:
+        list, list: de arrow kolommen en de object kolommen
+    """
+    arrow_columns = list()
+    object_columns = list()
+    for column_name in dataframe.columns:
+        column = dataframe[column_name]
+        if column.dtype == object or isinstance(column.dtype, pd.CategoricalDtype):
+            try:
+                pa.array(column, from_pandas=True)
+            except (pa.ArrowException, TypeError, ValueError):
+                object_columns.append(column_name)
+                continue
+        arrow_columns.append(column_name)
+    return arrow_columns, object_columns
+
+
+def get_index_columns(index: pd.Index) -> list:
+    """
+    De namen van de kolommen waarin we de index levels opslaan. Deze zijn gereserveerd,
+    zodat ook levels zonder naam of met de naam van een kolom bewaard blijven. De echte
+    namen zetten we bij het lezen terug.
+    """
+    return [INDEX_COLUMN.format(level) for level in range(index.nlevels)]
+
+
+def write_dataframe_cache(
+    dataframe: pd.DataFrame, file_name: Path, cache_format="pickle"
+):
+    """
+    Schrijf de dataframe naar een cache file
+
+    Args:
+        dataframe: pd.DataFrame
+            De data om te cachen
+        file_name: Path
+            Naam van de cache file
+        cache_format: str
+            'pickle', 'parquet' of 'feather'. De kolomformaten slaan de index als gewone
+            kolom op en kunnen later een deel van de kolommen lezen. Kolommen met
+            gemengde types kunnen niet in arrow en worden in een aparte pickle file
+            gezet.
+    """
+    if cache_format == "pickle":
+        with open(str(file_name), "wb") as stream:
+            dataframe.to_pickle(stream)
+        return
+
+    check_pyarrow(cache_format)
+    arrow_columns, object_columns = split_arrow_columns(dataframe)
+    if object_columns:
+        _logger.debug(f"Storing mixed type columns {object_columns} as pickle")
+
+    # een RangeIndex slaan we alleen in de pickle op, andere indexen als gewone kolommen
+    if isinstance(dataframe.index, pd.RangeIndex):
+        range_index = dataframe.index
+        index_columns = list()
+        arrow_df = dataframe[arrow_columns].reset_index(drop=True)
+    else:
+        range_index = None
+        index_columns = get_index_columns(dataframe.index)
+        arrow_df = dataframe[arrow_columns].rename_axis(index=index_columns)
+        arrow_df = arrow_df.reset_index()
+    if cache_format == "parquet":
+        arrow_df.to_parquet(file_name, index=False)
+    else:
+        arrow_df.to_feather(file_name)
+
+    # parquet bewaart categorieën met getallen niet als category. Sla de types apart op
+    category_dtypes = {
+        col: dataframe[col].dtype
+        for col in arrow_columns
+        if isinstance(dataframe[col].dtype, pd.CategoricalDtype)
+    }
+    object_info = dict(
+        columns=list(dataframe.columns),
+        index_names=list(dataframe.index.names),
+        index_columns=index_columns,
+        range_index=range_index,
+        category_dtypes=category_dtypes,
+        data=dataframe[object_columns],
+    )
+    with open(get_object_cache_file_name(file_name), "wb") as stream:
+        pickle.dump(object_info, stream)
+
+
+def read_dataframe_cache(file_name: Path, cache_format="pickle", columns=None):
+    """
+    Lees de dataframe uit een cache file
+
+    Args:
+        file_name: Path
+            Naam van de cache file
+        cache_format: str
+            'pickle', 'parquet' of 'feather'
+        columns: set or None
+            Als gegeven, lees alleen deze kolommen. Voor pickle wordt wel de hele file
+            gelezen
+
+    Returns:
+        pd.DataFrame
+    """
+    if cache_format == "pickle":
+        with open(str(file_name), "rb") as stream:
+            dataframe = pd.read_pickle(stream)
+        if columns is not None:
+            dataframe = dataframe[[col for col in dataframe.columns if col in columns]]
+        return dataframe
+
+    check_pyarrow(cache_format)
+    with open(get_object_cache_file_name(file_name), "rb") as stream:
+        object_info = pickle.load(stream)
+
+    all_columns = object_info["columns"]
+    # oudere caches hebben alleen de index levels met een naam onder die naam opgeslagen
+    index_columns = object_info.get("index_columns", object_info["index_names"])
+    object_df = object_info["data"]
+    if columns is not None:
+        all_columns = [col for col in all_columns if col in columns]
+
+    arrow_columns = [col for col in all_columns if col not in object_df.columns]
+    if cache_format == "parquet":
+        table = pa_parquet.read_table(file_name, columns=index_columns + arrow_columns)
+    else:
+        table = pa_feather.read_table(file_name, columns=index_columns + arrow_columns)
+    dataframe = table.to_pandas()
+    if index_columns:
+        dataframe.set_index(index_columns, inplace=True)
+        dataframe.index.names = object_info["index_names"]
+    elif object_info.get("range_index") is not None:
+        dataframe.index = object_info["range_index"]
+    for col, dtype in object_info["category_dtypes"].items():
+        if col in dataframe.columns and dataframe[col].dtype != dtype:
+            dataframe[col] = dataframe[col].astype(dtype)
+
+    object_columns = [col for col in all_columns if col in object_df.columns]
+    if object_columns:
+        # de rijen staan in dezelfde volgorde, dus voeg ze op positie samen. Op de index
+        # samenvoegen gaat mis bij dubbele waardes in de index
+        object_data = object_df[object_columns].set_axis(dataframe.index)
+        dataframe = pd.concat([dataframe, object_data], axis=1)
+
+    return dataframe[all_columns]
+
+
+def connect_clean_url_store(store_file: Path, extractor_key: str):
+    """
+    Open de store met opgeschoonde urls. De store wordt gedeeld door alle jaren en scan
+    types. De uitkomst hangt af van de suffix list waarmee we opschonen. Is die
+    veranderd, dan wordt de store eerst leeg gemaakt.
+
+    Args:
+        store_file: Path
+            De sqlite file van de store
+        extractor_key: str
+            Identificatie van de methode en de suffix list waarmee opgeschoond wordt
+
+    Returns:
+        sqlite3.Connection
+    """
+    store_file = Path(store_file)
+    store_file.parent.mkdir(exist_ok=True, parents=True)
+    connection = sqlite3.connect(store_file)
+    connection.execute(
+        f"create table if not exists {CLEAN_URL_TABLE} "
+        "(url text primary key, clean_url text, suffix text)"
+    )
+    connection.execute(
+        "create table if not exists store_info (key text primary key, value text)"
+    )
+    row = connection.execute(
+        "select value from store_info where key = 'extractor'"
+    ).fetchone()
+    if row is None or row[0] != extractor_key:
+        if row is not None:
+            _logger.info(
+                f"Suffix list of {store_file} has changed. Clearing the clean urls"
+            )
+        connection.execute(f"delete from {CLEAN_URL_TABLE}")
+        connection.execute(
+            "insert or replace into store_info (key, value) values ('extractor', ?)",
+            (extractor_key,),
+        )
+    connection.commit()
+    return connection
+
+
+def read_clean_urls_from_store(connection: sqlite3.Connection, urls: list) -> dict:
+    """
+    Zoek de urls op in de store
+
+    Returns:
+        dict: url -> (clean_url, suffix) voor alle urls die al in de store staan
+    """
+    connection.execute(
+        "create temp table if not exists lookup_urls (url text primary key)"
+    )
+    connection.execute("delete from lookup_urls")
+    connection.executemany(
+        "insert or ignore into lookup_urls (url) values (?)", ((url,) for url in urls)
+    )
+    cursor = connection.execute(
+        f"select s.url, s.clean_url, s.suffix from {CLEAN_URL_TABLE} s "
+        "join lookup_urls l on s.url = l.url"
+    )
+    stored = {url: (clean_url, suffix) for url, clean_url, suffix in cursor}
+    connection.execute("delete from lookup_urls")
+    return stored
+
+
+def write_clean_urls_to_store(connection: sqlite3.Connection, clean_urls: dict):
+    """Voeg de nieuw opgeschoonde urls (url -> (clean_url, suffix)) toe aan de store"""
+    connection.executemany(
+        f"insert or replace into {CLEAN_URL_TABLE} (url, clean_url, suffix) "
+        "values (?, ?, ?)",
+        ((url, clean_url, suffix) for url, (clean_url, suffix) in clean_urls.items()),
+    )
+    connection.commit()
@@ -1,14 +1,16 @@
 import codecs
 import logging
+import multiprocessing
 import os
 import pickle
 import re
 import sqlite3
 import sys
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from pandas import DataFrame, Series
@@ -20,25 +22,44 @@ from weighted_sample_statistics import (
     rename_all_variables,
     prepare_df_for_statistics,
 )
-from internetnl_domain_analyse.domain_plots import (
-    make_cdf_plot,
-    make_bar_plot,
-    make_bar_plot_stacked,
+from internetnl_domain_analyse import __version__
+from internetnl_domain_analyse.batch_statistics import (
+    StatisticsCube,
+    calculate_batch_statistics,
+    calculate_correlations,
+    calculate_histograms,
+    factorize_values,
+    get_group_codes_from_columns,
+    get_histogram_bins,
+)
+from internetnl_domain_analyse.cache_utils import (
+    fingerprint_matches,
+    get_cache_suffix,
+    get_file_signature,
+    hash_column,
+    make_fingerprint,
+    read_dataframe_cache,
+    write_dataframe_cache,
+    write_fingerprint,
 )
-from internetnl_domain_analyse.latex_output import make_latex_overview
 from internetnl_domain_analyse.utils import (
-    read_tables_from_sqlite,
+    collect_tables,
+    submit_table_reads,
     get_all_clean_urls,
     dump_data_frame_as_sqlite,
     add_derived_variables,
     fill_booleans,
     prepare_stat_data_for_write,
     get_option_mask,
-    impose_variable_defaults,
+    variable_dict2df,
     add_missing_groups,
     clean_all_suffix,
     get_windows_or_linux_value,
+    get_eval_column_names,
+    compile_translation_plan,
+    apply_translation_plan,
 )
+from internetnl_domain_analyse.verdict_matrix import VerdictMatrix
 
 _logger = logging.getLogger(__name__)
 
@@ -47,6 +68,106 @@ tld_logger = logging.getLogger("tldextract")
 mpl_logger = logging.getLogger("matplotlib")
 mpl_logger.setLevel(logging.WARNING)
 
+# de analyses die op de microdata gedaan kunnen worden
+ANALYSIS_MODES = ("statistics", "correlations", "categories")
+
+# de engines waarmee we de statistieken naar excel kunnen schrijven
+EXCEL_ENGINES = ("openpyxl", "xlsxwriter")
+
+# de settings van een variabele waar de microdata en de statistiek van afhangen. Labels,
+# vragen en secties zijn alleen voor de output en tellen niet mee in de fingerprints
+FINGERPRINT_VARIABLE_FIELDS = (
+    "module",
+    "original_name",
+    "type",
+    "translateopts",
+    "eval",
+    "options",
+    "filter",
+    "gewicht",
+    "report_number",
+)
+
+# de settings van een variabele waar het inlezen van de microdata van afhangt: de naam
+# in de tabel, de vertaling, het type waarnaar geconverteerd wordt en de eval van een
+# afgeleide kolom
+READ_VARIABLE_FIELDS = ("original_name", "type", "translateopts", "eval")
+
+# de DomainAnalyser waarvan de breakdowns in een geforkt proces berekend worden
+_forked_analyser = None
+
+
+def calculate_breakdown_in_fork(group_by, file_base=None):
+    """
+    Bereken een breakdown in een proces van de pool. Het proces is geforkt nadat de
+    analyser gezet is, dus de microdata hoeft niet gepickled te worden
+    """
+    return _forked_analyser.calculate_statistics_one_breakdown(
+        group_by=group_by, file_base=file_base
+    )
+
+
+def get_variable_fingerprint_settings(
+    var_prop: pd.Series, fields=FINGERPRINT_VARIABLE_FIELDS
+) -> dict:
+    """Geef de settings van een variabele die in een fingerprint meetellen"""
+    return {field: var_prop.get(field) for field in fields}
+
+
+def check_excel_engine(excel_engine: str):
+    """Controleer of de excel engine bekend en geïnstalleerd is"""
+    if excel_engine not in EXCEL_ENGINES:
+        raise ValueError(
+            f"Excel engine {excel_engine} not supported. Use one of {EXCEL_ENGINES}"
+        )
+    try:
+        __import__(excel_engine)
+    except ImportError:
+        raise ImportError(
+            f"Excel engine {excel_engine} is not installed. Install it with "
+            f"'pip install internetnl_domain_analyse[{excel_engine}]'"
+        )
+
+
+def write_excel_workbook(excel_file: Path, sheets: dict, excel_engine="openpyxl"):
+    """
+    Schrijf de tabellen naar een excel file. Staat op module niveau zodat we meerdere
+    workbooks tegelijk in een process pool kunnen schrijven
+
+    Args:
+        excel_file: Path
+            De excel file die we schrijven
+        sheets: dict
+            Per sheet naam de dataframe die in de sheet komt
+        excel_engine: str
+            'openpyxl' of 'xlsxwriter'
+
+    Returns:
+        Path: de geschreven excel file
+    """
+    with pd.ExcelWriter(str(excel_file), engine=excel_engine) as writer:
+        for sheet_name, stat_df in sheets.items():
+            stat_df.to_excel(excel_writer=writer, sheet_name=sheet_name)
+    return excel_file
+
+
+def get_analysis_modes(mode) -> set:
+    """
+    Zet de mode om in de set van analyses die we doen. De mode kan een string of een
+    lijst van modes zijn. 'all' staat voor alle analyses
+    """
+    if mode is None:
+        return set()
+    if isinstance(mode, str):
+        mode = [mode]
+    modes = set()
+    for mode_key in mode:
+        if mode_key == "all":
+            modes.update(ANALYSIS_MODES)
+        else:
+            modes.add(mode_key)
+    return modes
+
 
 def make_plot_cache_file_name(cache_directory, file_base, prefix):
     return cache_directory / Path("_".join([prefix, file_base, "cache_for_plot.pkl"]))
@@ -237,6 +358,18 @@ class DomainAnalyser:
         correlations=None,
         categories=None,
         dump_cache_as_sqlite=False,
+        column_projection=False,
+        io_workers=None,
+        cache_format="pickle",
+        use_tldextract=False,
+        url_workers=None,
+        variables_df: DataFrame = None,
+        translation_plan: dict = None,
+        batch_statistics=True,
+        jobs=None,
+        plot_info: dict = None,
+        excel_engine="openpyxl",
+        excel_per_breakdown=False,
     ):
 
         _logger.info(f"Running here {os.getcwd()}")
@@ -269,7 +402,15 @@ class DomainAnalyser:
         self.module_key = module_key
         self.variable_key = variable_key
         self.module_info = module_info
-        self.variables = self.variable_dict2df(variables, module_info)
+        if variables_df is None:
+            self.variables = self.variable_dict2df(variables, module_info)
+        else:
+            # de variabelen tabel komt uit de gecompileerde settings
+            self.variables = variables_df.copy()
+        if translation_plan is None:
+            self.translation_plan = compile_translation_plan(self.variables)
+        else:
+            self.translation_plan = translation_plan
         self.n_digits = n_digits
         self.n_bins = n_bins
 
@@ -283,6 +424,8 @@ class DomainAnalyser:
 
         self.categories_coefficient_df = None
         self.correlation_coefficient_df = None
+        self.column_projection = column_projection
+        self.io_workers = io_workers
 
         if internet_nl_filename is not None:
             self.internet_nl_filename = internet_nl_filename
@@ -297,9 +440,27 @@ class DomainAnalyser:
             self.tld_extract_cache_directory = "tld_cache"
         else:
             self.tld_extract_cache_directory = tld_extract_cache_directory
+        self.use_tldextract = use_tldextract
+        self.url_workers = url_workers
+        self.batch_statistics = batch_statistics
+        self.jobs = jobs
+        self.excel_engine = excel_engine
+        self.excel_per_breakdown = excel_per_breakdown
+        # de plot settings bepalen van welke variabelen we een histogram nodig hebben.
+        # Zonder plot settings berekenen we ze voor alle variabelen
+        self.plot_info = plot_info
+        self.statistics_cube = None
+        self.variable_caches = dict()
+        self.column_hashes = dict()
+        self.column_codes = dict()
+        # de opgeschoonde urls worden gedeeld door alle jaren en scan types
+        self.url_store_file = Path(self.tld_extract_cache_directory) / Path(
+            "clean_urls.sqlite"
+        )
+        self.cache_format = cache_format
         cache_file_base = Path(
             "_".join([cache_file_base, self.records_cache_info.year_key, scan_data_key])
-            + ".pkl"
+            + get_cache_suffix(self.cache_format)
         )
         self.cache_file = self.cache_directory / cache_file_base
         self.cate_outfile = None
@@ -339,14 +500,32 @@ class DomainAnalyser:
             self.reset = int(reset)
         self.weight_key = weights
 
+        self.sources_available = (
+            self.records_cache_info.file_name.exists()
+            and Path(self.internet_nl_filename).exists()
+        )
+        if not self.sources_available:
+            _logger.info(
+                "Source data not available. "
+                "Caches are used without checking their inputs"
+            )
+        self.microdata_fingerprint = self.get_microdata_fingerprint()
+
         self.dataframe = None
+        self.verdict_matrices = dict()
+        self.correct_categories_count = None
         self.score_df = None
         self.all_stats_per_format = dict()
         self.all_hist_per_format = dict()
 
         self.all_plots = None
 
-        have_cache = self.check_if_cache_exist(mode)
+        # alle gevraagde analyses gebruiken dezelfde, maar een keer gelezen microdata
+        self.modes = get_analysis_modes(mode)
+        if "statistics" in self.modes:
+            # alleen de statistiek gaat naar excel. Controleer eerst de engine
+            check_excel_engine(self.excel_engine)
+        have_cache = self.check_if_cache_exist(self.modes)
 
         if (self.reset is not None and self.reset <= 1) or not have_cache:
             # de microdata alleen lezen als we geen pickle files van de statistische output hebben
@@ -365,28 +544,224 @@ class DomainAnalyser:
                 )
                 _logger.warning(msg)
 
-        if mode in ("all", "statistics"):
+        if "statistics" in self.modes:
             self.calculate_statistics()
             if statistics_to_xls or reset is not None or not have_cache:
                 self.write_statistics()
-        if mode in ("all", "correlations") and self.dataframe is not None:
+        if "correlations" in self.modes and self.dataframe is not None:
             self.calculate_correlations_and_scores()
-        if mode in ("all", "categories") and self.dataframe is not None:
+        if "categories" in self.modes and self.dataframe is not None:
             self.calculate_categories()
 
-    def check_if_cache_exist(self, mode: str):
+    def check_if_cache_exist(self, mode):
+        """
+        Kijk of alle caches die we voor deze modes nodig hebben bestaan en gemaakt zijn
+        met de huidige inputs. Alleen dan hoeven we de microdata niet te lezen.
+        """
+        modes = get_analysis_modes(mode)
 
         cache_exists = True
-        if mode in ("all", "statistics"):
-            cache_exists = self.cache_file.exists()
-        if mode in ("all", "correlations"):
-            cache_exists = cache_exists and self.corr_pkl_file.exists()
-            cache_exists = cache_exists and self.score_pkl_file.exists()
-        if mode in ("all", "categories"):
-            cache_exists = cache_exists and self.cate_pkl_file.exists()
+        if "statistics" in modes:
+            cache_exists = self.cache_is_valid(
+                self.cache_file, self.microdata_fingerprint
+            )
+            for file_base, props in self.statistics.items():
+                if not self.breakdown_is_requested(file_base, props):
+                    continue
+                if props.get("combination") is not None:
+                    continue
+                cache_exists = cache_exists and self.cache_is_valid(
+                    self.get_breakdown_cache_file(file_base),
+                    self.get_breakdown_fingerprint(file_base, props),
+                )
+        if "correlations" in modes:
+            correlations_fingerprint = self.get_correlations_fingerprint()
+            cache_exists = cache_exists and self.cache_is_valid(
+                self.corr_pkl_file, correlations_fingerprint
+            )
+            cache_exists = cache_exists and self.cache_is_valid(
+                self.score_pkl_file, correlations_fingerprint
+            )
+        if "categories" in modes:
+            cache_exists = cache_exists and self.cache_is_valid(
+                self.cate_pkl_file, self.get_categories_fingerprint()
+            )
 
         return cache_exists
 
+    def cache_is_valid(self, cache_file: Path, fingerprint: str) -> bool:
+        """
+        Een cache is geldig als hij bestaat en zijn fingerprint overeenkomt met de
+        huidige inputs. Als de brondata niet beschikbaar is (bijvoorbeeld als we alleen
+        plaatjes maken op een machine zonder de microdata) kunnen we dat niet
+        controleren en gebruiken we de cache als hij bestaat.
+        """
+        if not self.sources_available:
+            return cache_file.exists()
+        return fingerprint_matches(cache_file, fingerprint)
+
+    def get_microdata_fingerprint(self) -> str:
+        """Fingerprint van alles waar de microdata cache van afhangt"""
+        if self.column_projection:
+            required_columns = self.get_required_columns()
+        else:
+            required_columns = None
+        return make_fingerprint(
+            __version__,
+            get_file_signature(self.records_cache_info.file_name),
+            self.records_cache_info.table_names,
+            get_file_signature(self.internet_nl_filename),
+            self.get_variables_fingerprint_settings(fields=READ_VARIABLE_FIELDS),
+            self.translations,
+            self.weight_key,
+            required_columns,
+        )
+
+    def get_variables_fingerprint_settings(
+        self, fields=FINGERPRINT_VARIABLE_FIELDS
+    ) -> dict:
+        """De settings van alle variabelen die in een fingerprint meetellen"""
+        return {
+            var_key: get_variable_fingerprint_settings(var_prop, fields=fields)
+            for var_key, var_prop in self.variables.iterrows()
+        }
+
+    def get_module_include_flags(self) -> dict:
+        """Alleen de include vlag uit de module info bepaalt welke variabelen meedoen"""
+        if self.module_info is None:
+            return None
+        return {
+            module_key: (module_prop or dict()).get("include", True)
+            for module_key, module_prop in self.module_info.items()
+        }
+
+    def get_breakdown_fingerprint(self, file_base: str, props: dict) -> str:
+        """Fingerprint van de statistiek van een breakdown"""
+        # de do_it vlag bepaalt alleen of we de breakdown doen, niet wat eruit komt
+        breakdown_props = {key: val for key, val in props.items() if key != "do_it"}
+        histogram_variables = self.get_histogram_variables(file_base)
+        if histogram_variables is not None:
+            histogram_variables = sorted(histogram_variables)
+        # de microdata fingerprint dekt alleen het inlezen. De statistiek hangt ook af
+        # van het gewicht, de filters en de modules van de variabelen
+        return make_fingerprint(
+            self.microdata_fingerprint,
+            self.get_variables_fingerprint_settings(),
+            self.get_module_include_flags(),
+            file_base,
+            breakdown_props,
+            self.n_bins,
+            histogram_variables,
+        )
+
+    def get_histogram_variables(self, file_base: str) -> set:
+        """
+        Bepaal van welke variabelen we het histogram nodig hebben. Die worden alleen
+        gebruikt voor de cdf plots van de variabelen onder cdf_plot/variables van de
+        plot settings
+
+        Returns:
+            set met de variabelen, of None als we ze voor alle variabelen berekenen
+        """
+        if self.plot_info is None:
+            return None
+
+        plot_cdf = (self.plot_info.get(file_base) or dict()).get("cdf_plot")
+        if not isinstance(plot_cdf, dict):
+            return set()
+        cdf_variables = (plot_cdf.get("variables") or dict()).get(self.scan_data_key)
+        if not cdf_variables:
+            return set()
+
+        plot_names = {
+            name
+            for name, cdf_prop in cdf_variables.items()
+            if isinstance(cdf_prop, dict) and cdf_prop.get("apply", True)
+        }
+        # in de plot settings staat de originele naam van de variabele
+        return {
+            var_key
+            for var_key, original_name in self.variables["original_name"].items()
+            if var_key in plot_names or original_name in plot_names
+        }
+
+    def get_correlations_fingerprint(self) -> str:
+        """Fingerprint van de correlaties en scores"""
+        return make_fingerprint(
+            self.microdata_fingerprint, self.correlations, self.categories
+        )
+
+    def get_categories_fingerprint(self) -> str:
+        """Fingerprint van de categorieën"""
+        return make_fingerprint(
+            self.microdata_fingerprint, self.categories, self.n_bins, self.weight_key
+        )
+
+    def breakdown_is_requested(self, file_base: str, props: dict) -> bool:
+        """Geeft True als de breakdown voor deze scan berekend moet worden"""
+        scan_data = props.get("scan_data", self.scan_data_key)
+        if scan_data != self.scan_data_key:
+            _logger.debug(f"SKipping {scan_data} for {self.scan_data_key}")
+            return False
+
+        if not props.get("do_it", True):
+            _logger.debug(f"SKipping breakdown {file_base} for {self.scan_data_key}")
+            return False
+
+        return True
+
+    def get_breakdown_cache_file(self, file_base: str) -> Path:
+        """De cache file met de statistiek van een breakdown"""
+        file_name = Path("_".join([file_base, self.scan_data_key]) + ".pkl")
+        return self.cache_directory / file_name
+
+    def get_required_columns(self) -> set:
+        """
+        Bepaal uit de variables, statistics, categories en correlations welke kolommen
+        we nodig hebben. Wordt gebruikt om alleen deze kolommen uit de sqlite tabellen
+        te lezen
+
+        Returns:
+            set met kolomnamen
+        """
+        columns = {
+            self.url_key,
+            "url",
+            self.be_id,
+            "percentage",
+            "units",
+            "ratio_units",
+        }
+        columns.update(self.mi_labels)
+        columns.add(self.weight_key)
+
+        columns.update(self.variables.index)
+        columns.update(self.variables["original_name"].dropna())
+        for weight_key in self.variables["gewicht"].dropna().unique():
+            columns.update([weight_key, "_".join(["ratio", weight_key])])
+        for var_filter in self.variables["filter"].dropna():
+            columns.update(get_eval_column_names(var_filter))
+        for eval_statement in self.variables["eval"].dropna():
+            columns.update(get_eval_column_names(eval_statement))
+
+        if self.statistics is not None:
+            for props in self.statistics.values():
+                for groupby_key in ("groupby", "groupby_if_not_exist"):
+                    if group_by := props.get(groupby_key):
+                        columns.update(group_by.values())
+                if filters := props.get("filters"):
+                    for filter_statement in filters.values():
+                        columns.update(get_eval_column_names(filter_statement))
+
+        if self.categories is not None:
+            for cat_prop in self.categories["index_categories"].values():
+                columns.add(cat_prop["variable"])
+
+        if self.correlations is not None:
+            columns.update(self.correlations["index_correlations"].keys())
+
+        return columns
+
     def variable_dict2df(self, variables, module_info: dict = None) -> DataFrame:
         """
         Converteer de directory met variable info naar een data frame
@@ -397,69 +772,117 @@ class DomainAnalyser:
         Returns:
             dataframe
         """
-        var_df = pd.DataFrame.from_dict(variables).unstack().dropna()
-        var_df = var_df.reset_index()
-        var_df = var_df.rename(
-            columns={
-                "level_0": self.module_key,
-                "level_1": self.variable_key,
-                0: "properties",
-            }
+        return variable_dict2df(
+            variables,
+            module_info=module_info,
+            module_key=self.module_key,
+            variable_key=self.variable_key,
         )
-        var_df.set_index(self.variable_key, drop=True, inplace=True)
-
-        var_df = impose_variable_defaults(
-            var_df, module_info=module_info, module_key=self.module_key
-        )
-        return var_df
 
     def write_statistics(self):
         _logger.info(f"Writing statistics {self.output_file}")
         connection = sqlite3.connect(self.output_file)
 
         excel_file = Path(self.output_file).with_suffix(".xlsx")
-        sheets = list()
-        cnt = 0
-        with pd.ExcelWriter(str(excel_file), engine="openpyxl") as writer:
-            _logger.info(f"Start writing standard output to {excel_file}")
+        sheets = dict()
+        sheets_per_file_base = dict()
+        for file_base, all_stats in self.all_stats_per_format.items():
 
-            for file_base, all_stats in self.all_stats_per_format.items():
+            stat_df = prepare_stat_data_for_write(
+                file_base=file_base,
+                all_stats=all_stats,
+                variables=self.variables,
+                variable_key=self.variable_key,
+                module_key=self.module_key,
+                breakdown_labels=self.breakdown_labels,
+                n_digits=self.n_digits,
+                connection=connection,
+            )
 
-                stat_df = prepare_stat_data_for_write(
-                    file_base=file_base,
-                    all_stats=all_stats,
-                    variables=self.variables,
-                    variable_key=self.variable_key,
-                    module_key=self.module_key,
-                    breakdown_labels=self.breakdown_labels,
-                    n_digits=self.n_digits,
-                    connection=connection,
+            cache_file = make_plot_cache_file_name(
+                cache_directory=self.cache_directory,
+                prefix=self.scan_data_key,
+                file_base=file_base,
+            )
+            _logger.info(f"Writing cache for stat {cache_file}")
+            with open(cache_file, "wb") as stream:
+                pickle.dump(stat_df, stream)
+
+            sheet_name = self.get_sheet_name(file_base, sheet_names=sheets)
+            sheets[sheet_name] = stat_df
+            sheets_per_file_base[file_base] = {sheet_name: stat_df}
+
+        if self.excel_per_breakdown:
+            # iedere breakdown een eigen workbook, zodat we ze tegelijk kunnen schrijven
+            workbooks = dict()
+            for file_base, file_base_sheets in sheets_per_file_base.items():
+                breakdown_file = excel_file.with_name(
+                    "_".join([excel_file.stem, file_base]) + excel_file.suffix
                 )
+                workbooks[breakdown_file] = file_base_sheets
+        else:
+            workbooks = {excel_file: sheets}
+
+        self.write_excel_workbooks(workbooks)
+
+    def get_sheet_name(self, file_base: str, sheet_names) -> str:
+        """
+        Maak de naam van de excel sheet van een breakdown. Excel staat maximaal 31
+        karakters toe en iedere naam moet uniek zijn
+
+        Args:
+            file_base: str
+                De naam van de breakdown
+            sheet_names: list or dict
+                De sheet namen die al gebruikt zijn
+        """
+        sheet_name = file_base
+        if self.sheet_renames is not None:
+            for rename_key, sheet_rename in self.sheet_renames.items():
+                pat = sheet_rename["pattern"]
+                rep = sheet_rename["replace"]
+                sheet_name = re.sub(pat, rep, sheet_name)
+        if len(sheet_name) > 31:
+            sheet_name = sheet_name[:31]
+        if sheet_name in sheet_names:
+            sheet_name = sheet_name[:29] + "{:02d}".format(len(sheet_names))
+        return sheet_name
+
+    def write_excel_workbooks(self, workbooks: dict):
+        """
+        Schrijf de excel files met self.excel_engine. Meerdere workbooks worden met
+        self.jobs processen tegelijk geschreven
+
+        Args:
+            workbooks: dict
+                Per excel file de sheets (sheet naam -> dataframe) die erin komen
+        """
+        parallel = (
+            self.jobs is not None
+            and self.jobs > 1
+            and len(workbooks) > 1
+            and "fork" in multiprocessing.get_all_start_methods()
+        )
+        if not parallel:
+            for excel_file, sheets in workbooks.items():
+                _logger.info(f"Start writing standard output to {excel_file}")
+                write_excel_workbook(excel_file, sheets, excel_engine=self.excel_engine)
+            return
 
-                cache_file = make_plot_cache_file_name(
-                    cache_directory=self.cache_directory,
-                    prefix=self.scan_data_key,
-                    file_base=file_base,
+        _logger.info(f"Writing {len(workbooks)} workbooks with {self.jobs} processes")
+        with ProcessPoolExecutor(
+            max_workers=self.jobs, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            futures = [
+                executor.submit(
+                    write_excel_workbook, excel_file, sheets, self.excel_engine
                 )
-                _logger.info(f"Writing cache for stat {cache_file}")
-                with open(cache_file, "wb") as stream:
-                    pickle.dump(stat_df, stream)
-
-                sheet_name = file_base
-                if self.sheet_renames is not None:
-                    for rename_key, sheet_rename in self.sheet_renames.items():
-                        pat = sheet_rename["pattern"]
-                        rep = sheet_rename["replace"]
-                        sheet_name = re.sub(pat, rep, sheet_name)
-                if len(sheet_name) > 32:
-                    sheet_name = sheet_name[:32]
-                if sheet_name in sheets:
-                    sheet_name = sheet_name[:30] + "{:02d}".format(cnt)
-                cnt += 1
-                sheets.append(sheets)
-                stat_df.to_excel(excel_writer=writer, sheet_name=sheet_name)
-
-    def calculate_statistics_one_breakdown(self, group_by):
+                for excel_file, sheets in workbooks.items()
+            ]
+            for future in futures:
+                _logger.info(f"Written standard output to {future.result()}")
+
+    def calculate_statistics_one_breakdown(self, group_by, file_base=None):
 
         index_names = group_by + [self.be_id]
         try:
@@ -473,23 +896,60 @@ class DomainAnalyser:
         all_stats = dict()
         all_hist = dict()
 
-        for var_key, var_prop in self.variables.iterrows():
-            _logger.debug(f"{var_key}")
-            var_prop_klass = VariableProperties(
-                variables=self.variables, column=var_key
+        # bepaal eerst welke variabelen we in een keer met de batch engine berekenen
+        selected_variables, batch_variables = self.select_variables(dataframe)
+
+        # variabelen waarvan de data en settings niet veranderd zijn komen uit de cache
+        _, cached_variables = self.variable_caches.get(file_base, (None, dict()))
+        if cached_variables:
+            _logger.info(f"Taking {len(cached_variables)} variables from cache")
+            batch_variables = {
+                var_key: batch_info
+                for var_key, batch_info in batch_variables.items()
+                if var_key not in cached_variables
+            }
+
+        if not batch_variables:
+            batch_stats = dict()
+        elif self.statistics_cube is not None and self.statistics_cube.covers(
+            group_by, batch_variables
+        ):
+            _logger.debug(f"Rolling up {len(batch_variables)} variables from the cube")
+            batch_stats = self.statistics_cube.roll_up(group_by, batch_variables)
+        else:
+            _logger.debug(f"Calculating {len(batch_variables)} variables in one batch")
+            batch_stats = calculate_batch_statistics(
+                dataframe=dataframe,
+                group_by=group_by,
+                batch_variables=batch_variables,
+                group_codes=self.get_breakdown_codes(dataframe, group_by),
             )
 
-            column = var_key
-            column_list = list([var_key])
-            var_module = var_prop["module"]
-            try:
-                module = self.module_info[var_module]
-            except KeyError as err:
-                _logger.warning(err)
+        histogram_variables = self.get_histogram_variables(file_base)
+        batch_hist = self.calculate_batch_histograms(
+            dataframe,
+            {
+                var_key: batch_info
+                for var_key, batch_info in batch_variables.items()
+                if histogram_variables is None or var_key in histogram_variables
+            },
+            group_by=group_by,
+        )
+
+        for var_key, var_prop, var_prop_klass, batch_info in selected_variables:
+            if var_key in cached_variables:
+                all_stats[var_key], histogram = cached_variables[var_key]
+                if histogram is not None:
+                    all_hist[var_key] = histogram
                 continue
-            if not module.get("include", True):
+            if batch_info is not None:
+                all_stats[var_key] = batch_stats[var_key]
+                if var_key in batch_hist:
+                    all_hist[var_key] = batch_hist[var_key]
                 continue
 
+            column = var_key
+            column_list = list([var_key])
             var_type = var_prop["type"]
             var_filter = var_prop["filter"]
             var_weight_key = var_prop["gewicht"]
@@ -546,14 +1006,149 @@ class DomainAnalyser:
             else:
                 all_stats[column] = stats.records_weighted_mean_agg
 
-            # voeg hier het histogram van de data toe
-            all_hist[var_key] = calculate_histogram_per_breakdown(
-                data, var_key=var_key, df_weights=df_weights, n_bins=self.n_bins
-            )
+            # voeg het histogram van de data toe als we dat voor een plot nodig hebben
+            if histogram_variables is None or var_key in histogram_variables:
+                all_hist[var_key] = calculate_histogram_per_breakdown(
+                    data, var_key=var_key, df_weights=df_weights, n_bins=self.n_bins
+                )
         return all_stats, all_hist
 
+    def calculate_batch_histograms(
+        self, dataframe, batch_variables: dict, group_by: list
+    ) -> dict:
+        """
+        Bereken de histogrammen van alle batch variabelen van een breakdown in een keer
+
+        Returns:
+            dict: per variabele de histogrammen per groep
+        """
+        if not batch_variables:
+            return dict()
+        # de histogrammen worden per groep van de eerste breakdown variabele berekend
+        group_codes = self.get_breakdown_codes(dataframe, group_by[:1])
+        unit_variables = list()
+        weighted_variables = list()
+        for var_key, batch_info in batch_variables.items():
+            # WeightedSampleStatistics geeft een gewicht variabele schaalfactor 1. Als
+            # dat de ratio_units is, dan geldt dat ook voor het histogram
+            if batch_info["unit_weights"] and batch_info["weight_key"] == "ratio_units":
+                unit_variables.append(var_key)
+            else:
+                weighted_variables.append(var_key)
+
+        batch_hist = dict()
+        if weighted_variables:
+            batch_hist.update(
+                calculate_histograms(
+                    dataframe[weighted_variables],
+                    weights=dataframe["ratio_units"].to_numpy(),
+                    n_bins=self.n_bins,
+                    group_codes=group_codes,
+                )
+            )
+        if unit_variables:
+            batch_hist.update(
+                calculate_histograms(
+                    dataframe[unit_variables],
+                    weights=np.ones(len(dataframe.index)),
+                    n_bins=self.n_bins,
+                    group_codes=group_codes,
+                )
+            )
+        return batch_hist
+
+    def select_variables(self, dataframe, warn_missing_modules=True):
+        """
+        Selecteer de variabelen van de modules die meedoen en bepaal welke daarvan we
+        met de batch engine kunnen berekenen
+
+        Returns:
+            list, dict: per variabele (var_key, var_prop, var_prop_klass, batch_info) en
+            de batch_info van de batch variabelen
+        """
+        selected_variables = list()
+        batch_variables = dict()
+        for var_key, var_prop in self.variables.iterrows():
+            _logger.debug(f"{var_key}")
+            var_prop_klass = VariableProperties(
+                variables=self.variables, column=var_key
+            )
+
+            var_module = var_prop["module"]
+            try:
+                module = self.module_info[var_module]
+            except KeyError as err:
+                if warn_missing_modules:
+                    _logger.warning(err)
+                continue
+            if not module.get("include", True):
+                continue
+
+            batch_info = None
+            if self.batch_statistics:
+                batch_info = self.get_batch_info(
+                    dataframe, var_key, var_prop, var_prop_klass
+                )
+                if batch_info is not None:
+                    batch_variables[var_key] = batch_info
+            selected_variables.append((var_key, var_prop, var_prop_klass, batch_info))
+        return selected_variables, batch_variables
+
+    def get_batch_info(self, dataframe, var_key, var_prop, var_prop_klass):
+        """
+        Kijk of we de variabele met de batch engine kunnen berekenen. Dat kan voor
+        numerieke variabelen zonder filter die geen dict zijn. De rest gaat per
+        variabele via WeightedSampleStatistics.
+
+        Returns:
+            dict met de informatie voor calculate_batch_statistics of None
+        """
+        var_type = var_prop["type"]
+        if var_type == "dict" or var_prop["filter"] is not None:
+            return None
+
+        var_weight_key = var_prop["gewicht"]
+        schaal_factor_key = "_".join(["ratio", var_weight_key])
+        units_schaal_factor_key = "_".join(["ratio", "units"])
+        weight_columns = list(
+            set(list([var_weight_key, schaal_factor_key, units_schaal_factor_key]))
+        )
+        for column in [var_key] + weight_columns:
+            if column not in dataframe.columns:
+                return None
+        if not pd.api.types.is_numeric_dtype(dataframe[var_key]):
+            return None
+
+        report_number = var_prop_klass.report_number
+        return dict(
+            weight_key=schaal_factor_key,
+            weight_columns=weight_columns,
+            unit_weights=var_key in (var_weight_key, schaal_factor_key),
+            report_number=bool(not np.isnan(report_number) and report_number),
+            percentage=var_type == "bool",
+        )
+
+    def get_verdict_matrix(self, columns: list) -> VerdictMatrix:
+        """
+        Geef de verdicts van de kolommen als bits. Alleen 1 wordt als succes beschouwd.
+        De matrix wordt een keer per dataframe gemaakt en gedeeld door alle analyses
+        """
+        key = tuple(columns)
+        if key not in self.verdict_matrices:
+            self.verdict_matrices[key] = VerdictMatrix(self.dataframe, columns)
+        return self.verdict_matrices[key]
+
     def get_correct_categories_count(self):
-        """Bekijk per record hoeveel categorieën goed zijn en geef terug als dataframe"""
+        """
+        Bekijk per record hoeveel categorieën goed zijn. Wordt een keer per dataframe
+        berekend en gedeeld door de correlaties en de categorieën
+
+        Returns:
+            VerdictMatrix, pd.Series: de verdicts van de categorieën als bits en per
+            record het aantal goede categorieën
+        """
+        if self.correct_categories_count is not None:
+            return self.correct_categories_count
 
         col_sel = list()
 
@@ -562,18 +1157,17 @@ class DomainAnalyser:
             col_sel.append(variable)
 
         _logger.debug(f"make selection\n{col_sel}")
-        data_df: pd.DataFrame = self.dataframe[col_sel]
-
-        # alleen 1 wordt als succes beschouwd
-        data_df = data_df == 1
+        verdicts = self.get_verdict_matrix(col_sel)
 
-        count = data_df.sum(axis=1)
+        count = verdicts.record_counts()
         count = count.rename("count")
 
-        return data_df, count
+        self.correct_categories_count = (verdicts, count)
+        return verdicts, count
 
     def calculate_categories(self):
-        if self.cate_pkl_file.exists() and self.reset is None:
+        fingerprint = self.get_categories_fingerprint()
+        if self.reset is None and self.cache_is_valid(self.cate_pkl_file, fingerprint):
             _logger.info(
                 f"Cache {self.cate_pkl_file} and already exist. "
                 f"Skip calculation categories and go to plot"
@@ -585,43 +1179,32 @@ class DomainAnalyser:
 
         _logger.info("Calculating categories")
 
-        score_df = self.dataframe["percentage"].copy()
-        score_df = score_df.rename("score")
-        weights = self.dataframe[self.weight_key].copy()
-        data_df, count = self.get_correct_categories_count()
-
-        tot = pd.concat([score_df, count], axis=1)
-
-        conditional_scores = list()
-        sum_per_number_of_cat = list()
-
-        total_sum = 0
-        mask_tot: pd.Series = None
-        for number_of_cat in range(0, 5):
-            mask = tot["count"] == number_of_cat
-            tot_cond = tot.loc[mask, "score"]
-            sel_df = data_df[mask]
-            sum_per_number_of_cat.append(sel_df.sum(axis=0))
-            ww = weights[mask].to_numpy()
-            if mask_tot is None:
-                mask_tot = mask
-            else:
-                mask_tot = mask_tot | mask
-            hist, bin_edge = np.histogram(
-                tot_cond.to_numpy(),
-                weights=ww,
-                density=False,
-                range=(0, 100),
-                bins=self.n_bins,
-            )
-            hist_sum = hist.sum()
-            total_sum += hist_sum
-            conditional_scores.append(hist)
-
-        sum_per_number_of_cat_df = pd.DataFrame.from_records(sum_per_number_of_cat)
+        scores = self.dataframe["percentage"].to_numpy(dtype=float)
+        weights = self.dataframe[self.weight_key].to_numpy()
+        verdicts, count = self.get_correct_categories_count()
+
+        # een rij per aantal goede categorieën, van 0 tot en met alle categorieën
+        n_counts = len(verdicts.columns) + 1
+        count_codes = count.to_numpy()
+
+        # het gewogen histogram van de score per aantal goede categorieën in een keer
+        bin_edge = np.linspace(0, 100, self.n_bins + 1)
+        score_bins = get_histogram_bins(scores, bin_edge)
+        in_range = score_bins >= 0
+        conditional_scores = np.bincount(
+            count_codes[in_range] * self.n_bins + score_bins[in_range],
+            weights=weights[in_range],
+            minlength=n_counts * self.n_bins,
+        ).reshape(n_counts, self.n_bins)
+        conditional_scores = conditional_scores.astype(weights.dtype, copy=False)
+        total_sum = sum(conditional_scores.sum(axis=1))
+
+        sum_per_number_of_cat_df = verdicts.column_counts_per_group(
+            count_codes, n_groups=n_counts
+        )
         bin_width = bin_edge[1] - bin_edge[0]
 
-        conditional_scores_df = pd.DataFrame().from_records(conditional_scores)
+        conditional_scores_df = pd.DataFrame(conditional_scores)
         conditional_scores_df.index = conditional_scores_df.index.rename("n_categories")
         conditional_scores_df = conditional_scores_df.T
         conditional_scores_df.index = bin_edge[:-1]
@@ -639,13 +1222,15 @@ class DomainAnalyser:
         )
         _logger.info(f"Writing to {sum_file}")
         sum_per_number_of_cat_df.to_pickle(sum_file)
+        write_fingerprint(self.cate_pkl_file, fingerprint)
 
     def calculate_correlations_and_scores(self):
 
+        fingerprint = self.get_correlations_fingerprint()
         if (
-            self.corr_pkl_file.exists()
-            and self.score_pkl_file.exists()
-            and self.reset is None
+            self.reset is None
+            and self.cache_is_valid(self.corr_pkl_file, fingerprint)
+            and self.cache_is_valid(self.score_pkl_file, fingerprint)
         ):
             _logger.info(
                 f"Cache {self.corr_pkl_file} and {self.score_pkl_file} already exist. "
@@ -665,10 +1250,7 @@ class DomainAnalyser:
         col_sel = list(index_columns.keys())
 
         _logger.debug(f"make selection\n{col_sel}")
-        data_df: pd.DataFrame = self.dataframe[col_sel]
-
-        # alleen 1 wordt als succes beschouwd
-        data_df = data_df == 1
+        verdicts = self.get_verdict_matrix(col_sel)
 
         # verkrijg de categorieën van variabele met hoge correlatie
         categories = dict()
@@ -682,19 +1264,26 @@ class DomainAnalyser:
         self.score_df = self.dataframe[["percentage"]].copy() / 100
         self.score_df.rename(columns={"percentage": "score"}, inplace=True)
         for categorie, columns in categories.items():
-            selection = data_df[columns]
             max_score = len(columns)
-            self.score_df[categorie] = selection.sum(axis=1) / max_score
+            self.score_df[categorie] = verdicts.record_counts(columns) / max_score
 
         self.score_df = pd.concat([self.score_df, count], axis=1)
 
-        desc = data_df.describe()
-        _logger.debug(f"making descr\n{desc}")
-        # reken correlatie twee keer uit
-        corr = data_df.corr()
+        if _logger.isEnabledFor(logging.DEBUG):
+            desc = verdicts.to_frame().describe()
+            _logger.debug(f"making descr\n{desc}")
+
+        if self.correlations.get("weighted", False):
+            # gewogen met de schaalfactor van de microdata
+            corr = calculate_correlations(
+                verdicts.to_frame(), weights=self.dataframe[self.weight_key].to_numpy()
+            )
+        else:
+            # ongewogen volgen de correlaties uit de tellingen op de bits
+            corr = verdicts.correlations()
+        # orden op de som van de correlaties. Dat is alleen een permutatie van de matrix
         ordered_index = corr.sum().sort_values(ascending=False).index
-        data_df = data_df[ordered_index]
-        corr = data_df.corr()
+        corr = corr.loc[ordered_index, ordered_index]
         self.correlation_coefficient_df = corr
 
         _logger.info(f"Schrijf naar {self.corr_outfile}")
@@ -705,6 +1294,8 @@ class DomainAnalyser:
 
         _logger.info(f"Schrijf naar {self.score_pkl_file}")
         self.score_df.to_pickle(self.score_pkl_file.as_posix())
+        write_fingerprint(self.corr_pkl_file, fingerprint)
+        write_fingerprint(self.score_pkl_file, fingerprint)
         _logger.debug(f"making corrected\n{corr}")
 
     def calculate_statistics(self):
@@ -712,51 +1303,377 @@ class DomainAnalyser:
 
         self.all_stats_per_format = dict()
         self.all_hist_per_format = dict()
-        missing_groups = None
 
+        group_by_per_file_base = self.get_breakdowns_to_calculate()
+        self.load_variable_caches(group_by_per_file_base)
+        # factoriseer alle breakdown kolommen voordat de breakdowns geforkt worden
+        for group_by in group_by_per_file_base.values():
+            for group in group_by:
+                self.get_column_codes(group)
+        self.statistics_cube = self.make_statistics_cube(group_by_per_file_base)
+        try:
+            with self.start_breakdown_jobs(group_by_per_file_base) as breakdown_futures:
+                self.collect_statistics(breakdown_futures)
+        finally:
+            self.statistics_cube = None
+            self.variable_caches = dict()
+            self.column_hashes = dict()
+            self.column_codes = dict()
+
+    def get_microdata_values(self, column: str) -> pd.Index:
+        """Geef de waardes van een kolom of index level van de microdata, of None"""
+        if column in self.dataframe.columns:
+            return pd.Index(self.dataframe[column])
+        if column in self.dataframe.index.names:
+            return self.dataframe.index.get_level_values(column)
+        return None
+
+    def get_column_codes(self, column: str):
+        """
+        Geef de gefactoriseerde codes van een breakdown kolom van de microdata. Die
+        worden een keer per dataframe berekend en door alle breakdowns gedeeld
+
+        Returns:
+            tuple: het resultaat van factorize_values of None als de kolom niet bestaat
+        """
+        if column not in self.column_codes:
+            values = self.get_microdata_values(column)
+            if values is None:
+                self.column_codes[column] = None
+            else:
+                self.column_codes[column] = factorize_values(values)
+        return self.column_codes[column]
+
+    def records_are_aligned(self, dataframe: pd.DataFrame) -> bool:
+        """
+        De gedeelde codes gelden alleen als de data van de breakdown dezelfde records in
+        dezelfde volgorde heeft als de microdata
+        """
+        if dataframe is self.dataframe:
+            return True
+        be_ids = self.get_microdata_values(self.be_id)
+        if be_ids is None or be_ids.size != len(dataframe.index):
+            return False
+        if self.be_id in dataframe.index.names:
+            breakdown_be_ids = dataframe.index.get_level_values(self.be_id)
+        elif self.be_id in dataframe.columns:
+            breakdown_be_ids = dataframe[self.be_id]
+        else:
+            return False
+        return np.array_equal(be_ids.to_numpy(), np.asarray(breakdown_be_ids))
+
+    def get_breakdown_codes(self, dataframe: pd.DataFrame, group_by: list):
+        """
+        Geef de groep codes per record van een breakdown uit de gedeelde kolom codes
+
+        Returns:
+            tuple: de groep codes en de groep index, of None als we ze niet kunnen delen
+        """
+        column_codes = [self.get_column_codes(group) for group in group_by]
+        if any(codes is None for codes in column_codes):
+            return None
+        if not self.records_are_aligned(dataframe):
+            _logger.debug(
+                "Records of breakdown differ from micro data. No shared codes"
+            )
+            return None
+        return get_group_codes_from_columns(column_codes, group_by)
+
+    def get_variable_cache_file(self, file_base: str) -> Path:
+        """De cache file met de statistiek per variabele van een breakdown"""
+        file_name = Path(
+            "_".join([file_base, self.scan_data_key, "variables"]) + ".pkl"
+        )
+        return self.cache_directory / file_name
+
+    def get_column_hash(self, column: str) -> str:
+        """
+        Geef de hash van een kolom of index level van de microdata. De hash wordt per
+        kolom maar een keer berekend
+        """
+        if column not in self.column_hashes:
+            if column in self.dataframe.columns:
+                values = self.dataframe[column]
+            elif column in self.dataframe.index.names:
+                values = pd.Series(self.dataframe.index.get_level_values(column))
+            else:
+                values = None
+            self.column_hashes[column] = None if values is None else hash_column(values)
+        return self.column_hashes[column]
+
+    def get_variable_fingerprints(self, group_by: list) -> dict:
+        """
+        Fingerprint van de statistiek van iedere variabele in een breakdown. Deze hangt
+        af van de data van de breakdown, de variabele, zijn gewichten en filter en van
+        de settings van de variabele, maar niet van de andere variabelen.
+
+        Returns:
+            dict: per variabele de fingerprint
+        """
+        group_hashes = [self.get_column_hash(name) for name in group_by + [self.be_id]]
+        fingerprints = dict()
+        for var_key, var_prop in self.variables.iterrows():
+            var_weight_key = var_prop["gewicht"]
+            columns = [
+                var_key,
+                var_weight_key,
+                "_".join(["ratio", var_weight_key]),
+                "_".join(["ratio", "units"]),
+            ]
+            if var_prop["filter"] is not None:
+                columns.extend(sorted(get_eval_column_names(var_prop["filter"])))
+            fingerprints[var_key] = make_fingerprint(
+                __version__,
+                group_by,
+                group_hashes,
+                self.n_bins,
+                var_key,
+                get_variable_fingerprint_settings(var_prop),
+                {column: self.get_column_hash(column) for column in columns},
+            )
+        return fingerprints
+
+    def load_variable_caches(self, group_by_per_file_base: dict):
+        """
+        Lees voor alle breakdowns die we moeten berekenen de statistiek per variabele
+        uit de cache. Alleen variabelen met een geldige fingerprint worden gebruikt.
+        """
+        self.variable_caches = dict()
+        for file_base, group_by in group_by_per_file_base.items():
+            fingerprints = self.get_variable_fingerprints(group_by)
+            histogram_variables = self.get_histogram_variables(file_base)
+            cached_variables = dict()
+            cache_file = self.get_variable_cache_file(file_base)
+            if self.reset is None and cache_file.exists():
+                with open(str(cache_file), "rb") as stream:
+                    stored_variables = pickle.load(stream)
+                for var_key, (fingerprint, stats, hist) in stored_variables.items():
+                    if fingerprints.get(var_key) != fingerprint:
+                        continue
+                    # een variabele zonder histogram moet opnieuw berekend worden als we
+                    # het histogram nu wel nodig hebben
+                    if hist is None and (
+                        histogram_variables is None or var_key in histogram_variables
+                    ):
+                        continue
+                    cached_variables[var_key] = (stats, hist)
+                _logger.info(
+                    f"Found {len(cached_variables)} of {len(stored_variables)} "
+                    f"variables of {file_base} in {cache_file}"
+                )
+            self.variable_caches[file_base] = (fingerprints, cached_variables)
+
+    def write_variable_cache(self, file_base: str, all_stats: dict, all_hist: dict):
+        """Sla de statistiek van een breakdown per variabele op met zijn fingerprint"""
+        fingerprints, _ = self.variable_caches.get(file_base, (None, None))
+        if fingerprints is None:
+            return
+        stored_variables = {
+            var_key: (fingerprints[var_key], stats, all_hist.get(var_key))
+            for var_key, stats in all_stats.items()
+            if var_key in fingerprints
+        }
+        cache_file = self.get_variable_cache_file(file_base)
+        _logger.debug(f"Writing {len(stored_variables)} variables to {cache_file}")
+        with open(str(cache_file), "wb") as stream:
+            pickle.dump(stored_variables, stream)
+
+    def get_breakdowns_to_calculate(self):
+        """
+        Geef de breakdowns die we uit de microdata moeten berekenen omdat ze niet in de
+        cache staan. Combinaties komen uit hun onderdelen en tellen niet mee.
+
+        Returns:
+            dict: per file_base de group_by variabelen
+        """
+        group_by_per_file_base = dict()
+        if self.dataframe is None:
+            return group_by_per_file_base
         for file_base, props in self.statistics.items():
-            scan_data = props.get("scan_data", self.scan_data_key)
-            if scan_data != self.scan_data_key:
-                _logger.debug(f"SKipping {scan_data} for {self.scan_data_key}")
+            if not self.breakdown_is_requested(file_base, props):
+                continue
+            if props.get("combination") is not None:
+                continue
+            cache_file = self.get_breakdown_cache_file(file_base)
+            fingerprint = self.get_breakdown_fingerprint(file_base, props)
+            if self.reset is None and self.cache_is_valid(cache_file, fingerprint):
                 continue
+            group_by, _ = self.get_breakdown_group_by(props)
+            group_by_per_file_base[file_base] = group_by
+        return group_by_per_file_base
 
-            if not props.get("do_it", True):
-                _logger.debug(
-                    f"SKipping breakdown {file_base} for {self.scan_data_key}"
-                )
+    def make_statistics_cube(self, group_by_per_file_base: dict):
+        """
+        Bereken de gewogen sommen van de batch variabelen een keer op de fijnste
+        indeling van alle breakdowns. De breakdowns tellen daarna alleen de cellen op.
+
+        Returns:
+            StatisticsCube of None als er minder dan twee breakdowns te berekenen zijn
+        """
+        if not self.batch_statistics or len(group_by_per_file_base) < 2:
+            return None
+
+        group_columns = list()
+        for group_by in group_by_per_file_base.values():
+            for group in group_by:
+                if group not in group_columns and group in self.dataframe.columns:
+                    group_columns.append(group)
+        if not group_columns:
+            return None
+
+        try:
+            dataframe = prepare_df_for_statistics(
+                self.dataframe,
+                index_names=group_columns + [self.be_id],
+                units_key="units",
+            )
+        except KeyError:
+            _logger.info(f"Cannot make a statistics cube of {group_columns}")
+            return None
+
+        _, batch_variables = self.select_variables(
+            dataframe, warn_missing_modules=False
+        )
+        # variabelen die voor alle breakdowns in de cache staan hoeven niet in de kubus
+        cached_everywhere = set.intersection(
+            *[
+                set(cached_variables)
+                for _, cached_variables in self.variable_caches.values()
+            ]
+        )
+        batch_variables = {
+            var_key: batch_info
+            for var_key, batch_info in batch_variables.items()
+            if var_key not in cached_everywhere
+        }
+        if not batch_variables:
+            return None
+        column_codes = None
+        if self.records_are_aligned(dataframe):
+            column_codes = [self.get_column_codes(group) for group in group_columns]
+        return StatisticsCube(
+            dataframe=dataframe,
+            group_columns=group_columns,
+            batch_variables=batch_variables,
+            column_codes=column_codes,
+        )
+
+    def get_breakdown_group_by(self, props):
+        """
+        Geef de variabelen waarop we de breakdown groeperen. Als die niet in de data
+        zitten, gebruik dan de variabelen uit groupby_if_not_exist
+
+        Returns:
+            list, list: de group_by variabelen en de oorspronkelijke group_by variabelen
+            (None als de oorspronkelijke gebruikt worden)
+        """
+        group_by = list(props["groupby"].values())
+        group_by_original = None
+        if (
+            group_by_if_not_exist := props.get("groupby_if_not_exist")
+        ) and self.dataframe is not None:
+            have_missing_groups = False
+            for group in group_by:
+                if group not in self.dataframe.columns:
+                    have_missing_groups = True
+            if have_missing_groups:
+                group_by_original = group_by
+                group_by = list(group_by_if_not_exist.values())
+        return group_by, group_by_original
+
+    @contextmanager
+    def start_breakdown_jobs(self, group_by_per_file_base: dict):
+        """
+        Start de berekening van alle breakdowns die uit de microdata berekend moeten
+        worden in een process pool met self.jobs processen. De processen worden met fork
+        gestart, zodat ze de dataframe delen zonder die te kopiëren.
+
+        Args:
+            group_by_per_file_base: dict
+                De breakdowns die we moeten berekenen met hun group_by variabelen
+
+        Yields:
+            dict: per file_base de future met het resultaat van
+            calculate_statistics_one_breakdown. Leeg als we niet parallel rekenen
+        """
+        global _forked_analyser
+
+        breakdown_futures = dict()
+        if self.jobs is None or self.jobs < 2 or self.dataframe is None:
+            yield breakdown_futures
+            return
+        if "fork" not in multiprocessing.get_all_start_methods():
+            _logger.info("Parallel breakdowns need fork. Calculating them one by one")
+            yield breakdown_futures
+            return
+
+        if len(group_by_per_file_base) < 2:
+            yield breakdown_futures
+            return
+
+        _logger.info(
+            f"Calculating {len(group_by_per_file_base)} breakdowns "
+            f"with {self.jobs} processes"
+        )
+        _forked_analyser = self
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.jobs, mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                for file_base, group_by in group_by_per_file_base.items():
+                    breakdown_futures[file_base] = executor.submit(
+                        calculate_breakdown_in_fork, group_by, file_base
+                    )
+                yield breakdown_futures
+        finally:
+            _forked_analyser = None
+
+    def collect_statistics(self, breakdown_futures: dict):
+        """
+        Verzamel de statistieken van alle breakdowns. Combinaties worden samengesteld
+        zodra hun onderdelen klaar zijn
+
+        Args:
+            breakdown_futures: dict
+                De breakdowns die al in een process pool berekend worden
+        """
+        missing_groups = None
+
+        for file_base, props in self.statistics.items():
+            if not self.breakdown_is_requested(file_base, props):
                 continue
 
             _logger.info(f"Processing {file_base}")
 
-            file_name = Path("_".join([file_base, self.scan_data_key]) + ".pkl")
-            cache_file = self.cache_directory / file_name
+            cache_file = self.get_breakdown_cache_file(file_base)
+            fingerprint = self.get_breakdown_fingerprint(file_base, props)
 
-            group_by = list(props["groupby"].values())
-            group_by_original = None
-            if (
-                group_by_if_not_exist := props.get("groupby_if_not_exist")
-            ) and self.dataframe is not None:
-                have_missing_groups = False
-                for group in group_by:
-                    if group not in self.dataframe.columns:
-                        have_missing_groups = True
-                if have_missing_groups:
-                    group_by_original = group_by
-                    group_by = list(group_by_if_not_exist.values())
-                    missing_groups = props.get("missing_groups")
+            group_by, group_by_original = self.get_breakdown_group_by(props)
+            if group_by_original is not None:
+                missing_groups = props.get("missing_groups")
 
             combination: list = props.get("combination")
 
             if combination is None:
-                if cache_file.exists() and self.reset is None:
+                if (
+                    file_base not in breakdown_futures
+                    and self.reset is None
+                    and self.cache_is_valid(cache_file, fingerprint)
+                ):
                     _logger.info(f"Reading stats from cache {cache_file}")
                     with open(str(cache_file), "rb") as stream:
                         stat_df, all_hist = pickle.load(stream)
                 elif self.dataframe is not None:
-                    _logger.info("Calculating statistics from micro data")
-                    all_stats, all_hist = self.calculate_statistics_one_breakdown(
-                        group_by=group_by
-                    )
+                    if file_base in breakdown_futures:
+                        _logger.info("Collecting statistics calculated in parallel")
+                        all_stats, all_hist = breakdown_futures[file_base].result()
+                    else:
+                        _logger.info("Calculating statistics from micro data")
+                        all_stats, all_hist = self.calculate_statistics_one_breakdown(
+                            group_by=group_by, file_base=file_base
+                        )
+                    if all_stats is not None:
+                        self.write_variable_cache(file_base, all_stats, all_hist)
                     if group_by_original is not None:
                         all_stats = add_missing_groups(
                             all_stats, group_by, group_by_original, missing_groups
@@ -776,6 +1693,7 @@ class DomainAnalyser:
                     _logger.info(f"Writing stats to cache {cache_file}")
                     with open(str(cache_file), "wb") as stream:
                         pickle.dump([stat_df, all_hist], stream)
+                    write_fingerprint(cache_file, fingerprint)
                 else:
                     _logger.info(f"Statistics not available for {group_by}. Skipping")
                     continue
@@ -815,24 +1733,44 @@ class DomainAnalyser:
             self.dataframe.to_sql(name="dataframe", con=connection, if_exists="replace")
 
     def read_data(self):
-        if not self.cache_file.exists() or self.reset == 0:
-
-            index_name = self.be_id
-            _logger.info(f"Reading table data from {self.records_cache_info.file_name}")
-            records = read_tables_from_sqlite(
-                self.records_cache_info.file_name,
-                self.records_cache_info.table_names,
-                index_name,
-            )
+        if self.reset == 0 or not self.cache_is_valid(
+            self.cache_file, self.microdata_fingerprint
+        ):
+
+            if self.column_projection:
+                required_columns = self.get_required_columns()
+                _logger.info(f"Reading only {len(required_columns)} required columns")
+            else:
+                required_columns = None
 
             table_names = ["report", "scoring", "status", "results"]
-            index_name = "index"
             _logger.info(
-                f"Reading tables {table_names} from {self.internet_nl_filename}"
-            )
-            tables = read_tables_from_sqlite(
-                self.internet_nl_filename, table_names, index_name
+                f"Reading table data from {self.records_cache_info.file_name} and "
+                f"tables {table_names} from {self.internet_nl_filename}"
             )
+            record_table_names = self.records_cache_info.table_names
+            if isinstance(record_table_names, str):
+                record_table_names = [record_table_names]
+            # de records cache en de internet.nl tabellen zijn onafhankelijk: lees de
+            # tabellen van beide files tegelijk in een pool van io_workers threads
+            max_workers = self.io_workers or len(record_table_names) + len(table_names)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                records_futures = submit_table_reads(
+                    executor,
+                    self.records_cache_info.file_name,
+                    record_table_names,
+                    self.be_id,
+                    columns=required_columns,
+                )
+                tables_futures = submit_table_reads(
+                    executor,
+                    self.internet_nl_filename,
+                    table_names,
+                    "index",
+                    columns=required_columns,
+                )
+                records = collect_tables(records_futures)
+                tables = collect_tables(tables_futures)
             _logger.info(f"Done")
             tables.reset_index(inplace=True)
             tables.rename(columns=dict(index=self.url_key), inplace=True)
@@ -860,60 +1798,20 @@ class DomainAnalyser:
             tables = pd.concat([tables_num, tables_non_num], axis=1)
             tables = tables[original_columns]
 
-            self.translations["nans"] = dict(nan=0)
-
             if self.translations is not None:
+                # voeg de nan vertaling toe aan een kopie, zodat de translations uit de
+                # settings (en de fingerprint van volgende jaren) gelijk blijven
+                translations = self.translations.copy()
+                translations["nans"] = dict(nan=0)
                 tables = fill_booleans(
                     tables,
-                    translations=self.translations.copy(),
+                    translations=translations,
                     variables=self.variables,
                 )
 
             rename_all_variables(tables, self.variables)
 
-            for column in tables:
-                try:
-                    var_props = self.variables.loc[column, :]
-                except KeyError:
-                    _logger.debug(f"Column {column} not defined in settings. Skipping")
-                    continue
-
-                var_type = var_props.get("type")
-                var_translate = var_props.get("translateopts")
-
-                if var_translate is not None:
-                    # op deze manier kunnen we de vertaling {Nee: 0, Ja: 1} op de column waardes los
-                    # laten, zodat we alle Nee met 0 en Ja met 1 vervangen
-                    trans = yaml.load(str(var_translate), Loader=yaml.Loader)
-                    for nan_string in ("na", "nan", "NaN"):
-                        if nan_string in trans.keys():
-                            # we have added an 'na' option for the translations. Take care of it
-                            is_na = tables[column].isna()
-                            if is_na.any():
-                                # should not happen anymore because of the dropna above
-                                _logger.info(
-                                    f"Filling {nan_string} with na in {column}"
-                                )
-                                tables[column] = tables[column].fillna(nan_string)
-
-                    unique_values = set(tables[column].unique())
-                    vals_to_translate = set(trans.keys()).intersection(unique_values)
-                    missing_values = unique_values.difference(set(trans.keys()))
-                    if vals_to_translate:
-                        if missing_values:
-                            _logger.warning(
-                                f"Column {column} misses the translations for "
-                                f"{missing_values}. Please update your settings"
-                            )
-                        _logger.debug(f"Convert for {column} trans keys {trans}")
-                        tables[column] = tables[column].map(trans)
-                    else:
-                        _logger.debug(f"No Convert for {column} trans keys {trans}")
-
-                if var_type == "dict":
-                    tables[column] = tables[column].astype("category")
-                elif var_type in ("bool", "percentage", "float"):
-                    tables[column] = tables[column].astype("float64")
+            tables = apply_translation_plan(tables, self.translation_plan)
 
             # Hier gaan we de url name opschonen. Sla eerst de oorspronkelijke url op
             original_url = "_".join([self.url_key, "original"])
@@ -930,20 +1828,14 @@ class DomainAnalyser:
                 show_progress = True
             else:
                 show_progress = False
-            clean_url_cache = self.cache_directory / Path("clean_url_cache.pkl")
-            if clean_url_cache.exists():
-                _logger.info(f"Reading clean urls from cache {clean_url_cache}")
-                with open(clean_url_cache, "rb") as stream:
-                    all_clean_urls, all_suffix = pickle.load(stream)
-            else:
-                all_clean_urls, all_suffix = get_all_clean_urls(
-                    urls=records[self.url_key],
-                    show_progress=show_progress,
-                    cache_directory=self.tld_extract_cache_directory,
-                )
-                _logger.info(f"Writing clean urls to cache {clean_url_cache}")
-                with open(clean_url_cache, "wb") as stream:
-                    pickle.dump([all_clean_urls, all_suffix], stream)
+            all_clean_urls, all_suffix = get_all_clean_urls(
+                urls=records[self.url_key],
+                show_progress=show_progress,
+                cache_directory=self.tld_extract_cache_directory,
+                use_tldextract=self.use_tldextract,
+                url_store_file=self.url_store_file,
+                workers=self.url_workers,
+            )
             _logger.info("Done!")
             records[self.url_key] = all_clean_urls
             suffix_df = pd.DataFrame(
@@ -991,13 +1883,25 @@ class DomainAnalyser:
                 f"Writing {self.dataframe.index.size} records to "
                 f"cache {self.cache_file.absolute()}"
             )
-            with open(str(self.cache_file), "wb") as stream:
-                self.dataframe.to_pickle(stream)
+            write_dataframe_cache(
+                dataframe=self.dataframe,
+                file_name=self.cache_file,
+                cache_format=self.cache_format,
+            )
+            write_fingerprint(self.cache_file, self.microdata_fingerprint)
 
         else:
             _logger.debug(f"Reading tables from cache {self.cache_file}")
-            with open(str(self.cache_file), "rb") as stream:
-                self.dataframe = pd.read_pickle(stream)
+            if self.column_projection:
+                # met een kolom formaat lezen we alleen de kolommen die we nodig hebben
+                required_columns = self.get_required_columns()
+            else:
+                required_columns = None
+            self.dataframe = read_dataframe_cache(
+                file_name=self.cache_file,
+                cache_format=self.cache_format,
+                columns=required_columns,
+            )
             _logger.info(
                 f"Read {self.dataframe.index.size} records from "
                 f"cache {self.cache_file.absolute()}"
@@ -1089,6 +1993,9 @@ class DomainPlotter:
         self.image_info.write_cache()
 
         if latex_files:
+            # pylatex laden we pas als we ook echt latex files maken
+            from internetnl_domain_analyse.latex_output import make_latex_overview
+
             _logger.debug(f"making latex with bovenschrift={bovenschrift}")
             make_latex_overview(
                 image_info=self.image_info,
@@ -1126,6 +2033,15 @@ class DomainPlotter:
         return stats_df_per_year
 
     def make_plots(self, add_logo=True):
+        # matplotlib, seaborn en cbsplotlib laden we pas als we echt plaatjes maken
+        import matplotlib.pyplot as plt
+
+        from internetnl_domain_analyse.domain_plots import (
+            make_cdf_plot,
+            make_bar_plot,
+            make_bar_plot_stacked,
+        )
+
         _logger.info("Making the plot")
 
         legend_translates = dict()
@@ -1567,9 +2483,10 @@ class DomainPlotter:
                                         f"Year {year} does not have data. Skipping"
                                     )
                                     continue
+                                # alleen cdf plot variabelen hebben een histogram
                                 hist_info = scan_data_analyses_year.all_hist_per_format[
                                     plot_key
-                                ][original_name]
+                                ].get(original_name)
                                 highcharts_info = highcharts_info_per_year[year]
 
                                 if hist_info is not None and isinstance(
@@ -1731,35 +2648,14 @@ def calculate_histogram_per_breakdown(
 
     """
 
-    histogram_per_breakdown = dict()
-
-    for grp_key, df in data.groupby(level=0):
-        # initieer histogram voor deze breakdown met None
-        histogram_per_breakdown[grp_key] = None
-
-        try:
-            ww = df_weights.loc[grp_key, "ratio_units"].to_numpy()
-        except KeyError:
-            _logger.debug("Could not get weight factors. Skip for now")
-            continue
-        try:
-            dd = df.loc[grp_key, var_key].to_numpy()
-        except KeyError:
-            _logger.debug(f"Could not get data belonging to {var_key}. Skip for now")
-            continue
-
-        try:
-            histogram = np.histogram(
-                dd,
-                weights=ww,
-                density=False,
-                bins=n_bins,
-                range=(0, 100),
-            )
-        except ValueError as err:
-            _logger.debug("Fails for dicts. Skip for now")
-        else:
-            _logger.debug(f"Success with {var_key}")
-            histogram_per_breakdown[grp_key] = histogram
-
-    return histogram_per_breakdown
+    try:
+        weights = df_weights["ratio_units"].to_numpy()
+    except KeyError:
+        _logger.debug("Could not get weight factors. Skip for now")
+        return dict.fromkeys(data.groupby(level=0, observed=False).size().index)
+    if var_key not in data.columns:
+        _logger.debug(f"Could not get data belonging to {var_key}. Skip for now")
+        return dict.fromkeys(data.groupby(level=0, observed=False).size().index)
+
+    histograms = calculate_histograms(data[[var_key]], weights=weights, n_bins=n_bins)
+    return histograms[var_key]
@@ -1,27 +1,41 @@
 import argparse
+import hashlib
 import logging
-import codecs
 import logging
+import pickle
 from datetime import datetime
 import os
+import platform
 import sys
 from pathlib import Path
 
+import pandas as pd
 import yaml
 
 from internetnl_domain_analyse import __version__
+from internetnl_domain_analyse.cache_utils import (
+    CACHE_FORMATS,
+    fingerprint_matches,
+    make_fingerprint,
+    write_fingerprint,
+)
 from internetnl_domain_analyse.domain_analyse_classes import (
+    EXCEL_ENGINES,
     DomainAnalyser,
     DomainPlotter,
     RecordCacheInfo,
 )
-from internetnl_domain_analyse.domain_plots import (
-    make_heatmap,
-    make_conditional_score_plot,
-    make_conditional_pdf_plot,
-    make_verdeling_per_aantal_categorie,
+from internetnl_domain_analyse.utils import (
+    get_windows_or_linux_value,
+    variable_dict2df,
+    compile_translation_plan,
 )
-from internetnl_domain_analyse.utils import get_windows_or_linux_value
+
+# de C versie van de yaml loader is veel sneller, maar is niet altijd geïnstalleerd
+try:
+    YamlLoader = yaml.CLoader
+except AttributeError:
+    YamlLoader = yaml.Loader
 
 logging.basicConfig(
     format="%(asctime)s %(filename)25s[%(lineno)4s] - %(levelname)-8s : %(message)s",
@@ -32,6 +46,7 @@ _log_hc = logging.getLogger("cbsplotlib")
 _log_hc.setLevel(_logger.getEffectiveLevel())
 
 MODES = {"statistics", "correlations", "categories", "all"}
+SETTINGS_CACHE_DIRECTORY = "cache"
 IMAGE_TYPES = {"pdf", "png"}
 
 
@@ -87,6 +102,18 @@ def parse_args():
         help="Write the statistics ot an excel file",
         action="store_true",
     )
+    parser.add_argument(
+        "--excel_engine",
+        choices=EXCEL_ENGINES,
+        help="Engine waarmee de statistieken naar excel geschreven worden. xlsxwriter "
+        "is sneller dan openpyxl, maar moet apart geïnstalleerd worden",
+    )
+    parser.add_argument(
+        "--excel_per_breakdown",
+        help="Schrijf iedere breakdown naar een eigen excel file. Met --jobs worden de "
+        "files tegelijk geschreven",
+        action="store_true",
+    )
     parser.add_argument(
         "--write_dataframe_to_sqlite",
         action="store_true",
@@ -159,7 +186,12 @@ def parse_args():
         help="Directory waar alle highcharts naar toe geschreven wordt",
     )
     parser.add_argument(
-        "--mode", choices=MODES, default="statistics", help="Type  analyse die we doen"
+        "--mode",
+        choices=MODES,
+        nargs="+",
+        default=["statistics"],
+        help="Type  analyse die we doen. Meerdere modes worden op een keer inlezen "
+        "van de microdata gedaan",
     )
     parser.add_argument(
         "--bovenschrift",
@@ -216,6 +248,36 @@ def parse_args():
         "script naar cache wilt laten lezen"
         "en schrijven",
     )
+    parser.add_argument(
+        "--use_tldextract",
+        help="Gebruik tldextract om de suffix te bepalen in plaats van de meegeleverde "
+        "public suffix list. tldextract kan de lijst via het netwerk verversen",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Aantal processen waarmee nieuwe urls opgeschoond worden. Standaard 1",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Aantal processen waarmee de breakdowns tegelijk berekend worden. Werkt "
+        "alleen op systemen met fork (Linux)",
+    )
+    parser.add_argument(
+        "--no_batch_statistics",
+        help="Bereken de statistieken van iedere variabele apart met "
+        "WeightedSampleStatistics in plaats van alle numerieke variabelen in een keer",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--no_settings_cache",
+        help="Lees de settings file altijd opnieuw in plaats van de gecompileerde "
+        f"settings uit de directory '{SETTINGS_CACHE_DIRECTORY}' naast de settings "
+        "file te gebruiken",
+        action="store_true",
+    )
     parser.add_argument(
         "--dump_cache_as_sqlite",
         help="Dump de cache files als sqlite zodat je ze in kan zien",
@@ -226,6 +288,25 @@ def parse_args():
         help="Gebruik Engelse vertaling voor labels van plaatjes",
         action="store_true",
     )
+    parser.add_argument(
+        "--column_projection",
+        action="store_true",
+        default=None,
+        help="Lees alleen de kolommen uit de sqlite tabellen die in de settings "
+        "file gebruikt worden",
+    )
+    parser.add_argument(
+        "--io_workers",
+        type=int,
+        help="Aantal threads om de sqlite tabellen tegelijk te lezen. Als niet gegeven "
+        "dan krijgt iedere tabel een eigen thread. Met 1 lees je de tabellen na elkaar",
+    )
+    parser.add_argument(
+        "--cache_format",
+        choices=CACHE_FORMATS.keys(),
+        help="Formaat van de cache met de microdata. Met parquet of feather kunnen we "
+        "alleen de benodigde kolommen lezen",
+    )
     parser.add_argument(
         "--no_logo",
         action="store_true",
@@ -267,6 +348,80 @@ def set_do_it_vlaggen(required_keys, chapter_info, recursive=False):
     return chapter_info
 
 
+def compile_settings(settings_filename, cache_directory=None) -> dict:
+    """
+    Lees de settings file en maak voor ieder scan type de variabelen tabel en het
+    vertaalplan. Het resultaat wordt als pickle opgeslagen met een fingerprint van de
+    inhoud van de settings file en de versies van dit package, Python en pandas, zodat
+    we bij een ongewijzigde settings file niets opnieuw hoeven te doen.
+
+    Args:
+        settings_filename: str
+            De yaml settings file
+        cache_directory: str or None
+            Directory voor de gecompileerde settings. Een relatief pad is ten opzichte
+            van de directory van de settings file. Als None wordt er geen cache gebruikt
+
+    Returns:
+        dict: met 'settings', 'variables_df' en 'translation_plans'. De laatste twee
+        zijn dicts per scan type
+    """
+    settings_file = Path(settings_filename)
+    settings_bytes = settings_file.read_bytes()
+    # een pickle van een andere Python of pandas versie is niet altijd te lezen
+    fingerprint = make_fingerprint(
+        __version__,
+        platform.python_version(),
+        pd.__version__,
+        hashlib.sha256(settings_bytes).hexdigest(),
+    )
+
+    cache_file = None
+    if cache_directory is not None:
+        # de cache staat bij de settings file, waar we het script ook starten
+        cache_file = (
+            settings_file.parent
+            / Path(cache_directory)
+            / Path("_".join(["settings", settings_file.stem]) + ".pkl")
+        )
+        if fingerprint_matches(cache_file, fingerprint):
+            _logger.info(f"Reading compiled settings from {cache_file}")
+            with open(cache_file, "rb") as stream:
+                return pickle.load(stream)
+
+    _logger.info("Reading settings file {}".format(settings_filename))
+    settings = yaml.load(settings_bytes.decode("UTF-8"), Loader=YamlLoader)
+
+    variables_df = dict()
+    translation_plans = dict()
+    for scan_type, variables in settings.get("variables", dict()).items():
+        try:
+            var_df = variable_dict2df(
+                variables, module_info=settings.get("module_info")
+            )
+        except (ValueError, KeyError, TypeError) as err:
+            # dan maakt de DomainAnalyser de tabel zelf en geeft die de foutmelding
+            _logger.debug(f"Could not compile variables of {scan_type}: {err}")
+            continue
+        variables_df[scan_type] = var_df
+        translation_plans[scan_type] = compile_translation_plan(var_df)
+
+    compiled_settings = dict(
+        settings=settings,
+        variables_df=variables_df,
+        translation_plans=translation_plans,
+    )
+
+    if cache_file is not None:
+        cache_file.parent.mkdir(exist_ok=True, parents=True)
+        _logger.info(f"Writing compiled settings to {cache_file}")
+        with open(cache_file, "wb") as stream:
+            pickle.dump(compiled_settings, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        write_fingerprint(cache_file, fingerprint)
+
+    return compiled_settings
+
+
 def main():
     args = parse_args()
     print("-" * 100)
@@ -285,9 +440,14 @@ def main():
     else:
         add_logo = True
 
-    _logger.info("Reading settings file {}".format(args.settings_filename))
-    with codecs.open(args.settings_filename, "r", encoding="UTF-8") as stream:
-        settings = yaml.load(stream=stream, Loader=yaml.Loader)
+    if args.no_settings_cache:
+        settings_cache_directory = None
+    else:
+        settings_cache_directory = SETTINGS_CACHE_DIRECTORY
+    compiled_settings = compile_settings(
+        args.settings_filename, cache_directory=settings_cache_directory
+    )
+    settings = compiled_settings["settings"]
 
     general_settings = settings["general"]
     cache_directory_base_name = general_settings.get("cache_directory", ".")
@@ -313,6 +473,15 @@ def main():
     n_digits = general_settings["n_digits"]
     n_bins = general_settings["n_bins"]
     barh = general_settings.get("barh", False)
+    cache_format = general_settings.get("cache_format", "pickle")
+    if args.cache_format is not None:
+        cache_format = args.cache_format
+    excel_engine = general_settings.get("excel_engine", "openpyxl")
+    if args.excel_engine is not None:
+        excel_engine = args.excel_engine
+    column_projection = general_settings.get("column_projection", False)
+    if args.column_projection is not None:
+        column_projection = args.column_projection
     cumulative = general_settings.get("cumulative", False)
     if args.cumulative is not None:
         cumulative = args.cumulative
@@ -421,12 +590,35 @@ def main():
                 correlations=correlations,
                 categories=categories,
                 dump_cache_as_sqlite=args.dump_cache_as_sqlite,
+                column_projection=column_projection,
+                io_workers=args.io_workers,
+                cache_format=cache_format,
+                use_tldextract=args.use_tldextract,
+                url_workers=args.workers,
+                variables_df=compiled_settings["variables_df"].get(key_scan_type),
+                translation_plan=compiled_settings["translation_plans"].get(
+                    key_scan_type
+                ),
+                batch_statistics=not args.no_batch_statistics,
+                jobs=args.jobs,
+                plot_info=plot_info,
+                excel_engine=excel_engine,
+                excel_per_breakdown=args.excel_per_breakdown,
             )
             scan_prop["analyses"] = domain_analyses
 
             if var_df is None:
                 var_df = domain_analyses.variables
 
+        if cor_plot or cate_plot or verdeling_plot or score_plot:
+            # de plot modules laden we alleen als er ook plaatjes gemaakt worden
+            from internetnl_domain_analyse.domain_plots import (
+                make_heatmap,
+                make_conditional_score_plot,
+                make_conditional_pdf_plot,
+                make_verdeling_per_aantal_categorie,
+            )
+
         if cor_plot and correlations is not None:
             make_heatmap(
                 correlations=correlations,
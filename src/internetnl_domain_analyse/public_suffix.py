@@ -0,0 +1,262 @@
+"""
+Offline bepaling van de public suffix van een url op basis van de public_suffix_list.dat
+die in het pakket meegeleverd wordt.
+
+De lijst wordt eenmalig omgezet naar een trie met de labels in omgekeerde volgorde (nl,
+com, uk -> co, ...). Deze trie wordt als pickle in de cache directory opgeslagen, zodat
+we de lijst niet iedere keer hoeven te parsen. Er is nooit een netwerk verbinding nodig.
+"""
+
+import codecs
+import functools
+import hashlib
+import logging
+import pickle
+import re
+from pathlib import Path
+
+_logger = logging.getLogger(__name__)
+
+PUBLIC_SUFFIX_LIST_FILE = Path(__file__).parent / Path("public_suffix_list.dat")
+PRIVATE_DOMAINS_MARKER = "// ===BEGIN PRIVATE DOMAINS==="
+PUBLIC_SUFFIX_RE = re.compile(r"^(?P<suffix>[.*!]*\w[\S]*)", re.UNICODE | re.MULTILINE)
+SCHEME_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-.")
+IP_RE = re.compile(
+    r"^(?:(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.)"
+    r"{3}(?:[0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])$",
+    re.ASCII,
+)
+
+# in een knoop van de trie geeft deze key aan dat hier een suffix eindigt. Een label is
+# altijd een string, dus dit kan nooit met een echt label botsen
+END_OF_SUFFIX = None
+
+
+def compile_public_suffix_trie(suffix_list_text: str, include_private_domains=False):
+    """
+    Zet de tekst van de public suffix list om in een trie van geneste dicts
+
+    Args:
+        suffix_list_text: str
+            De inhoud van public_suffix_list.dat
+        include_private_domains: bool
+            Neem ook de private domeinen mee (zoals blogspot.com). Standaard niet, net
+            als tldextract
+
+    Returns:
+        dict: de root van de trie met de labels in omgekeerde volgorde
+    """
+    public_text, _, private_text = suffix_list_text.partition(PRIVATE_DOMAINS_MARKER)
+    suffixes = [m.group("suffix") for m in PUBLIC_SUFFIX_RE.finditer(public_text)]
+    if include_private_domains:
+        suffixes += [m.group("suffix") for m in PUBLIC_SUFFIX_RE.finditer(private_text)]
+
+    root = dict()
+    for suffix in suffixes:
+        node = root
+        for label in reversed(suffix.split(".")):
+            node = node.setdefault(label, dict())
+        node[END_OF_SUFFIX] = True
+    return root
+
+
+def decode_punycode(label: str) -> str:
+    """Maak een label klein en vertaal punycode labels (xn--) naar unicode"""
+    lowered = label.lower()
+    if lowered.startswith("xn--"):
+        try:
+            return codecs.decode(lowered.encode("ascii"), "idna")
+        except (UnicodeError, ValueError):
+            pass
+    return lowered
+
+
+def get_host_from_url(url: str) -> str:
+    """
+    Haal de host uit een url. Net als tldextract soepeler dan urllib: een schema is
+    optioneel, pad, query, fragment, gebruikersnaam en poort worden verwijderd.
+    """
+    double_slashes_start = url.find("//")
+    if double_slashes_start == 0:
+        url = url[2:]
+    elif (
+        double_slashes_start >= 2
+        and url[double_slashes_start - 1] == ":"
+        and not set(url[: double_slashes_start - 1]) - SCHEME_CHARS
+    ):
+        url = url[double_slashes_start + 2 :]
+
+    authority = url.partition("/")[0].partition("?")[0].partition("#")[0]
+    after_userinfo = authority.rpartition("@")[-1]
+    if after_userinfo and after_userinfo[0] == "[":
+        maybe_ipv6 = after_userinfo.partition("]")
+        if maybe_ipv6[1] == "]":
+            return f"{maybe_ipv6[0]}]"
+
+    hostname = after_userinfo.partition(":")[0].strip()
+    return hostname.rstrip(".。．｡")
+
+
+class PublicSuffixExtractor:
+    """
+    Splits urls in subdomain, domein en public suffix zonder netwerk verbinding
+
+    Args:
+        suffix_list_file: Path
+            De public suffix list. Standaard de lijst die in het pakket zit
+        cache_directory: str or Path
+            Als gegeven, dan wordt de gecompileerde trie hier als pickle opgeslagen en
+            bij de volgende keer gelezen.
+        include_private_domains: bool
+            Neem ook de private domeinen van de lijst mee
+    """
+
+    def __init__(
+        self,
+        suffix_list_file=None,
+        cache_directory=None,
+        include_private_domains=False,
+    ):
+        if suffix_list_file is None:
+            self.suffix_list_file = PUBLIC_SUFFIX_LIST_FILE
+        else:
+            self.suffix_list_file = Path(suffix_list_file)
+        self.cache_directory = cache_directory
+        self.include_private_domains = include_private_domains
+
+        self.trie = None
+        self.suffix_list_hash = None
+        self.load_trie()
+
+    def load_trie(self):
+        """Lees de trie van cache of compileer hem vanuit de suffix list"""
+        suffix_list_bytes = self.suffix_list_file.read_bytes()
+        private = "private" if self.include_private_domains else "icann"
+        list_hash = hashlib.sha256(suffix_list_bytes).hexdigest()[:16]
+        self.suffix_list_hash = "_".join([private, list_hash])
+
+        cache_file = None
+        if self.cache_directory is not None:
+            cache_file = Path(self.cache_directory) / Path(
+                "_".join(["public_suffix_trie", self.suffix_list_hash]) + ".pkl"
+            )
+            if cache_file.exists():
+                _logger.debug(f"Reading public suffix trie from {cache_file}")
+                with open(cache_file, "rb") as stream:
+                    self.trie = pickle.load(stream)
+                return
+
+        _logger.debug(f"Compiling public suffix trie from {self.suffix_list_file}")
+        self.trie = compile_public_suffix_trie(
+            suffix_list_bytes.decode("utf-8"),
+            include_private_domains=self.include_private_domains,
+        )
+
+        if cache_file is not None:
+            cache_file.parent.mkdir(exist_ok=True, parents=True)
+            _logger.debug(f"Writing public suffix trie to {cache_file}")
+            with open(cache_file, "wb") as stream:
+                pickle.dump(self.trie, stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def get_suffix_index(self, labels: list) -> int:
+        """
+        Geef de index van het eerste label van de public suffix, of None als de labels
+        niet op een suffix uit de lijst eindigen
+        """
+        node = self.trie
+        suffix_index = label_index = len(labels)
+        for label in reversed(labels):
+            decoded_label = decode_punycode(label)
+            if decoded_label in node:
+                label_index -= 1
+                node = node[decoded_label]
+                if END_OF_SUFFIX in node:
+                    suffix_index = label_index
+                continue
+
+            if "*" in node:
+                # een wildcard regel (*.ck), tenzij er een uitzondering is (!www.ck)
+                if "!" + decoded_label in node:
+                    return label_index
+                return label_index - 1
+
+            break
+
+        if suffix_index == len(labels):
+            return None
+        return suffix_index
+
+    def split(self, url: str):
+        """
+        Splits een url in subdomain, domein en suffix, net als tldextract.extract
+
+        Returns:
+            str, str, str: subdomain, domain en suffix
+        """
+        host = get_host_from_url(url)
+        host = host.replace("。", ".").replace("．", ".").replace("｡", ".")
+
+        if len(host) >= 4 and host[0] == "[" and host[-1] == "]":
+            return "", host, ""
+
+        labels = host.split(".")
+        suffix_index = self.get_suffix_index(labels)
+
+        if suffix_index is None:
+            if len(labels) == 4 and host[:1].isdecimal() and IP_RE.fullmatch(host):
+                return "", host, ""
+            return ".".join(labels[:-1]), labels[-1], ""
+
+        subdomain = ".".join(labels[: suffix_index - 1]) if suffix_index >= 2 else ""
+        domain = labels[suffix_index - 1] if suffix_index > 0 else ""
+        suffix = ".".join(labels[suffix_index:])
+        return subdomain, domain, suffix
+
+    def get_clean_url(self, url):
+        """
+        Schoon een url op en geef de suffix terug. Geeft dezelfde uitkomst als
+        internetnl_scan.utils.get_clean_url, maar zonder tldextract
+
+        Returns:
+            str, str: de opgeschoonde url en de suffix
+        """
+        clean_url = url
+        suffix = None
+        try:
+            url = url.strip()
+        except AttributeError:
+            return clean_url, suffix
+
+        subdomain, domain, tld_suffix = self.split(url)
+        if subdomain == "" and domain == "" and tld_suffix == "":
+            clean_url = None
+        elif subdomain == "" and tld_suffix == "":
+            clean_url = None
+        elif subdomain == "" and domain == "":
+            clean_url = None
+        elif domain == "" and tld_suffix == "":
+            clean_url = None
+        elif subdomain == "":
+            clean_url = ".".join([domain, tld_suffix])
+        elif tld_suffix == "":
+            clean_url = ".".join([subdomain, domain])
+        elif domain == "":
+            clean_url = ".".join([subdomain, tld_suffix])
+        else:
+            clean_url = ".".join([subdomain, domain, tld_suffix])
+
+        if clean_url is not None:
+            if " " in clean_url:
+                _logger.debug(f"{clean_url} cannot be real url with space. skipping")
+                clean_url = None
+            else:
+                clean_url = clean_url.lower()
+                suffix = tld_suffix.lower()
+
+        return clean_url, suffix
+
+
+@functools.lru_cache(maxsize=None)
+def get_public_suffix_extractor(cache_directory=None) -> PublicSuffixExtractor:
+    """Geef een extractor. Per proces wordt de trie maar een keer geladen"""
+    return PublicSuffixExtractor(cache_directory=cache_directory)
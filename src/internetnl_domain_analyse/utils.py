@@ -1,9 +1,15 @@
+import functools
+import hashlib
 import logging
+import re
 import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import tldextract
 import yaml
 from tqdm import tqdm
 
@@ -11,13 +17,83 @@ from internetnl_scan.utils import get_clean_url
 
 from ict_analyser.utils import reorganise_stat_df
 
+from internetnl_domain_analyse.cache_utils import (
+    connect_clean_url_store,
+    read_clean_urls_from_store,
+    write_clean_urls_to_store,
+)
+from internetnl_domain_analyse.public_suffix import get_public_suffix_extractor
+
 _logger = logging.getLogger(__name__)
 tld_logger = logging.getLogger("tldextract")
 tld_logger.setLevel(logging.WARNING)
 
 
 # noinspection SqlDialectInspection
-def read_tables_from_sqlite(filename: Path, table_names, index_name) -> pd.DataFrame:
+def get_table_columns(connection, table_name) -> list:
+    """Geef de kolomnamen van een sqlite tabel zonder de data te lezen"""
+    cursor = connection.execute(f"pragma table_info('{table_name}')")
+    return [row[1] for row in cursor.fetchall()]
+
+
+# noinspection SqlDialectInspection
+def read_table_from_sqlite(
+    filename: Path, table_name, index_name, columns=None
+) -> pd.DataFrame:
+    """
+    Lees een enkele tabel uit een sqlite file. Iedere aanroep opent zijn eigen
+    connectie, zodat we meerdere tabellen tegelijk vanuit verschillende threads kunnen
+    lezen
+    """
+    connection = sqlite3.connect(filename.as_posix())
+    try:
+        if columns is None:
+            selection = "*"
+        else:
+            available_columns = get_table_columns(connection, table_name)
+            selected_columns = [
+                col for col in available_columns if col in columns or col == index_name
+            ]
+            _logger.debug(
+                f"Selecting {len(selected_columns)} of {len(available_columns)} "
+                f"columns from {table_name}"
+            )
+            selection = ", ".join([f'"{col}"' for col in selected_columns])
+        _logger.debug(f"Reading table {table_name}")
+        df = pd.read_sql(
+            f"select {selection} from {table_name}",
+            con=connection,
+            index_col=index_name,
+        )
+    finally:
+        connection.close()
+    _logger.debug(f"Done reading {table_name}")
+    return df
+
+
+def submit_table_reads(
+    executor, filename: Path, table_names, index_name, columns=None
+) -> list:
+    """
+    Zet het lezen van de tabellen uit een sqlite file in een thread pool. Zo kunnen de
+    tabellen van meerdere files in een pool gelezen worden, met een vast aantal threads
+
+    Args:
+        executor: ThreadPoolExecutor
+            De pool waarin de tabellen gelezen worden
+        filename: Path
+            Naam van de sqlite file
+        table_names: list or str
+            De tabellen die we willen lezen
+        index_name: str
+            Naam van de kolom die we als index gebruiken
+        columns: set or None
+            Als gegeven, lees dan alleen deze kolommen (plus de index) in plaats van
+            alle kolommen. Kolommen die niet in een tabel voorkomen worden overgeslagen
+
+    Returns:
+        list: per tabel de future met de dataframe, in de volgorde van table_names
+    """
     if isinstance(table_names, str):
         table_names = [table_names]
 
@@ -31,28 +107,38 @@ def read_tables_from_sqlite(filename: Path, table_names, index_name) -> pd.DataF
         raise FileNotFoundError(f"Records file not found {filename.absolute()}")
 
     _logger.info(f"Reading from {filename}")
-    connection = sqlite3.connect(filename.as_posix())
-    tables = list()
-    for table_name in table_names:
-        _logger.debug(f"Reading table {table_name}")
-        df = pd.read_sql(
-            f"select * from {table_name}", con=connection, index_col=index_name
+    # iedere tabel is onafhankelijke I/O plus parsing: die kunnen tegelijk gelezen
+    # worden
+    return [
+        executor.submit(
+            read_table_from_sqlite, filename, table_name, index_name, columns=columns
         )
-        tables.append(df)
-    _logger.debug(f"Done")
+        for table_name in table_names
+    ]
+
+
+def collect_tables(table_futures: list) -> pd.DataFrame:
+    """Wacht op de tabellen van submit_table_reads en plak ze in volgorde aan elkaar"""
+    tables = [table_future.result() for table_future in table_futures]
     if len(tables) > 1:
         tables_df = pd.concat(tables, axis=1)
     else:
         tables_df = tables[0]
 
-    _logger.debug(f"Closing database")
-
-    connection.close()
-
     _logger.debug(f"Done reading")
     return tables_df
 
 
+def get_eval_column_names(eval_statement) -> set:
+    """
+    Geef alle namen die in een eval statement voorkomen. Dit zijn de kolommen die nodig
+    zijn
+    """
+    if eval_statement is None:
+        return set()
+    return set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", str(eval_statement)))
+
+
 def add_derived_variables(tables, variables):
     """
     Add the variables we defined in the settings files which do not exist yet, but are defined with an eval statement
@@ -89,6 +175,13 @@ def add_derived_variables(tables, variables):
 
 
 def fill_booleans(tables, translations, variables):
+    """
+    Vertaal de kolommen met maximaal drie waardes (zoals passed/failed) naar getallen
+
+    Iedere kolom wordt een keer gefactoriseerd. De vertalingen worden daarna op de
+    unieke waardes toegepast en via de codes teruggezet, in plaats van een masker per
+    vertaling over alle records.
+    """
     for col in tables.columns:
         convert_to_bool = True
         try:
@@ -99,20 +192,140 @@ def fill_booleans(tables, translations, variables):
             if var_type == "dict":
                 convert_to_bool = False
 
-        if convert_to_bool:
-            unique_values = tables[col].unique()
-            if len(unique_values) <= 3:
-                for trans_key, trans_prop in translations.items():
-                    bool_keys = set(trans_prop.keys())
-                    intersection = bool_keys.intersection(unique_values)
-                    if intersection:
-                        nan_val = set(unique_values).difference(bool_keys)
-                        # if nan_val:
-                        #    trans_prop[list(nan_val)[0]] = np.nan
-                        for key, val in trans_prop.items():
-                            mask = tables[col] == key
-                            if any(mask):
-                                tables.loc[mask, col] = float(val)
+        if not convert_to_bool:
+            continue
+
+        codes, unique_values = pd.factorize(tables[col], use_na_sentinel=False)
+        if len(unique_values) > 3:
+            continue
+
+        original_values = np.asarray(unique_values, dtype=object)
+        new_values = original_values.copy()
+        changed = False
+        for trans_key, trans_prop in translations.items():
+            bool_keys = set(trans_prop.keys())
+            intersection = bool_keys.intersection(original_values)
+            if intersection:
+                # net als voorheen wordt iedere vertaling op de al vertaalde waardes
+                # toegepast
+                for key, val in trans_prop.items():
+                    mask = new_values == key
+                    if mask.any():
+                        new_values[mask] = float(val)
+                        changed = True
+
+        if changed:
+            column = pd.Series(new_values[codes], index=tables.index, name=col)
+            if tables[col].dtype != object:
+                column = column.infer_objects()
+            tables[col] = column
+    return tables
+
+
+def compile_translation_plan(variables: pd.DataFrame) -> dict:
+    """
+    Stel eenmalig per variabele vast hoe de kolom vertaald moet worden, zodat we in
+    read_data niet per kolom de settings op hoeven te zoeken en de yaml vertaling
+    opnieuw hoeven te lezen
+
+    Args:
+        variables: pd.DataFrame
+            De variabelen met in ieder geval de kolommen type en translateopts
+
+    Returns:
+        dict: per variabele een dict met
+            translation: de vertaling {Nee: 0, Ja: 1} of None
+            na_value: de string waarmee we NA vullen voor de vertaling of None
+            dtype: het type waar we de kolom naar omzetten of None
+    """
+    translation_plan = dict()
+    for var_key, var_props in variables.iterrows():
+        var_type = var_props.get("type")
+        var_translate = var_props.get("translateopts")
+
+        translation = None
+        na_value = None
+        if var_translate is not None:
+            # op deze manier kunnen we de vertaling {Nee: 0, Ja: 1} op de column waardes
+            # los laten, zodat we alle Nee met 0 en Ja met 1 vervangen
+            translation = yaml.load(str(var_translate), Loader=yaml.Loader)
+            for nan_string in ("na", "nan", "NaN"):
+                if nan_string in translation.keys():
+                    na_value = nan_string
+                    break
+
+        if var_type == "dict":
+            dtype = "category"
+        elif var_type in ("bool", "percentage", "float"):
+            dtype = "float64"
+        else:
+            dtype = None
+
+        translation_plan[var_key] = dict(
+            translation=translation, na_value=na_value, dtype=dtype
+        )
+    return translation_plan
+
+
+def apply_translation_plan(tables: pd.DataFrame, translation_plan: dict):
+    """
+    Vertaal en converteer de kolommen volgens het plan van compile_translation_plan. De
+    vertaling wordt alleen op de unieke waardes van een kolom uitgevoerd en via de codes
+    teruggezet.
+
+    Returns:
+        pd.DataFrame: de vertaalde tabel
+    """
+    new_columns = dict()
+    for column in tables:
+        try:
+            plan = translation_plan[column]
+        except KeyError:
+            _logger.debug(f"Column {column} not defined in settings. Skipping")
+            continue
+
+        values = tables[column]
+        changed = False
+        translation = plan["translation"]
+        if translation is not None:
+            na_value = plan["na_value"]
+            if na_value is not None:
+                # we have added an 'na' option for the translations. Take care of it
+                is_na = values.isna()
+                if is_na.any():
+                    # should not happen anymore because of the dropna above
+                    _logger.info(f"Filling {na_value} with na in {column}")
+                    values = values.fillna(na_value)
+                    changed = True
+
+            codes, unique_index = pd.factorize(values, use_na_sentinel=False)
+            unique_values = set(unique_index)
+            vals_to_translate = set(translation.keys()).intersection(unique_values)
+            missing_values = unique_values.difference(set(translation.keys()))
+            if vals_to_translate:
+                if missing_values:
+                    _logger.warning(
+                        f"Column {column} misses the translations for "
+                        f"{missing_values}. Please update your settings"
+                    )
+                _logger.debug(f"Convert for {column} trans keys {translation}")
+                translated = pd.Series(unique_index).map(translation)
+                values = pd.Series(
+                    translated.to_numpy()[codes], index=values.index, name=column
+                )
+                changed = True
+            else:
+                _logger.debug(f"No Convert for {column} trans keys {translation}")
+
+        if plan["dtype"] is not None:
+            values = values.astype(plan["dtype"])
+            changed = True
+
+        if changed:
+            new_columns[column] = values
+
+    if new_columns:
+        tables = tables.assign(**new_columns)
     return tables
 
 
@@ -173,6 +386,41 @@ def get_option_mask(question_df, variables, question_type, valid_options=None):
     return mask_total
 
 
+def variable_dict2df(
+    variables: dict,
+    module_info: dict = None,
+    module_key: str = "module",
+    variable_key: str = "variable",
+) -> pd.DataFrame:
+    """
+    Converteer de directory met variable info naar een data frame
+
+    Args:
+        variables:  dict met variable info
+        module_info: dict met module informatie
+        module_key: naam van de kolom met de module
+        variable_key: naam van de index met de variabelen
+
+    Returns:
+        dataframe
+    """
+    var_df = pd.DataFrame.from_dict(variables).unstack().dropna()
+    var_df = var_df.reset_index()
+    var_df = var_df.rename(
+        columns={
+            "level_0": module_key,
+            "level_1": variable_key,
+            0: "properties",
+        }
+    )
+    var_df.set_index(variable_key, drop=True, inplace=True)
+
+    var_df = impose_variable_defaults(
+        var_df, module_info=module_info, module_key=module_key
+    )
+    return var_df
+
+
 def impose_variable_defaults(
     variables, module_info: dict = None, module_key: str = None
 ):
@@ -194,127 +442,88 @@ def impose_variable_defaults(
         Filled dataframe
 
     """
-    variables["type"] = "bool"
-    variables["section"] = ""
-    variables["fixed"] = False
-    variables["original_name"] = variables.index.values
-    variables["label"] = ""
-    variables["question"] = ""
-    variables["module_label"] = ""
-    variables["module_include"] = True
-    # if the check  flag is true , it indicates this is a check question which can be discarded
-    # in the final output
-    variables["check"] = False
-    variables["optional"] = False
-    variables["no_impute"] = False
-    variables["info_per_breakdown"] = None
-
-    variables["gewicht"] = "units"
-    variables["keep_options"] = False
-    variables["eval"] = None
-    variables["unit"] = None
-
-    # als toevallig de eerste key: value in de options een dict is dan kan je geen from_dict
-    # gebruiken. Daarom voegen we nu een dummy string to, die halen we dadelijk weer weg
-    dummy = "dummy"
-    options = {dummy: dummy}
-    filter_dummy = {dummy: dummy}
-    translate = {dummy: dummy}
-    for var_key, var_row in variables.iterrows():
-        var_prop = var_row["properties"]
+    # de standaard waardes van de kolommen die we uit de 'properties' dict van de
+    # settings halen. original_name is standaard de naam van de variabele zelf
+    defaults = dict(
+        type="bool",
+        section="",
+        fixed=False,
+        original_name=None,
+        label="",
+        question="",
+        module_label="",
+        module_include=True,
+        # if the check  flag is true , it indicates this is a check question which can
+        # be discarded in the final output
+        check=False,
+        optional=False,
+        no_impute=False,
+        info_per_breakdown=None,
+        gewicht="units",
+        keep_options=False,
+        eval=None,
+        unit=None,
+    )
+    # deze velden bevatten vaak een dict en worden als één object per rij opgeslagen
+    object_columns = dict(options="options", filter="filter", translateopts="translate")
+
+    # de overige kolommen (zoals de module) nemen we ongewijzigd over
+    base_columns = [col for col in variables.columns if col != "properties"]
+
+    records = list()
+    has_report_number = False
+    for var_key, base_record, var_prop in zip(
+        variables.index,
+        variables[base_columns].to_dict(orient="records"),
+        variables["properties"],
+    ):
         # loop over the given column names as try to read the value from 'properties' field
         # in the variables dataframe. This properties field is the dict we have read from
         # the settings file which may contain the same key  with a value. If this value was
         # defined for the current variable, copy it to the associate column in the data frame
         # such that we can access it more easily
-        for name in (
-            "type",
-            "fixed",
-            "original_name",
-            "question",
-            "label",
-            "check",
-            "optional",
-            "gewicht",
-            "no_impute",
-            "info_per_breakdown",
-            "report_number",
-            "section",
-            "keep_options",
-            "eval",
-            "unit",
-        ):
-            try:
-                variables.loc[var_key, name] = var_prop[name]
-            except ValueError:
-                # de info_per_breakdown is een dictionary die we met 'at' moeten imposen
-                variables.at[var_key, name] = var_prop.get(name)
-            except KeyError:
-                pass
-        # separately get the options field as that contains a dict and therefore can not be
-        # imposed as a single value to a row. Instead, collect them and append as a single col
-        try:
-            var_options = var_prop["options"]
-        except KeyError:
-            options[var_key] = None
-        else:
-            options[var_key] = var_options
-
-        try:
-            var_filter = var_prop["filter"]
-        except KeyError:
-            filter_dummy[var_key] = None
-        else:
-            filter_dummy[var_key] = var_filter
-
-        try:
-            var_translate = var_prop["translate"]
-        except KeyError:
-            translate[var_key] = None
-        else:
-            translate[var_key] = var_translate
+        record = base_record
+        for name, default in defaults.items():
+            value = var_prop.get(name, default)
+            if value is None and isinstance(default, bool):
+                # een lege waarde in een bool kolom werd altijd nan
+                value = np.nan
+            record[name] = value
+        if "original_name" not in var_prop:
+            record["original_name"] = var_key
+        if "report_number" in var_prop:
+            record["report_number"] = var_prop["report_number"]
+            has_report_number = True
+        for column_name, prop_name in object_columns.items():
+            record[column_name] = var_prop.get(prop_name)
 
         # add the module label  to this dataframe as well
         if module_info is not None:
-            module_name = var_row[module_key]
+            module_name = base_record[module_key]
             try:
-                module_label = module_info[module_name]["label"]
+                record["module_label"] = module_info[module_name]["label"]
             except KeyError:
                 _logger.warning("failed to get the label from {}".format(module_name))
-            else:
-                variables.loc[var_key, "module_label"] = module_label
             try:
-                module_include = module_info[module_name]["include"]
+                record["module_include"] = module_info[module_name]["include"]
             except KeyError:
                 _logger.warning(
                     "failed to get the include flag from {}".format(module_name)
                 )
-            else:
-                variables.loc[var_key, "module_include"] = module_include
-
-    # create data frame of one columns from the option dictionaries.
-    opt_df = pd.DataFrame.from_dict(options, orient="index").rename(
-        columns={0: "options"}
-    )
-    opt_df = opt_df[opt_df.index != dummy]
-
-    filter_df = pd.DataFrame.from_dict(filter_dummy, orient="index").rename(
-        columns={0: "filter"}
-    )
-    filter_df = filter_df[filter_df.index != dummy]
-
-    trans_df = pd.DataFrame.from_dict(translate, orient="index").rename(
-        columns={0: "translateopts"}
+        records.append(record)
+
+    columns = base_columns + list(defaults.keys())
+    if has_report_number:
+        # alleen variabelen met een report_number krijgen een waarde, de rest is nan
+        for record in records:
+            record.setdefault("report_number", np.nan)
+        columns.append("report_number")
+    columns.extend(object_columns.keys())
+
+    # de index verloor bij het samenvoegen met de options altijd zijn naam, houd dat zo
+    variables = pd.DataFrame.from_records(
+        records, index=variables.index.rename(None), columns=columns
     )
-    trans_df = trans_df[trans_df.index != dummy]
-
-    # drop the original column with properties
-    variables.drop(["properties"], inplace=True, axis=1)
-
-    # merge the options column with the rest of the columns
-    variables = pd.concat([variables, opt_df], axis=1)
-    variables = pd.concat([variables, filter_df], axis=1)
-    variables = pd.concat([variables, trans_df], axis=1)
 
     # check if we have a dict data type that does not has a option field set. In that case
     # raise a warning: all the dict type need the options defined
@@ -386,34 +595,187 @@ def clean_all_suffix(dataframe, suffix_key, variables):
     return dataframe
 
 
-def get_all_clean_urls(urls, show_progress=False, cache_directory=None):
+def clean_url_chunk(urls, cache_directory=None, use_tldextract=False):
+    """
+    Schoon een deel van de urls op. Staat op module niveau zodat een process pool hem
+    kan aanroepen
+
+    Returns:
+        list: (clean_url, suffix) per url
+    """
+    if use_tldextract:
+        return [get_clean_url(url, cache_dir=cache_directory) for url in urls]
+    extractor = get_public_suffix_extractor(cache_directory)
+    return [extractor.get_clean_url(url) for url in urls]
+
+
+def get_tldextract_extractor(cache_directory=None) -> tldextract.TLDExtract:
+    """
+    Geef de tldextract extractor die internetnl_scan.utils.get_clean_url gebruikt: een
+    eigen extractor met de cache directory of anders de extractor achter
+    tldextract.extract
+    """
+    if cache_directory is not None:
+        return tldextract.TLDExtract(cache_dir=cache_directory)
+    return tldextract.tldextract.TLD_EXTRACTOR
+
+
+def get_tldextract_key(extract: tldextract.TLDExtract) -> str:
+    """
+    De sleutel van de url store als we met tldextract opschonen. Deze bevat de versie
+    van tldextract en een hash van de suffix list van de extractor, zodat de store leeg
+    gemaakt wordt als tldextract zijn lijst ververst of geüpgraded wordt. Het opvragen
+    van de lijst kan een download starten, dus doe dit alleen als er een store is.
+    """
+    suffix_list = "\n".join(sorted(extract.tlds))
+    list_hash = hashlib.sha256(suffix_list.encode("utf-8")).hexdigest()[:16]
+    return "_".join(["tldextract", tldextract.__version__, list_hash])
+
+
+def get_all_clean_urls(
+    urls,
+    show_progress=False,
+    cache_directory=None,
+    use_tldextract=False,
+    url_store_file=None,
+    workers=None,
+):
+    """
+    Schoon alle urls op en bepaal de suffix.
+
+    Veel records delen dezelfde url (holdings, dubbele records), daarom schonen we
+    iedere unieke url maar een keer op en zetten we het resultaat via de codes terug op
+    de records. Waardes die geen string zijn, zoals None en nan, geeft get_clean_url
+    ongewijzigd terug zonder suffix. Die komen dus ook ongewijzigd terug.
+
+    Args:
+        urls: pd.Series or list
+            De urls om op te schonen
+        show_progress: bool
+            Laat een voortgangsbalk zien
+        cache_directory: str
+            De cache directory voor tldextract of de gecompileerde public suffix trie
+        use_tldextract: bool
+            Gebruik tldextract in plaats van de offline public suffix trie. tldextract
+            kan blijven hangen als het de suffix list via het netwerk probeert te
+            verversen
+        url_store_file: Path or None
+            Sqlite store met urls die al eerder opgeschoond zijn. Alleen urls die nog
+            niet in de store staan worden opgeschoond en daarna aan de store toegevoegd.
+        workers: int or None
+            Als groter dan 1, verdeel de nieuwe urls in blokken over een process pool
+            met dit aantal processen. De volgorde van de uitkomst blijft gelijk.
+
+    Returns:
+        list, list: de opgeschoonde urls en de suffixen in de volgorde van de urls
+    """
+    urls = pd.Series(urls, dtype=object)
+    # alleen strings schonen we op. factorize zou None en nan samenvoegen tot nan,
+    # terwijl get_clean_url ze allebei ongewijzigd teruggeeft
+    is_url = urls.map(lambda url: isinstance(url, str)).to_numpy(dtype=bool)
+    codes, unique_urls = pd.factorize(urls[is_url])
+
+    if use_tldextract:
+        extractor = None
+        clean_url_function = functools.partial(get_clean_url, cache_dir=cache_directory)
+    else:
+        extractor = get_public_suffix_extractor(cache_directory)
+        clean_url_function = extractor.get_clean_url
+
+    unique_clean_urls = np.empty(unique_urls.size, dtype=object)
+    unique_suffix = np.empty(unique_urls.size, dtype=object)
+
+    connection = None
+    stored_urls = dict()
+    if url_store_file is not None:
+        if extractor is None:
+            extractor_key = get_tldextract_key(
+                get_tldextract_extractor(cache_directory)
+            )
+        else:
+            extractor_key = "_".join(["public_suffix", extractor.suffix_list_hash])
+        connection = connect_clean_url_store(url_store_file, extractor_key)
+        stored_urls = read_clean_urls_from_store(connection, list(unique_urls))
+        _logger.info(f"Found {len(stored_urls)} urls in store {url_store_file}")
+
+    new_url_indices = list()
+    for url_index, url in enumerate(unique_urls):
+        try:
+            unique_clean_urls[url_index], unique_suffix[url_index] = stored_urls[url]
+        except KeyError:
+            new_url_indices.append(url_index)
+
+    _logger.info(
+        f"Cleaning {len(new_url_indices)} new urls of {unique_urls.size} unique urls "
+        f"of {urls.size} records"
+    )
+
     if show_progress:
         progress_bar = tqdm(
-            total=urls.size,
+            total=len(new_url_indices),
             file=sys.stdout,
             position=0,
             ncols=100,
             leave=True,
             colour="GREEN",
+            desc="{:5s}".format("URL"),
         )
     else:
         progress_bar = None
 
-    all_clean_urls = list()
-    all_suffix = list()
-
-    for url in urls:
-        clean_url, suffix = get_clean_url(url, cache_dir=cache_directory)
+    new_urls = [unique_urls[url_index] for url_index in new_url_indices]
+    if workers is not None and workers > 1 and len(new_urls) > 1:
+        # kleine blokken zodat de voortgangsbalk regelmatig bijgewerkt wordt
+        chunk_size = max(1, int(np.ceil(len(new_urls) / (workers * 8))))
+        chunks = [
+            new_urls[start : start + chunk_size]
+            for start in range(0, len(new_urls), chunk_size)
+        ]
+        _logger.info(f"Cleaning urls in {len(chunks)} chunks with {workers} processes")
+        chunk_results = [None] * len(chunks)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    clean_url_chunk, chunk, cache_directory, use_tldextract
+                ): chunk_index
+                for chunk_index, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                chunk_index = futures[future]
+                chunk_results[chunk_index] = future.result()
+                if progress_bar:
+                    progress_bar.update(len(chunks[chunk_index]))
+        new_results = [result for chunk in chunk_results for result in chunk]
+    else:
+        new_results = list()
+        for url in new_urls:
+            new_results.append(clean_url_function(url))
+            if progress_bar:
+                progress_bar.update()
+
+    new_clean_urls = dict()
+    for url_index, url, (clean_url, suffix) in zip(
+        new_url_indices, new_urls, new_results
+    ):
         _logger.debug(f"Converted {url} to {clean_url}")
-        all_clean_urls.append(clean_url)
-        all_suffix.append(suffix)
-        if progress_bar:
-            if clean_url is not None:
-                progress_bar.set_description("{:5s} - {:30s}".format("URL", clean_url))
-            else:
-                progress_bar.set_description("{:5s} - {:30s}".format("URL", "None"))
-            progress_bar.update()
-    return all_clean_urls, all_suffix
+        unique_clean_urls[url_index] = clean_url
+        unique_suffix[url_index] = suffix
+        new_clean_urls[url] = (clean_url, suffix)
+
+    if progress_bar:
+        progress_bar.close()
+
+    if connection is not None:
+        if new_clean_urls:
+            _logger.info(f"Adding {len(new_clean_urls)} urls to {url_store_file}")
+            write_clean_urls_to_store(connection, new_clean_urls)
+        connection.close()
+
+    all_clean_urls = urls.to_numpy(copy=True)
+    all_suffix = np.full(urls.size, None, dtype=object)
+    all_clean_urls[is_url] = unique_clean_urls[codes]
+    all_suffix[is_url] = unique_suffix[codes]
+    return all_clean_urls.tolist(), all_suffix.tolist()
 
 
 def get_windows_or_linux_value(value):
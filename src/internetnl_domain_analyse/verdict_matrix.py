@@ -0,0 +1,130 @@
+"""
+Compacte opslag van de geslaagd/niet geslaagd verdicts van de internet.nl testen.
+
+Iedere verdict kolom wordt met np.packbits opgeslagen als een bit per record in plaats
+van een byte per cel in een pandas bool frame. Tellingen per kolom, per record en van
+het gezamenlijk slagen van twee kolommen worden gedaan met een popcount op de bytes.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from internetnl_domain_analyse.batch_statistics import correlations_from_products
+
+_logger = logging.getLogger(__name__)
+
+# het aantal bits dat aan staat voor iedere mogelijke byte
+POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], np.uint8)
+
+
+def popcount(packed: np.ndarray, axis=-1) -> np.ndarray:
+    """Tel de bits die aan staan langs de as van een array met gepackte bytes"""
+    return POPCOUNT_TABLE[packed].sum(axis=axis, dtype=np.int64)
+
+
+class VerdictMatrix:
+    """
+    De verdicts van een aantal kolommen als bits. Alleen de waarde 1 telt als geslaagd.
+
+    Args:
+        dataframe: pd.DataFrame
+            De microdata
+        columns: list
+            De verdict kolommen
+    """
+
+    def __init__(self, dataframe: pd.DataFrame, columns: list):
+        self.columns = list(columns)
+        self.index = dataframe.index
+        self.n_records = len(dataframe.index)
+
+        # per kolom inpakken, zodat er nooit een hele bool matrix in het geheugen staat
+        n_bytes = (self.n_records + 7) // 8
+        self.bits = np.zeros((len(self.columns), n_bytes), dtype=np.uint8)
+        for column_number, column in enumerate(self.columns):
+            self.bits[column_number] = np.packbits(dataframe[column].to_numpy() == 1)
+        _logger.debug(
+            f"Packed {len(self.columns)} verdicts of {self.n_records} records in "
+            f"{self.bits.nbytes} bytes"
+        )
+
+    def get_column_numbers(self, columns=None) -> list:
+        if columns is None:
+            return list(range(len(self.columns)))
+        return [self.columns.index(column) for column in columns]
+
+    def unpack(self, column: str) -> np.ndarray:
+        """Geef de verdicts van een kolom als bool array"""
+        column_bits = self.bits[self.columns.index(column)]
+        return np.unpackbits(column_bits, count=self.n_records).astype(bool)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Geef de verdicts als pandas bool frame, zoals dataframe[columns] == 1"""
+        return pd.DataFrame(
+            {column: self.unpack(column) for column in self.columns}, index=self.index
+        )
+
+    def column_counts(self, mask: np.ndarray = None) -> pd.Series:
+        """
+        Tel per kolom het aantal geslaagde records
+
+        Args:
+            mask: np.ndarray
+                Optioneel een bool array met de records die meetellen
+        """
+        bits = self.bits
+        if mask is not None:
+            bits = bits & np.packbits(np.asarray(mask, dtype=bool))
+        return pd.Series(popcount(bits), index=self.columns)
+
+    def column_counts_per_group(self, codes: np.ndarray, n_groups: int) -> pd.DataFrame:
+        """
+        Tel per groep van records en per kolom het aantal geslaagde records
+
+        Args:
+            codes: np.ndarray
+                De groep (0 tot n_groups) van ieder record
+            n_groups: int
+                Het aantal groepen
+
+        Returns:
+            pd.DataFrame: een rij per groep en een kolom per verdict
+        """
+        counts = np.zeros((n_groups, len(self.columns)), dtype=np.int64)
+        for column_number, column in enumerate(self.columns):
+            counts[:, column_number] = np.bincount(
+                codes[self.unpack(column)], minlength=n_groups
+            )
+        return pd.DataFrame(counts, columns=pd.Index(self.columns))
+
+    def record_counts(self, columns=None) -> pd.Series:
+        """Tel per record het aantal geslaagde kolommen, eventueel van een deel ervan"""
+        counts = np.zeros(self.n_records, dtype=np.int64)
+        for column_number in self.get_column_numbers(columns):
+            counts += np.unpackbits(self.bits[column_number], count=self.n_records)
+        return pd.Series(counts, index=self.index)
+
+    def co_occurrence(self) -> np.ndarray:
+        """Tel voor ieder paar kolommen het aantal records dat voor beide geslaagd is"""
+        n_columns = len(self.columns)
+        counts = np.zeros((n_columns, n_columns), dtype=np.int64)
+        for column_number in range(n_columns):
+            counts[column_number] = popcount(self.bits[column_number] & self.bits)
+        return counts
+
+    def correlations(self) -> pd.DataFrame:
+        """
+        De Pearson correlaties tussen de kolommen uit de tellingen. Gelijk aan de
+        correlatie van de bool frame
+        """
+        counts = popcount(self.bits)
+        no_variation = (counts == 0) | (counts == self.n_records)
+        return correlations_from_products(
+            products=self.co_occurrence().astype(np.float64),
+            sums=counts.astype(np.float64),
+            total=float(self.n_records),
+            no_variation=no_variation,
+            columns=pd.Index(self.columns),
+        )
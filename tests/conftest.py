@@ -1,10 +1,225 @@
 """
-    Dummy conftest.py for internetnl_domain_analyse.
+    Fixtures die door meerdere tests gedeeld worden: een kleine set microdata in sqlite
+    en de settings om er een DomainAnalyser op te draaien.
 
-    If you don't know what this is for, just leave it empty.
     Read more about conftest.py under:
     - https://docs.pytest.org/en/stable/fixture.html
     - https://docs.pytest.org/en/stable/writing_plugins.html
 """
+import copy
+import sqlite3
 
-# import pytest
+import numpy as np
+import pandas as pd
+import pytest
+
+N_RECORDS = 300
+N_URLS = 240
+
+YEAR_KEY = "2022"
+SCAN_DATA_KEY = "all_web"
+RECORD_TABLE_NAMES = ["records_df_22_2", "info_records_df_22"]
+
+SUFFIXES = ["nl", "com", "eu", "de", "co.uk"]
+
+ANALYSER_SETTINGS = dict(
+    weights="ratio_units",
+    translations=dict(
+        passed_failed=dict(passed=1, failed=0),
+        good_bad=dict(good=1, bad=0),
+    ),
+    module_info=dict(
+        domeinnamen=dict(include=True, label="Verdeling"),
+        counts=dict(include=True, label="Totaal aantal"),
+        score=dict(include=True, label="Totaal score"),
+        categories=dict(include=True, label="Categories"),
+        tests=dict(include=True, label="Test"),
+    ),
+    variables=dict(
+        domeinnamen=dict(
+            suffix=dict(
+                type="dict",
+                translate=dict(nl=1, com=2, eu=3, rest=4),
+                options={1: ".nl", 2: ".com", 3: ".eu", 4: "overig"},
+            ),
+        ),
+        counts=dict(units=dict(type="int", report_number=True)),
+        score=dict(percentage=dict(type="percentage")),
+        categories={
+            f"categories_web_{category}_verdict": dict(type="bool")
+            for category in ("https", "ipv6", "dnssec", "appsecpriv")
+        },
+        tests=dict(
+            tests_a_verdict=dict(type="bool"),
+            tests_b_verdict=dict(type="bool"),
+            # een variabele met een andere naam in de tabel
+            tests_c=dict(type="bool", original_name="tests_c_verdict"),
+            tests_d_verdict=dict(type="bool", translate=dict(ja=1, nee=0)),
+            # een afgeleide variabele die niet in de tabellen staat
+            tests_ab=dict(type="float", eval="tests_a_verdict + tests_b_verdict"),
+        ),
+    ),
+    statistics=dict(
+        per_gk=dict(groupby=dict(gk="gk3_stat_wp")),
+        per_sbi=dict(groupby=dict(sbi="sbi_digit1_statline")),
+        # de eerste breakdown kolom bestaat niet, daarom wordt gk3_stat_wp gebruikt
+        per_gk_zzp=dict(
+            groupby=dict(gk="gk3_stat_wp_met_zzp"),
+            groupby_if_not_exist=dict(gk="gk3_stat_wp"),
+            missing_groups=["WP19079"],
+        ),
+        per_gk_dtc=dict(do_it=False, groupby=dict(gk="gk_all_wp")),
+    ),
+    categories=dict(
+        categories_output_file="internet_nl_categories.sqlite",
+        index_categories={
+            category.upper(): dict(variable=f"categories_web_{category}_verdict")
+            for category in ("https", "ipv6", "dnssec", "appsecpriv")
+        },
+    ),
+    correlations=dict(
+        plots=dict(
+            correlation=dict(output_file="internet_nl_corr.sqlite"),
+            scores_per_interval=dict(output_file="internet_nl_scores.pkl"),
+        ),
+        index_correlations=dict(
+            tests_a_verdict="A",
+            tests_b_verdict="A",
+            tests_c="B",
+            tests_d_verdict="B",
+        ),
+    ),
+    breakdown_labels=dict(),
+    sheet_renames=dict(),
+)
+
+
+def make_records(rng) -> dict:
+    """De tabellen van de records cache: breakdowns, gewichten en urls per bedrijf"""
+    be_id = [f"be{number}" for number in range(N_RECORDS)]
+    urls = [
+        f"https://www.Site{number % N_URLS}.{SUFFIXES[number % 5]}/pad"
+        for number in range(N_RECORDS)
+    ]
+    # een bedrijf zonder url valt af
+    urls[5] = None
+    units = rng.integers(1, 5, N_RECORDS).astype(float)
+    records = pd.DataFrame(
+        {
+            "be_id": be_id,
+            "website_url": urls,
+            "gk_all_wp": "WP19115",
+            "gk3_stat_wp": rng.choice(["WP19080", "WP19090", "WP19097"], N_RECORDS),
+            "sbi_digit1_statline": rng.choice(["C", "F", "G", None], N_RECORDS),
+        }
+    )
+    info = pd.DataFrame(
+        {
+            "be_id": be_id,
+            "gk_sbs": rng.integers(0, 100, N_RECORDS),
+            "sbi": rng.choice(["1", "2"], N_RECORDS),
+            "units": units,
+            "ratio_units": units * rng.uniform(1, 20, N_RECORDS),
+            "url": "x",
+        }
+    )
+    return dict(zip(RECORD_TABLE_NAMES, [records, info]))
+
+
+def make_internet_nl_tables(rng) -> dict:
+    """De tabellen van de internet.nl scan met de uitslagen per opgeschoonde url"""
+    urls = [f"www.site{number}.{SUFFIXES[number % 5]}" for number in range(N_URLS)]
+
+    def passed_failed():
+        return rng.choice(["passed", "failed"], N_URLS)
+
+    report = pd.DataFrame({"index": urls, "percentage": rng.uniform(0, 100, N_URLS)})
+    scoring = pd.DataFrame(
+        {
+            "index": urls,
+            "categories_web_https_verdict": passed_failed(),
+            "categories_web_ipv6_verdict": passed_failed(),
+            "categories_web_dnssec_verdict": passed_failed(),
+            "categories_web_appsecpriv_verdict": passed_failed(),
+        }
+    )
+    status = pd.DataFrame(
+        {
+            "index": urls,
+            "tests_a_verdict": passed_failed(),
+            "tests_b_verdict": passed_failed(),
+            "tests_c_verdict": rng.choice(["good", "bad"], N_URLS),
+            # een kolom die in geen enkele setting gebruikt wordt
+            "ongebruikt": rng.uniform(0, 1, N_URLS),
+        }
+    )
+    results = pd.DataFrame(
+        {"index": urls, "tests_d_verdict": rng.choice(["ja", "nee"], N_URLS)}
+    )
+    return dict(report=report, scoring=scoring, status=status, results=results)
+
+
+def write_tables(file_name, tables: dict):
+    with sqlite3.connect(file_name) as connection:
+        for table_name, table in tables.items():
+            table.to_sql(table_name, connection, if_exists="replace", index=False)
+
+
+@pytest.fixture
+def microdata_directory(tmp_path):
+    """Een directory met de records cache en de internet.nl tabellen als sqlite"""
+    data_directory = tmp_path / "data"
+    data_directory.mkdir()
+    rng = np.random.default_rng(5)
+    write_tables(data_directory / "records.sqlite", make_records(rng))
+    write_tables(data_directory / "internet_nl.sqlite", make_internet_nl_tables(rng))
+    return data_directory
+
+
+@pytest.fixture
+def analyser_settings():
+    """Een kopie van de settings, zodat een test ze aan kan passen"""
+    return copy.deepcopy(ANALYSER_SETTINGS)
+
+
+@pytest.fixture
+def make_analyser(microdata_directory, tmp_path, monkeypatch):
+    """
+    Geef een functie die een DomainAnalyser op de microdata draait. De analyser schrijft
+    zijn caches en output in de werk directory, die daarom naar tmp_path gezet wordt
+    """
+    from internetnl_domain_analyse.domain_analyse_classes import (
+        DomainAnalyser,
+        RecordCacheInfo,
+    )
+
+    work_directory = tmp_path / "work"
+    work_directory.mkdir()
+    monkeypatch.chdir(work_directory)
+
+    def make(settings, **kwargs):
+        records_cache_info = RecordCacheInfo(
+            records_cache_data=dict(
+                records_cache_directory=str(microdata_directory),
+                records_cache_file="records.sqlite",
+                records_table_names=RECORD_TABLE_NAMES,
+            ),
+            year_key=YEAR_KEY,
+            stat_directory="",
+        )
+        analyser_kwargs = dict(
+            scan_data_key=SCAN_DATA_KEY,
+            default_scan=SCAN_DATA_KEY,
+            records_cache_info=records_cache_info,
+            internet_nl_filename=microdata_directory / "internet_nl.sqlite",
+            cache_directory_base_name="cache",
+            tld_extract_cache_directory=str(tmp_path / "tld_cache"),
+            n_digits=1,
+            n_bins=10,
+            mode="statistics",
+        )
+        analyser_kwargs.update(settings)
+        analyser_kwargs.update(kwargs)
+        return DomainAnalyser(**analyser_kwargs)
+
+    return make
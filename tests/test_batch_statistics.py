@@ -0,0 +1,244 @@
+import numpy as np
+import pandas as pd
+import pytest
+from weighted_sample_statistics import WeightedSampleStatistics
+
+from internetnl_domain_analyse.batch_statistics import (
+    StatisticsCube,
+    calculate_batch_statistics,
+    calculate_correlations,
+    calculate_histograms,
+)
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+N_RECORDS = 2000
+
+# alle combinaties van breakdowns die we testen: categorisch met een categorie die niet
+# voorkomt, een kolom met ontbrekende waardes en beide samen. De ontbrekende categorie
+# staat midden in de categorieën, zodat een verkeerde nummering van de groepen opvalt
+GROUP_BYS = [["gk"], ["sbi"], ["gk", "sbi"]]
+
+BATCH_VARIABLES = {
+    "score": dict(
+        weight_key="ratio_units",
+        unit_weights=False,
+        report_number=False,
+        percentage=False,
+    ),
+    "verdict": dict(
+        weight_key="ratio_wp",
+        unit_weights=False,
+        report_number=False,
+        percentage=True,
+    ),
+    "aantal": dict(
+        weight_key="ratio_units",
+        unit_weights=False,
+        report_number=True,
+        percentage=False,
+    ),
+}
+
+
+@pytest.fixture
+def records():
+    """Microdata met de breakdowns en de be_id in de index, zoals in de statistiek"""
+    rng = np.random.default_rng(1)
+    gk = pd.Categorical(
+        rng.choice(["klein", "groot", "zeer groot"], N_RECORDS),
+        categories=["klein", "middel", "groot", "zeer groot"],
+    )
+    sbi = rng.choice([10.0, 20.0, 30.0, np.nan], N_RECORDS)
+    score = rng.random(N_RECORDS) * 100
+    score[rng.random(N_RECORDS) < 0.1] = np.nan
+    units = rng.integers(1, 50, N_RECORDS).astype(float)
+    wp = rng.integers(1, 500, N_RECORDS).astype(float)
+    ratio_wp = wp * rng.random(N_RECORDS)
+    ratio_wp[rng.random(N_RECORDS) < 0.05] = 0
+    return pd.DataFrame(
+        {
+            "score": score,
+            "verdict": rng.choice([0.0, 1.0, np.nan], N_RECORDS),
+            "aantal": rng.integers(0, 20, N_RECORDS).astype(float),
+            "units": units,
+            "ratio_units": units * rng.random(N_RECORDS) * 3,
+            "wp": wp,
+            "ratio_wp": ratio_wp,
+        },
+        index=pd.MultiIndex.from_arrays(
+            [gk, sbi, np.arange(N_RECORDS)], names=["gk", "sbi", "be_id"]
+        ),
+    )
+
+
+def groupby_statistics(records, group_by, var_key, var_info):
+    """De statistiek van een variabele berekend met een gewone pandas groupby"""
+    weights = records[var_info["weight_key"]]
+    weighted = (records[var_key] * weights).fillna(0)
+    level = group_by if len(group_by) > 1 else group_by[0]
+    sums = weighted.groupby(level=level, observed=False).sum()
+    if var_info["report_number"]:
+        return sums
+    weight_sums = weights.groupby(level=level, observed=False).sum()
+    means = (sums / weight_sums).fillna(0)
+    if var_info["percentage"]:
+        means *= 100
+    return means
+
+
+@pytest.mark.parametrize("group_by", GROUP_BYS)
+def test_batch_statistics_equal_to_groupby(records, group_by):
+    all_stats = calculate_batch_statistics(records, group_by, BATCH_VARIABLES)
+
+    # de variabelen komen per gewicht terug, de volgorde herstelt de aanroeper
+    assert set(all_stats) == set(BATCH_VARIABLES)
+    for var_key, var_info in BATCH_VARIABLES.items():
+        expected = groupby_statistics(records, group_by, var_key, var_info)
+        result = all_stats[var_key][var_key]
+        pd.testing.assert_index_equal(result.index, expected.index)
+        np.testing.assert_allclose(result.to_numpy(), expected.to_numpy(), rtol=1e-12)
+
+
+def test_unobserved_category_is_kept(records):
+    all_stats = calculate_batch_statistics(records, ["gk"], BATCH_VARIABLES)
+
+    score = all_stats["score"]["score"]
+    assert list(score.index) == ["klein", "middel", "groot", "zeer groot"]
+    # een groep zonder gewicht krijgt net als in WeightedSampleStatistics een 0
+    assert score["middel"] == 0
+
+
+@pytest.mark.parametrize("group_by", GROUP_BYS)
+def test_batch_statistics_equal_to_weighted_sample_statistics(records, group_by):
+    all_stats = calculate_batch_statistics(records, group_by, BATCH_VARIABLES)
+
+    for var_key, var_info in BATCH_VARIABLES.items():
+        var_weight_key = var_info["weight_key"].replace("ratio_", "")
+        weight_columns = [var_weight_key, var_info["weight_key"], "ratio_units"]
+        stats = WeightedSampleStatistics(
+            group_keys=group_by,
+            records_df_selection=records[[var_key]],
+            weights_df=records[list(dict.fromkeys(weight_columns))],
+            column_list=[var_key],
+            var_type="bool" if var_info["percentage"] else "float",
+            var_weight_key=var_weight_key,
+            scaling_factor_key=var_info["weight_key"],
+            units_scaling_factor_key="ratio_units",
+            report_numbers=var_info["report_number"],
+        )
+        stats.calculate()
+        if var_info["report_number"]:
+            expected = stats.records_sum
+        else:
+            expected = stats.records_weighted_mean_agg
+
+        pd.testing.assert_frame_equal(
+            all_stats[var_key], expected, check_dtype=False, rtol=1e-10
+        )
+
+
+@pytest.mark.parametrize("group_by", GROUP_BYS)
+def test_cube_roll_up_equal_to_batch_statistics(records, group_by):
+    cube = StatisticsCube(records, ["gk", "sbi"], BATCH_VARIABLES)
+    assert cube.covers(group_by, BATCH_VARIABLES)
+
+    # de kubus telt de cellen in een andere volgorde op, dus gelijk op afronding na
+    rolled_up = cube.roll_up(group_by, BATCH_VARIABLES)
+    expected = calculate_batch_statistics(records, group_by, BATCH_VARIABLES)
+    assert set(rolled_up) == set(expected)
+    for var_key, var_stats in expected.items():
+        pd.testing.assert_frame_equal(rolled_up[var_key], var_stats, rtol=1e-12)
+
+
+def test_cube_does_not_cover_other_breakdowns(records):
+    cube = StatisticsCube(records, ["gk"], {"score": BATCH_VARIABLES["score"]})
+
+    assert not cube.covers(["sbi"], ["score"])
+    assert not cube.covers(["gk"], ["score", "verdict"])
+
+
+def test_histograms_equal_to_numpy(records):
+    data = records[["score", "aantal"]].copy()
+    # waardes precies op de randen van de bins, buiten de range en ontbrekend
+    data.iloc[:8, 0] = [0, 100, 37, 37.5, 99.99, -1, 100.01, np.nan]
+    data["label"] = "tekst"
+    weights = records["ratio_units"].to_numpy()
+
+    histograms = calculate_histograms(data, weights, n_bins=40, value_range=(0, 100))
+
+    groups = data.index.get_level_values("gk")
+    for column in ["score", "aantal"]:
+        assert list(histograms[column]) == ["klein", "middel", "groot", "zeer groot"]
+        # een categorie zonder records heeft geen histogram
+        assert histograms[column]["middel"] is None
+        for group in ["klein", "groot", "zeer groot"]:
+            in_group = groups == group
+            expected, expected_edges = np.histogram(
+                data[column].to_numpy()[in_group],
+                bins=40,
+                range=(0, 100),
+                weights=weights[in_group],
+            )
+            counts, bin_edges = histograms[column][group]
+            np.testing.assert_allclose(counts, expected, rtol=1e-12)
+            np.testing.assert_array_equal(bin_edges, expected_edges)
+
+    # van een kolom die niet numeriek is kunnen we geen histogram maken
+    assert all(histogram is None for histogram in histograms["label"].values())
+
+
+@pytest.fixture
+def verdicts():
+    """Geslaagd/niet geslaagd per test, met een kolom die voor iedereen geslaagd is"""
+    rng = np.random.default_rng(2)
+    base = rng.random(N_RECORDS)
+    verdicts = pd.DataFrame(
+        {
+            f"test_{number}": (rng.random(N_RECORDS) + base) / 2 < threshold
+            for number, threshold in enumerate([0.2, 0.4, 0.5, 0.7])
+        }
+    )
+    verdicts["altijd"] = True
+    return verdicts
+
+
+def weighted_correlations(data, weights):
+    """De gewogen Pearson correlatie in float64 als referentie"""
+    values = data.to_numpy(dtype=float)
+    centered = values - np.average(values, axis=0, weights=weights)
+    covariance = (centered * weights[:, np.newaxis]).T @ centered
+    scale = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return covariance / np.outer(scale, scale)
+
+
+def test_correlations_equal_to_pandas(verdicts):
+    correlations = calculate_correlations(verdicts)
+
+    pd.testing.assert_frame_equal(
+        correlations, verdicts.astype(float).corr(), atol=1e-6
+    )
+
+
+def test_weighted_correlations(verdicts, records):
+    weights = records["ratio_wp"].to_numpy()
+
+    correlations = calculate_correlations(verdicts, weights=weights)
+
+    expected = weighted_correlations(verdicts, weights)
+    np.testing.assert_allclose(correlations.to_numpy(), expected, atol=1e-6)
+    # een kolom zonder variatie heeft geen correlatie
+    assert correlations["altijd"].isna().all()
+    assert correlations.loc["altijd"].isna().all()
+
+
+def test_correlations_without_weights_are_nan(verdicts):
+    weights = np.zeros(N_RECORDS)
+    weights[:10] = np.nan
+
+    correlations = calculate_correlations(verdicts, weights=weights)
+
+    assert correlations.isna().all().all()
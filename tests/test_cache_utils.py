@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from internetnl_domain_analyse.cache_utils import (
+    get_cache_suffix,
+    read_dataframe_cache,
+    write_dataframe_cache,
+)
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+CACHE_FORMATS = ["pickle", "parquet", "feather"]
+
+INDEXES = {
+    "named": pd.Index([10, 20, 20, 30], name="be_id"),
+    "unnamed": pd.Index(["a", "b", "c", "a"]),
+    "multi": pd.MultiIndex.from_arrays(
+        [[1, 1, 2, 2], ["x", "y", "x", "y"]], names=["gk", None]
+    ),
+    "range": pd.RangeIndex(5, 9),
+}
+
+
+@pytest.fixture
+def dataframe():
+    """Kolommen zoals in de microdata cache, met types waar arrow moeite mee heeft"""
+    return pd.DataFrame(
+        {
+            "score": [0.5, np.nan, 1.0, 2.5],
+            "aantal": np.array([1, 2, 3, 4], dtype=np.int64),
+            "url": ["www.cbs.nl", None, "cbs.nl", "www.cbs.nl"],
+            # gemengde types kunnen niet in arrow en gaan in de aparte pickle
+            "gemengd": [1.0, "tekst", np.nan, 3],
+            "gk": pd.Categorical([1, 2, 1, 3], categories=[1, 2, 3, 4]),
+            "suffix": pd.Categorical(["nl", "com", None, "nl"]),
+        }
+    )
+
+
+def write_and_read(dataframe, tmp_path, cache_format, columns=None):
+    file_name = tmp_path / ("cache" + get_cache_suffix(cache_format))
+    write_dataframe_cache(dataframe, file_name=file_name, cache_format=cache_format)
+    return read_dataframe_cache(file_name, cache_format=cache_format, columns=columns)
+
+
+@pytest.mark.parametrize("index_key", INDEXES)
+@pytest.mark.parametrize("cache_format", CACHE_FORMATS)
+def test_round_trip(dataframe, tmp_path, cache_format, index_key):
+    if cache_format != "pickle":
+        pytest.importorskip("pyarrow")
+    dataframe.index = INDEXES[index_key]
+
+    result = write_and_read(dataframe, tmp_path, cache_format)
+
+    pd.testing.assert_frame_equal(result, dataframe)
+
+
+@pytest.mark.parametrize("index_key", INDEXES)
+@pytest.mark.parametrize("cache_format", CACHE_FORMATS)
+def test_column_projection(dataframe, tmp_path, cache_format, index_key):
+    if cache_format != "pickle":
+        pytest.importorskip("pyarrow")
+    dataframe.index = INDEXES[index_key]
+    columns = {"gemengd", "gk", "score"}
+
+    result = write_and_read(dataframe, tmp_path, cache_format, columns=columns)
+
+    # de kolommen komen in de oorspronkelijke volgorde terug
+    pd.testing.assert_frame_equal(result, dataframe[["score", "gemengd", "gk"]])
+
+
+@pytest.mark.parametrize("cache_format", ["parquet", "feather"])
+def test_only_mixed_type_columns(dataframe, tmp_path, cache_format):
+    pytest.importorskip("pyarrow")
+    dataframe.index = INDEXES["unnamed"]
+
+    result = write_and_read(dataframe, tmp_path, cache_format, columns={"gemengd"})
+
+    pd.testing.assert_frame_equal(result, dataframe[["gemengd"]])
@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+
+def calculate_categories_per_count(dataframe, columns, weight_key, n_bins):
+    """
+    De oorspronkelijke calculate_categories, met een masker en een histogram per aantal
+    goede categorieën
+
+    Returns:
+        pd.DataFrame, pd.DataFrame: de genormeerde histogrammen van de score en het
+        aantal geslaagde records per categorie, beide per aantal goede categorieën
+    """
+    score_df = dataframe["percentage"].copy()
+    score_df = score_df.rename("score")
+    weights = dataframe[weight_key].copy()
+    # alleen 1 wordt als succes beschouwd
+    data_df = dataframe[columns] == 1
+    count = data_df.sum(axis=1).rename("count")
+
+    tot = pd.concat([score_df, count], axis=1)
+
+    conditional_scores = list()
+    sum_per_number_of_cat = list()
+
+    total_sum = 0
+    for number_of_cat in range(0, 5):
+        mask = tot["count"] == number_of_cat
+        tot_cond = tot.loc[mask, "score"]
+        sel_df = data_df[mask]
+        sum_per_number_of_cat.append(sel_df.sum(axis=0))
+        ww = weights[mask].to_numpy()
+        hist, bin_edge = np.histogram(
+            tot_cond.to_numpy(),
+            weights=ww,
+            density=False,
+            range=(0, 100),
+            bins=n_bins,
+        )
+        total_sum += hist.sum()
+        conditional_scores.append(hist)
+
+    sum_per_number_of_cat_df = pd.DataFrame.from_records(sum_per_number_of_cat)
+    bin_width = bin_edge[1] - bin_edge[0]
+
+    conditional_scores_df = pd.DataFrame().from_records(conditional_scores)
+    conditional_scores_df.index = conditional_scores_df.index.rename("n_categories")
+    conditional_scores_df = conditional_scores_df.T
+    conditional_scores_df.index = bin_edge[:-1]
+    conditional_scores_df /= total_sum * bin_width
+    return conditional_scores_df, sum_per_number_of_cat_df
+
+
+@pytest.fixture
+def analyser(make_analyser, analyser_settings):
+    return make_analyser(analyser_settings, mode="categories")
+
+
+def get_category_columns(analyser):
+    return [
+        cat_prop["variable"]
+        for cat_prop in analyser.categories["index_categories"].values()
+    ]
+
+
+def assert_categories_equal_per_count(analyser):
+    conditional_scores_df = pd.read_pickle(analyser.cate_pkl_file)
+    sum_file = analyser.cate_pkl_file.parent / Path(
+        analyser.cate_pkl_file.stem + "_sum.pkl"
+    )
+    sum_per_number_of_cat_df = pd.read_pickle(sum_file)
+
+    expected_scores, expected_sums = calculate_categories_per_count(
+        analyser.dataframe,
+        columns=get_category_columns(analyser),
+        weight_key=analyser.weight_key,
+        n_bins=analyser.n_bins,
+    )
+
+    pd.testing.assert_frame_equal(conditional_scores_df, expected_scores)
+    pd.testing.assert_frame_equal(sum_per_number_of_cat_df, expected_sums)
+    return conditional_scores_df, sum_per_number_of_cat_df
+
+
+def test_categories_equal_per_count(analyser):
+    assert_categories_equal_per_count(analyser)
+
+
+def test_empty_categories_and_nan_scores(analyser):
+    dataframe = analyser.dataframe.copy()
+    https, ipv6, dnssec, appsecpriv = get_category_columns(analyser)
+    # twee aan twee gelijke verdicts: niemand heeft precies 1 of 3 categorieën goed
+    dataframe[ipv6] = dataframe[https]
+    dataframe[appsecpriv] = dataframe[dnssec]
+    # scores zonder waarde, op de rand en buiten het bereik tellen niet mee
+    percentage = dataframe["percentage"].to_numpy(copy=True)
+    percentage[:10] = np.nan
+    percentage[10:15] = 100
+    percentage[15:20] = 0
+    percentage[20] = 120
+    percentage[21] = -5
+    dataframe["percentage"] = percentage
+
+    # de verdicts worden per dataframe bewaard, dus die moeten ook opnieuw
+    analyser.dataframe = dataframe
+    analyser.verdict_matrices = dict()
+    analyser.correct_categories_count = None
+    analyser.reset = 0
+    analyser.calculate_categories()
+
+    conditional_scores_df, sum_per_number_of_cat_df = assert_categories_equal_per_count(
+        analyser
+    )
+    assert (conditional_scores_df[[1, 3]] == 0).all().all()
+    assert (sum_per_number_of_cat_df.loc[[1, 3]] == 0).all().all()
+    assert conditional_scores_df.sum().sum() * 10 == pytest.approx(1)
@@ -0,0 +1,161 @@
+import math
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+import tldextract
+
+from internetnl_domain_analyse import utils
+from internetnl_domain_analyse.cache_utils import (
+    connect_clean_url_store,
+    write_clean_urls_to_store,
+)
+from internetnl_domain_analyse.public_suffix import (
+    PUBLIC_SUFFIX_LIST_FILE,
+    get_public_suffix_extractor,
+)
+from internetnl_domain_analyse.utils import get_all_clean_urls
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+URLS = ["www.cbs.nl", "http://forums.bbc.co.uk/path", "www.cbs.nl", "localhost"]
+
+EXPECTED_CLEAN_URLS = ["www.cbs.nl", "forums.bbc.co.uk", "www.cbs.nl", None]
+EXPECTED_SUFFIX = ["nl", "co.uk", "nl", None]
+
+
+def get_store_key(store_file):
+    with sqlite3.connect(store_file) as connection:
+        return connection.execute(
+            "select value from store_info where key = 'extractor'"
+        ).fetchone()[0]
+
+
+@pytest.fixture
+def offline_tldextract(tmp_path, monkeypatch):
+    """
+    Vervang de extractor achter tldextract.extract door een die de meegeleverde suffix
+    list leest, zodat get_clean_url zonder cache_dir geen netwerk nodig heeft
+    """
+    extract = tldextract.TLDExtract(
+        cache_dir=str(tmp_path / "tld_cache"),
+        suffix_list_urls=(PUBLIC_SUFFIX_LIST_FILE.as_uri(),),
+        fallback_to_snapshot=False,
+    )
+    # laad de lijst alvast: de sessie van get_clean_url kan geen file urls lezen
+    extract("www.cbs.nl")
+    monkeypatch.setattr(tldextract.tldextract, "TLD_EXTRACTOR", extract)
+    return extract
+
+
+def test_tldextract_without_cache_directory(offline_tldextract, tmp_path):
+    store_file = tmp_path / "clean_urls.sqlite"
+
+    clean_urls, suffix = get_all_clean_urls(
+        URLS, use_tldextract=True, url_store_file=store_file
+    )
+
+    assert clean_urls == EXPECTED_CLEAN_URLS
+    assert suffix == EXPECTED_SUFFIX
+    assert get_store_key(store_file) == utils.get_tldextract_key(offline_tldextract)
+
+
+def test_tldextract_key_only_with_store(offline_tldextract, monkeypatch):
+    def get_key(extract):
+        raise AssertionError("Suffix list requested without url store")
+
+    monkeypatch.setattr(utils, "get_tldextract_key", get_key)
+
+    clean_urls, suffix = get_all_clean_urls(URLS, use_tldextract=True)
+
+    assert clean_urls == EXPECTED_CLEAN_URLS
+    assert suffix == EXPECTED_SUFFIX
+
+
+def get_public_suffix_key():
+    return "_".join(["public_suffix", get_public_suffix_extractor().suffix_list_hash])
+
+
+def fill_store(store_file, extractor_key, clean_urls):
+    connection = connect_clean_url_store(store_file, extractor_key)
+    write_clean_urls_to_store(connection, clean_urls)
+    connection.close()
+
+
+def test_second_run_reads_from_store(tmp_path, monkeypatch):
+    store_file = tmp_path / "clean_urls.sqlite"
+    get_all_clean_urls(URLS, url_store_file=store_file)
+
+    def get_clean_url(self, url):
+        raise AssertionError(f"{url} cleaned again instead of read from the store")
+
+    monkeypatch.setattr(
+        type(get_public_suffix_extractor()), "get_clean_url", get_clean_url
+    )
+    clean_urls, suffix = get_all_clean_urls(URLS, url_store_file=store_file)
+
+    assert clean_urls == EXPECTED_CLEAN_URLS
+    assert suffix == EXPECTED_SUFFIX
+    assert get_store_key(store_file) == get_public_suffix_key()
+
+
+def test_store_is_used_for_known_urls(tmp_path):
+    store_file = tmp_path / "clean_urls.sqlite"
+    fill_store(
+        store_file, get_public_suffix_key(), {"www.cbs.nl": ("cbs.test", "test")}
+    )
+
+    clean_urls, suffix = get_all_clean_urls(URLS, url_store_file=store_file)
+
+    assert clean_urls == ["cbs.test", "forums.bbc.co.uk", "cbs.test", None]
+    assert suffix == ["test", "co.uk", "test", None]
+
+
+def test_changed_key_clears_store(tmp_path):
+    store_file = tmp_path / "clean_urls.sqlite"
+    fill_store(store_file, "andere_suffix_list", {"www.cbs.nl": ("cbs.test", "test")})
+
+    clean_urls, suffix = get_all_clean_urls(URLS, url_store_file=store_file)
+
+    assert clean_urls == EXPECTED_CLEAN_URLS
+    assert suffix == EXPECTED_SUFFIX
+    assert get_store_key(store_file) == get_public_suffix_key()
+    with sqlite3.connect(store_file) as connection:
+        stored_urls = dict(
+            connection.execute("select url, clean_url from clean_urls").fetchall()
+        )
+    assert stored_urls == {
+        "www.cbs.nl": "www.cbs.nl",
+        "http://forums.bbc.co.uk/path": "forums.bbc.co.uk",
+        "localhost": None,
+    }
+
+
+def assert_same_values(values, expected):
+    assert len(values) == len(expected)
+    for value, expected_value in zip(values, expected):
+        if isinstance(expected_value, float) and math.isnan(expected_value):
+            assert isinstance(value, float) and math.isnan(value)
+        else:
+            assert value is expected_value or value == expected_value
+
+
+@pytest.mark.parametrize("url_store", [False, True])
+def test_non_string_urls_are_returned_unchanged(tmp_path, url_store):
+    urls = [None, "www.cbs.nl", np.nan, None, 5, "localhost", np.nan]
+    url_store_file = tmp_path / "clean_urls.sqlite" if url_store else None
+
+    clean_urls, suffix = get_all_clean_urls(
+        pd.Series(urls, index=range(10, 17)), url_store_file=url_store_file
+    )
+
+    # dezelfde uitkomst als get_clean_url per record
+    extractor = get_public_suffix_extractor()
+    expected = [extractor.get_clean_url(url) for url in urls]
+    assert_same_values(clean_urls, [clean_url for clean_url, _ in expected])
+    assert_same_values(suffix, [url_suffix for _, url_suffix in expected])
+    assert clean_urls[0] is None
+    assert suffix == [None, "nl", None, None, None, None, None]
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def full_and_projected(make_analyser, analyser_settings):
+    """Dezelfde analyse op alle kolommen en op alleen de benodigde kolommen"""
+    # de breakdown kolom van groupby_if_not_exist komt in geen andere setting voor
+    statistics = analyser_settings["statistics"]
+    del statistics["per_gk_dtc"]
+    statistics["per_gk_zzp"]["groupby_if_not_exist"] = dict(gk="gk_all_wp")
+    full = make_analyser(
+        analyser_settings, cache_directory_base_name="full", mode="all"
+    )
+    projected = make_analyser(
+        analyser_settings,
+        cache_directory_base_name="projected",
+        mode="all",
+        column_projection=True,
+    )
+    return full, projected
+
+
+def test_projected_read_equals_full_read(full_and_projected):
+    full, projected = full_and_projected
+
+    # kolommen die in geen enkele setting voorkomen worden niet gelezen
+    assert "ongebruikt" in full.dataframe.columns
+    assert "ongebruikt" not in projected.dataframe.columns
+    # vertaalde variabelen, de breakdown uit groupby_if_not_exist en de gewichten wel
+    for column in ("tests_d_verdict", "tests_c", "gk_all_wp", "ratio_units"):
+        assert column in projected.dataframe.columns
+
+    pd.testing.assert_frame_equal(
+        projected.dataframe, full.dataframe[projected.dataframe.columns]
+    )
+
+
+def test_projected_statistics_equal_full_statistics(full_and_projected):
+    full, projected = full_and_projected
+
+    assert set(projected.all_stats_per_format) == set(full.all_stats_per_format)
+    for file_base, stat_df in full.all_stats_per_format.items():
+        pd.testing.assert_frame_equal(
+            projected.all_stats_per_format[file_base], stat_df
+        )
+    pd.testing.assert_frame_equal(projected.score_df, full.score_df)
+
+
+def test_required_columns_of_filters(make_analyser, analyser_settings):
+    analyser_settings["variables"]["tests"]["tests_ab"]["filter"] = "gk_sbs > 10"
+    analyser_settings["statistics"]["per_sbi"]["filters"] = dict(eigen="sbi == '1'")
+
+    analyser = make_analyser(analyser_settings, mode=None)
+
+    required_columns = analyser.get_required_columns()
+    assert {"gk_sbs", "sbi", "gk3_stat_wp_met_zzp", "gk3_stat_wp"} <= required_columns
+    assert "ongebruikt" not in required_columns
@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+import yaml
+
+import internetnl_domain_analyse.domein_analyse as domein_analyse
+from internetnl_domain_analyse.domein_analyse import (
+    SETTINGS_CACHE_DIRECTORY,
+    compile_settings,
+)
+
+from conftest import ANALYSER_SETTINGS, SCAN_DATA_KEY
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def settings_file(tmp_path, monkeypatch):
+    """
+    Een settings file in zijn eigen directory. We draaien vanuit een andere directory om
+    te zien dat de cache bij de settings file komt
+    """
+    settings_directory = tmp_path / "settings"
+    settings_directory.mkdir()
+    settings_file = settings_directory / "domain_settings.yml"
+    settings = dict(
+        module_info=ANALYSER_SETTINGS["module_info"],
+        variables={SCAN_DATA_KEY: ANALYSER_SETTINGS["variables"]},
+    )
+    settings_file.write_text(yaml.dump(settings))
+
+    work_directory = tmp_path / "work"
+    work_directory.mkdir()
+    monkeypatch.chdir(work_directory)
+    return settings_file
+
+
+@pytest.fixture
+def settings_compilations(monkeypatch):
+    """Tel hoe vaak de settings file gelezen en gecompileerd wordt"""
+    compilations = list()
+    variable_dict2df = domein_analyse.variable_dict2df
+
+    def counting_variable_dict2df(*args, **kwargs):
+        compilations.append(1)
+        return variable_dict2df(*args, **kwargs)
+
+    monkeypatch.setattr(domein_analyse, "variable_dict2df", counting_variable_dict2df)
+    return compilations
+
+
+def compile_cached(settings_file):
+    return compile_settings(settings_file, cache_directory=SETTINGS_CACHE_DIRECTORY)
+
+
+def test_cache_hit(settings_file, settings_compilations):
+    compiled_settings = compile_cached(settings_file)
+    cached_settings = compile_cached(settings_file)
+
+    assert len(settings_compilations) == 1
+    cache_directory = settings_file.parent / SETTINGS_CACHE_DIRECTORY
+    assert (cache_directory / "settings_domain_settings.pkl").exists()
+    assert not (settings_file.parent.parent / "work" / "cache").exists()
+
+    assert cached_settings["settings"] == compiled_settings["settings"]
+    pd.testing.assert_frame_equal(
+        cached_settings["variables_df"][SCAN_DATA_KEY],
+        compiled_settings["variables_df"][SCAN_DATA_KEY],
+    )
+
+
+def test_edited_settings_file_is_read_again(settings_file, settings_compilations):
+    compile_cached(settings_file)
+
+    settings = yaml.safe_load(settings_file.read_text())
+    settings["variables"][SCAN_DATA_KEY]["tests"]["tests_a_verdict"]["type"] = "float"
+    settings_file.write_text(yaml.dump(settings))
+    compiled_settings = compile_cached(settings_file)
+
+    assert len(settings_compilations) == 2
+    variables_df = compiled_settings["variables_df"][SCAN_DATA_KEY]
+    assert variables_df.loc["tests_a_verdict", "type"] == "float"
+
+
+@pytest.mark.parametrize("module", ["platform", "pandas"])
+def test_other_versions_read_again(
+    settings_file, settings_compilations, monkeypatch, module
+):
+    compile_cached(settings_file)
+
+    if module == "platform":
+        monkeypatch.setattr(domein_analyse.platform, "python_version", lambda: "2.7.0")
+    else:
+        monkeypatch.setattr(domein_analyse.pd, "__version__", "0.1.0")
+    compile_cached(settings_file)
+
+    assert len(settings_compilations) == 2
+
+
+def test_without_cache_directory(settings_file, settings_compilations):
+    compile_settings(settings_file)
+    compile_settings(settings_file)
+
+    assert len(settings_compilations) == 2
+    assert not (settings_file.parent / SETTINGS_CACHE_DIRECTORY).exists()
@@ -0,0 +1,57 @@
+import pytest
+
+from internetnl_domain_analyse.domain_analyse_classes import DomainAnalyser
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+LONG_NAME = "per_grootteklasse_en_economische_activiteit"
+
+
+def get_sheet_name(file_base, sheet_names, sheet_renames=None):
+    # get_sheet_name gebruikt alleen de sheet renames, de data hoeven we niet te lezen
+    analyser = DomainAnalyser.__new__(DomainAnalyser)
+    analyser.sheet_renames = sheet_renames
+    return analyser.get_sheet_name(file_base, sheet_names=sheet_names)
+
+
+def test_short_sheet_name_is_kept():
+    assert get_sheet_name("per_gk", sheet_names=dict()) == "per_gk"
+
+
+def test_sheet_renames():
+    sheet_renames = dict(gk=dict(pattern="grootteklasse", replace="gk"))
+
+    sheet_name = get_sheet_name(LONG_NAME, dict(), sheet_renames=sheet_renames)
+
+    assert sheet_name == "per_gk_en_economische_activitei"
+
+
+def test_long_sheet_name_is_truncated():
+    sheet_name = get_sheet_name(LONG_NAME, sheet_names=dict())
+
+    assert sheet_name == LONG_NAME[:31]
+    assert len(sheet_name) == 31
+
+
+def test_duplicate_sheet_name_gets_a_number():
+    sheet_names = {"per_gk": None, LONG_NAME[:31]: None}
+
+    sheet_name = get_sheet_name(LONG_NAME + "_zzp", sheet_names=sheet_names)
+
+    assert sheet_name == LONG_NAME[:29] + "02"
+    assert len(sheet_name) == 31
+    # een korte naam die al bestaat wordt ook uniek gemaakt
+    assert get_sheet_name("per_gk", sheet_names=["per_gk"]) == "per_gk01"
+
+
+def test_excel_engine_only_checked_for_statistics(make_analyser, analyser_settings):
+    with pytest.raises(ValueError, match="not supported"):
+        make_analyser(analyser_settings, excel_engine="onbekend")
+
+    # de andere modes schrijven geen excel en hebben dus geen engine nodig
+    analyser = make_analyser(
+        analyser_settings, excel_engine="onbekend", mode="correlations"
+    )
+    assert analyser.score_df is not None
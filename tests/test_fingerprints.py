@@ -0,0 +1,150 @@
+import pandas as pd
+import pytest
+
+import internetnl_domain_analyse.domain_analyse_classes as domain_analyse_classes
+from internetnl_domain_analyse.cache_utils import (
+    fingerprint_matches,
+    make_fingerprint,
+    write_fingerprint,
+)
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+
+def test_make_fingerprint_is_stable():
+    assert make_fingerprint(dict(a=1, b=[1, 2]), 2022) == make_fingerprint(
+        dict(b=[1, 2], a=1), 2022
+    )
+    assert make_fingerprint(dict(a=1)) != make_fingerprint(dict(a=2))
+    # jaren als int en als str door elkaar geven geen fout bij het sorteren
+    assert make_fingerprint({2022: 1, "2023": 2}) == make_fingerprint(
+        {"2023": 2, 2022: 1}
+    )
+
+
+def test_fingerprint_matches(tmp_path):
+    cache_file = tmp_path / "cache.pkl"
+    assert not fingerprint_matches(cache_file, "abc")
+
+    cache_file.write_bytes(b"")
+    assert not fingerprint_matches(cache_file, "abc")
+
+    write_fingerprint(cache_file, "abc")
+    assert fingerprint_matches(cache_file, "abc")
+    assert not fingerprint_matches(cache_file, "abd")
+
+
+@pytest.fixture
+def sqlite_reads(monkeypatch):
+    """Houd bij van welke files de tabellen uit sqlite gelezen worden"""
+    file_names = list()
+    submit_table_reads = domain_analyse_classes.submit_table_reads
+
+    def counting_submit_table_reads(executor, filename, *args, **kwargs):
+        file_names.append(filename)
+        return submit_table_reads(executor, filename, *args, **kwargs)
+
+    monkeypatch.setattr(
+        domain_analyse_classes, "submit_table_reads", counting_submit_table_reads
+    )
+    return file_names
+
+
+@pytest.fixture
+def analyser(make_analyser, analyser_settings):
+    """Een analyser die alle caches gevuld heeft"""
+    return make_analyser(analyser_settings)
+
+
+def assert_same_statistics(analyser, other):
+    assert set(analyser.all_stats_per_format) == set(other.all_stats_per_format)
+    for file_base, stat_df in analyser.all_stats_per_format.items():
+        pd.testing.assert_frame_equal(other.all_stats_per_format[file_base], stat_df)
+
+
+def test_unchanged_inputs_reuse_the_caches(
+    analyser, make_analyser, analyser_settings, sqlite_reads
+):
+    # labels zijn alleen voor de output en maken geen cache ongeldig
+    analyser_settings["variables"]["tests"]["tests_a_verdict"]["label"] = "Test A"
+
+    second = make_analyser(analyser_settings)
+
+    assert sqlite_reads == []
+    # alle breakdowns komen uit de cache, dus de microdata is niet eens gelezen
+    assert second.dataframe is None
+    assert_same_statistics(analyser, second)
+
+
+def test_changed_source_file_makes_microdata_stale(analyser, microdata_directory):
+    internet_nl_filename = microdata_directory / "internet_nl.sqlite"
+    internet_nl_filename.write_bytes(internet_nl_filename.read_bytes() + b"\0")
+
+    fingerprint = analyser.get_microdata_fingerprint()
+
+    assert fingerprint != analyser.microdata_fingerprint
+    assert not analyser.cache_is_valid(analyser.cache_file, fingerprint)
+
+
+def test_changed_translation_rereads_the_microdata(
+    analyser, make_analyser, analyser_settings, sqlite_reads
+):
+    tests_d = analyser_settings["variables"]["tests"]["tests_d_verdict"]
+    tests_d["translate"] = dict(ja=0, nee=1)
+
+    second = make_analyser(analyser_settings)
+
+    assert len(sqlite_reads) == 2
+    assert second.microdata_fingerprint != analyser.microdata_fingerprint
+    per_gk = analyser.all_stats_per_format["per_gk"]["tests_d_verdict"]
+    pd.testing.assert_series_equal(
+        second.all_stats_per_format["per_gk"]["tests_d_verdict"], 100 - per_gk
+    )
+
+
+def test_changed_statistics_setting_keeps_the_microdata(
+    analyser, make_analyser, analyser_settings, sqlite_reads
+):
+    # report_number bepaalt alleen de statistiek en niet hoe de microdata gelezen wordt
+    analyser_settings["variables"]["tests"]["tests_ab"]["report_number"] = True
+
+    second = make_analyser(analyser_settings)
+
+    assert sqlite_reads == []
+    assert second.microdata_fingerprint == analyser.microdata_fingerprint
+    # de breakdowns zijn opnieuw berekend op de microdata uit de cache
+    assert second.dataframe is not None
+    for file_base, stat_df in analyser.all_stats_per_format.items():
+        assert not second.all_stats_per_format[file_base]["tests_ab"].equals(
+            stat_df["tests_ab"]
+        )
+
+
+def test_changed_breakdown_makes_only_that_breakdown_stale(analyser):
+    statistics = analyser.statistics
+    statistics["per_sbi"]["filters"] = dict(select_large_be="gk_sbs > 10")
+
+    for file_base, props in statistics.items():
+        if not analyser.breakdown_is_requested(file_base, props):
+            continue
+        is_valid = analyser.cache_is_valid(
+            analyser.get_breakdown_cache_file(file_base),
+            analyser.get_breakdown_fingerprint(file_base, props),
+        )
+        assert is_valid == (file_base != "per_sbi")
+
+
+def test_microdata_fingerprint_only_covers_read_settings(analyser):
+    microdata_fingerprint = analyser.microdata_fingerprint
+    variables = analyser.variables
+
+    # settings van de statistiek laten de microdata cache geldig
+    for field, value in [("gewicht", "ratio_units"), ("filter", "website")]:
+        variables.loc["tests_ab", field] = value
+        assert analyser.get_microdata_fingerprint() == microdata_fingerprint
+
+    # settings die bepalen hoe een kolom gelezen wordt maken hem ongeldig
+    variables.loc["tests_ab", "eval"] = "tests_a_verdict * tests_b_verdict"
+    assert analyser.get_microdata_fingerprint() != microdata_fingerprint
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+# deze modules mogen pas geladen worden als er plaatjes of latex files gemaakt worden
+PLOT_MODULES = (
+    "matplotlib.pyplot",
+    "seaborn",
+    "cbsplotlib",
+    "pylatex",
+    "internetnl_domain_analyse.domain_plots",
+    "internetnl_domain_analyse.latex_output",
+)
+
+IMPORT_CODE = """
+import json
+import sys
+
+import internetnl_domain_analyse.domein_analyse
+loaded = [name for name in {modules} if name in sys.modules]
+print(json.dumps(loaded))
+"""
+
+
+def test_plot_modules_are_lazy():
+    # draai in een nieuw proces, anders zijn de modules al door andere tests geladen
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_CODE.format(modules=PLOT_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert loaded == []
@@ -0,0 +1,72 @@
+import pytest
+import tldextract
+
+from internetnl_domain_analyse.public_suffix import (
+    PUBLIC_SUFFIX_LIST_FILE,
+    PublicSuffixExtractor,
+)
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+URLS = [
+    "www.cbs.nl",
+    "http://forums.bbc.co.uk/path?q=1",
+    "https://user:pw@Sub.Example.COM:8080/",
+    "a.b.c.kawasaki.jp",
+    "city.kawasaki.jp",
+    "www.ck",
+    "test.ck",
+    "192.168.1.1",
+    "localhost",
+    "xn--mnchen-3ya.de",
+    "blogspot.com",
+    "foo.blogspot.com",
+    "[::1]",
+    "nl",
+    "www.gemeente.amsterdam",
+    "example.invalidtld",
+    "www.example.xn--p1ai",
+    "www.test.рф",
+    "www.cbs.nl.",
+    "//cbs.nl",
+]
+
+
+@pytest.fixture(scope="module")
+def tld_extract(tmp_path_factory):
+    """tldextract met de meegeleverde suffix list, zodat er geen netwerk nodig is"""
+    return tldextract.TLDExtract(
+        cache_dir=str(tmp_path_factory.mktemp("tld_cache")),
+        suffix_list_urls=(PUBLIC_SUFFIX_LIST_FILE.as_uri(),),
+        fallback_to_snapshot=False,
+    )
+
+
+@pytest.fixture(scope="module")
+def extractor(tmp_path_factory):
+    return PublicSuffixExtractor(
+        cache_directory=tmp_path_factory.mktemp("suffix_cache")
+    )
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_split_equal_to_tldextract(tld_extract, extractor, url):
+    expected = tld_extract(url)
+
+    assert extractor.split(url) == (
+        expected.subdomain,
+        expected.domain,
+        expected.suffix,
+    )
+
+
+def test_trie_from_cache_equal_to_compiled(extractor):
+    # de tweede extractor leest de trie uit de pickle die de eerste geschreven heeft
+    cached_extractor = PublicSuffixExtractor(cache_directory=extractor.cache_directory)
+
+    assert cached_extractor.trie == extractor.trie
+    assert [cached_extractor.split(url) for url in URLS] == [
+        extractor.split(url) for url in URLS
+    ]
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+
+from internetnl_domain_analyse.utils import (
+    apply_translation_plan,
+    compile_translation_plan,
+    fill_booleans,
+)
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+TRANSLATIONS = dict(
+    passed_failed=dict(passed=1, failed=0),
+    good_bad=dict(good=1, bad=0),
+    # een vertaling met getallen als key wordt ook op de al vertaalde waardes toegepast
+    ja_nee={"ja": 1, "nee": 0, 1: 0.5},
+    nans=dict(nan=0),
+)
+
+
+def fill_booleans_row_wise(tables, translations, variables):
+    """De oorspronkelijke fill_booleans met een masker per vertaling en kolom"""
+    for col in tables.columns:
+        convert_to_bool = True
+        try:
+            var_type = variables.loc[col, "type"]
+        except KeyError:
+            pass
+        else:
+            if var_type == "dict":
+                convert_to_bool = False
+
+        if convert_to_bool:
+            unique_values = tables[col].unique()
+            if len(unique_values) <= 3:
+                for trans_key, trans_prop in translations.items():
+                    bool_keys = set(trans_prop.keys())
+                    intersection = bool_keys.intersection(unique_values)
+                    if intersection:
+                        for key, val in trans_prop.items():
+                            mask = tables[col] == key
+                            if any(mask):
+                                tables.loc[mask, col] = float(val)
+    return tables
+
+
+@pytest.fixture
+def tables():
+    return pd.DataFrame(
+        {
+            "tests_a": ["passed", "failed", np.nan, "passed", "failed", "passed"],
+            "tests_b": ["good", "bad", "good", "good", "bad", "bad"],
+            # een onbekende waarde blijft staan
+            "tests_c": ["passed", "onbekend", "passed", np.nan, "passed", "onbekend"],
+            # meer dan drie waardes wordt niet vertaald
+            "tests_d": ["passed", "failed", "good", "bad", "passed", "good"],
+            # gemengde types als key
+            "tests_e": ["ja", 1, np.nan, "ja", 1, "ja"],
+            "tests_f": ["nan", "ja", "nee", "nan", "ja", "nee"],
+            "getal": [0.0, 1.0, np.nan, 1.0, 0.0, 1.0],
+            "nooit": [np.nan] * 6,
+            "suffix": ["passed", "failed", "passed", "passed", "failed", "passed"],
+        },
+        index=pd.Index([f"be{number}" for number in range(6)], name="be_id"),
+        dtype=object,
+    ).astype(dict(getal=float, nooit=float))
+
+
+@pytest.fixture
+def variables():
+    return pd.DataFrame(
+        dict(type=["bool", "bool", "bool", "dict"]),
+        index=["tests_a", "tests_b", "getal", "suffix"],
+    )
+
+
+def test_fill_booleans_equals_row_wise(tables, variables):
+    expected = fill_booleans_row_wise(tables.copy(), TRANSLATIONS, variables)
+
+    result = fill_booleans(tables.copy(), TRANSLATIONS, variables)
+
+    pd.testing.assert_frame_equal(result, expected)
+    # de dict kolom en de kolom met te veel waardes zijn niet vertaald
+    pd.testing.assert_series_equal(result["suffix"], tables["suffix"])
+    pd.testing.assert_series_equal(result["tests_d"], tables["tests_d"])
+    assert result["tests_c"].tolist()[:2] == [1.0, "onbekend"]
+
+
+def translate_row_wise(tables, variables):
+    """De oorspronkelijke vertaling in read_data, die per kolom de settings opzoekt"""
+    for column in tables:
+        try:
+            var_props = variables.loc[column, :]
+        except KeyError:
+            continue
+
+        var_type = var_props.get("type")
+        var_translate = var_props.get("translateopts")
+
+        if var_translate is not None:
+            trans = yaml.load(str(var_translate), Loader=yaml.Loader)
+            for nan_string in ("na", "nan", "NaN"):
+                if nan_string in trans.keys():
+                    is_na = tables[column].isna()
+                    if is_na.any():
+                        tables[column] = tables[column].fillna(nan_string)
+
+            unique_values = set(tables[column].unique())
+            vals_to_translate = set(trans.keys()).intersection(unique_values)
+            if vals_to_translate:
+                tables[column] = tables[column].map(trans)
+
+        if var_type == "dict":
+            tables[column] = tables[column].astype("category")
+        elif var_type in ("bool", "percentage", "float"):
+            tables[column] = tables[column].astype("float64")
+    return tables
+
+
+@pytest.fixture
+def translated_variables():
+    variables = {
+        # een onbekende waarde en NaN worden NaN
+        "tests_a": ("bool", dict(ja=1, nee=0)),
+        # met een na vertaling wordt NaN eerst 'na'
+        "tests_b": ("bool", dict(ja=1, nee=0, na=-1)),
+        # gemengde types als key: 1 en '1' zijn verschillende waardes, 2 wordt NaN
+        "tests_c": ("int", {1: 10, "1": 20}),
+        # geen van de waardes staat in de vertaling
+        "tests_d": ("int", dict(ja=1)),
+        "suffix": ("dict", dict(nl=1, com=2, eu=3, rest=4)),
+        "percentage": ("percentage", None),
+        "score": ("float", None),
+        "naam": ("str", None),
+    }
+    return pd.DataFrame(
+        {
+            "type": {key: var_type for key, (var_type, _) in variables.items()},
+            "translateopts": {key: trans for key, (_, trans) in variables.items()},
+        }
+    )
+
+
+@pytest.fixture
+def untranslated_tables():
+    return pd.DataFrame(
+        {
+            "tests_a": ["ja", "nee", np.nan, "ja", "onbekend", "nee"],
+            "tests_b": ["ja", np.nan, "nee", np.nan, "ja", "ja"],
+            "tests_c": [1, "1", 2, np.nan, 1, "1"],
+            "tests_d": ["x", "y", "x", np.nan, "y", "x"],
+            "suffix": ["nl", "com", "eu", "nl", "rest", np.nan],
+            "percentage": [10, 20, 30, 40, 50, 60],
+            "score": ["1.5", "2", np.nan, "0", "3.25", "1"],
+            "naam": ["a", "b", np.nan, "c", "d", "e"],
+            # niet in de settings
+            "ongebruikt": ["ja", "nee", "ja", "nee", "ja", "nee"],
+        },
+        index=pd.Index([f"be{number}" for number in range(6)], name="be_id"),
+        dtype=object,
+    )
+
+
+def test_translation_plan_equals_row_wise(untranslated_tables, translated_variables):
+    expected = translate_row_wise(untranslated_tables.copy(), translated_variables)
+
+    translation_plan = compile_translation_plan(translated_variables)
+    result = apply_translation_plan(untranslated_tables.copy(), translation_plan)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result["tests_b"].tolist() == [1.0, -1.0, 0.0, -1.0, 1.0, 1.0]
+    # waardes zonder vertaling worden net als voorheen NaN
+    assert result["tests_c"].tolist()[:2] == [10, 20]
+    assert np.isnan(result["tests_c"].iloc[2])
+    pd.testing.assert_series_equal(
+        result["ongebruikt"], untranslated_tables["ongebruikt"]
+    )
+
+
+def test_translation_plan(translated_variables):
+    translation_plan = compile_translation_plan(translated_variables)
+
+    assert translation_plan["tests_b"] == dict(
+        translation=dict(ja=1, nee=0, na=-1), na_value="na", dtype="float64"
+    )
+    assert translation_plan["tests_c"]["translation"] == {1: 10, "1": 20}
+    assert translation_plan["suffix"]["dtype"] == "category"
+    assert translation_plan["naam"] == dict(translation=None, na_value=None, dtype=None)
@@ -0,0 +1,141 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import internetnl_domain_analyse.domain_analyse_classes as domain_analyse_classes
+from internetnl_domain_analyse.domain_analyse_classes import DomainAnalyser
+
+from conftest import write_tables
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+
+@pytest.fixture
+def recorded_variables(monkeypatch):
+    """
+    Houd per breakdown bij welke variabelen uit de per variabele cache komen en welke
+    variabelen de batch engine opnieuw berekent
+    """
+    recorded = dict(cached=dict(), calculated=set())
+
+    load_variable_caches = DomainAnalyser.load_variable_caches
+
+    def recording_load_variable_caches(self, group_by_per_file_base):
+        load_variable_caches(self, group_by_per_file_base)
+        for file_base, (_, cached_variables) in self.variable_caches.items():
+            recorded["cached"][file_base] = set(cached_variables)
+
+    calculate_batch_statistics = domain_analyse_classes.calculate_batch_statistics
+
+    def recording_calculate_batch_statistics(*args, batch_variables, **kwargs):
+        recorded["calculated"].update(batch_variables)
+        return calculate_batch_statistics(
+            *args, batch_variables=batch_variables, **kwargs
+        )
+
+    roll_up = domain_analyse_classes.StatisticsCube.roll_up
+
+    def recording_roll_up(self, group_by, batch_variables):
+        recorded["calculated"].update(batch_variables)
+        return roll_up(self, group_by, batch_variables)
+
+    monkeypatch.setattr(
+        DomainAnalyser, "load_variable_caches", recording_load_variable_caches
+    )
+    monkeypatch.setattr(
+        domain_analyse_classes,
+        "calculate_batch_statistics",
+        recording_calculate_batch_statistics,
+    )
+    monkeypatch.setattr(
+        domain_analyse_classes.StatisticsCube, "roll_up", recording_roll_up
+    )
+    return recorded
+
+
+def assert_same_histograms(histograms, expected):
+    assert set(histograms) == set(expected)
+    for group, histogram in expected.items():
+        if histogram is None:
+            assert histograms[group] is None
+            continue
+        for values, expected_values in zip(histograms[group], histogram):
+            np.testing.assert_allclose(values, expected_values, rtol=1e-12)
+
+
+def assert_same_as_cold_run(analyser, cold):
+    assert set(analyser.all_stats_per_format) == set(cold.all_stats_per_format)
+    for file_base, stat_df in cold.all_stats_per_format.items():
+        pd.testing.assert_frame_equal(
+            analyser.all_stats_per_format[file_base], stat_df, rtol=1e-12
+        )
+        all_hist = analyser.all_hist_per_format[file_base]
+        assert set(all_hist) == set(cold.all_hist_per_format[file_base])
+        for var_key, histograms in cold.all_hist_per_format[file_base].items():
+            assert_same_histograms(all_hist[var_key], histograms)
+
+
+def run_again(make_analyser, settings, recorded_variables):
+    """
+    Draai de analyser nog een keer op de caches van de vorige run. Een koude run met
+    dezelfde settings in een eigen cache directory is de referentie
+
+    Returns:
+        tuple: de warme run, de koude run, de variabelen uit de cache per breakdown en
+            de variabelen die opnieuw berekend zijn
+    """
+    recorded_variables["cached"].clear()
+    recorded_variables["calculated"].clear()
+    warm = make_analyser(settings)
+    cached = dict(recorded_variables["cached"])
+    calculated = set(recorded_variables["calculated"])
+    cold = make_analyser(settings, cache_directory_base_name="cold")
+    return warm, cold, cached, calculated
+
+
+def test_changed_settings_recompute_only_that_variable(
+    make_analyser, analyser_settings, recorded_variables
+):
+    make_analyser(analyser_settings)
+    analyser_settings["variables"]["tests"]["tests_ab"]["report_number"] = True
+
+    warm, cold, cached, calculated = run_again(
+        make_analyser, analyser_settings, recorded_variables
+    )
+
+    statistic_variables = set(cold.all_stats_per_format["per_gk"].columns)
+    for file_base in ("per_gk", "per_sbi", "per_gk_zzp"):
+        assert cached[file_base] == statistic_variables - {"tests_ab"}
+    assert calculated == {"tests_ab"}
+    assert_same_as_cold_run(warm, cold)
+
+
+def test_changed_data_recomputes_only_the_variables_of_that_column(
+    make_analyser, analyser_settings, recorded_variables, microdata_directory
+):
+    make_analyser(analyser_settings)
+
+    # dezelfde tabel met andere uitslagen voor test b
+    internet_nl_filename = microdata_directory / "internet_nl.sqlite"
+    with sqlite3.connect(internet_nl_filename) as connection:
+        status = pd.read_sql("select * from status", connection)
+    status["tests_b_verdict"] = np.where(
+        status["tests_b_verdict"] == "passed", "failed", "passed"
+    )
+    write_tables(internet_nl_filename, dict(status=status))
+
+    warm, cold, cached, calculated = run_again(
+        make_analyser, analyser_settings, recorded_variables
+    )
+
+    # tests_ab is afgeleid van tests_b_verdict en moet dus ook opnieuw
+    changed_variables = {"tests_b_verdict", "tests_ab"}
+    statistic_variables = set(cold.all_stats_per_format["per_gk"].columns)
+    for file_base in ("per_gk", "per_sbi", "per_gk_zzp"):
+        assert cached[file_base] == statistic_variables - changed_variables
+    assert calculated == changed_variables
+    assert_same_as_cold_run(warm, cold)
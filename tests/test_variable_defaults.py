@@ -0,0 +1,208 @@
+import logging
+
+import pandas as pd
+import pytest
+
+from internetnl_domain_analyse.utils import impose_variable_defaults
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+_logger = logging.getLogger(__name__)
+
+MODULE_INFO = dict(
+    domeinnamen=dict(include=True, label="Verdeling"),
+    tests=dict(include=False, label="Test"),
+    # een module zonder label en include vlag
+    score=dict(),
+)
+
+VARIABLES = dict(
+    domeinnamen=dict(
+        suffix=dict(
+            type="dict",
+            translate=dict(nl=1, com=2, eu=3, rest=4),
+            options={1: ".nl", 2: ".com", 3: ".eu", 4: "overig"},
+            label="Suffix",
+        ),
+    ),
+    tests=dict(
+        tests_a_verdict=dict(type="bool", filter="tests_b_verdict > 0"),
+        # gemengde types als key van de vertaling en de options
+        tests_b=dict(
+            original_name="tests_b_verdict",
+            translate={1: 0, "ja": 1, "nee": 0},
+            options={1: "ja", "0": "nee"},
+            check=True,
+            report_number=True,
+        ),
+        tests_ab=dict(
+            type="float",
+            eval="tests_a_verdict + tests_b",
+            gewicht="ratio_units",
+            info_per_breakdown=dict(per_gk=dict(label="per grootteklasse")),
+        ),
+    ),
+    score=dict(
+        # een lege waarde in een bool kolom
+        percentage=dict(type="percentage", optional=None, unit="%"),
+    ),
+)
+
+
+def impose_variable_defaults_row_wise(
+    variables, module_info: dict = None, module_key: str = None
+):
+    """De oorspronkelijke impose_variable_defaults die iedere waarde met loc zet"""
+    variables["type"] = "bool"
+    variables["section"] = ""
+    variables["fixed"] = False
+    variables["original_name"] = variables.index.values
+    variables["label"] = ""
+    variables["question"] = ""
+    variables["module_label"] = ""
+    variables["module_include"] = True
+    variables["check"] = False
+    variables["optional"] = False
+    variables["no_impute"] = False
+    variables["info_per_breakdown"] = None
+
+    variables["gewicht"] = "units"
+    variables["keep_options"] = False
+    variables["eval"] = None
+    variables["unit"] = None
+
+    dummy = "dummy"
+    options = {dummy: dummy}
+    filter_dummy = {dummy: dummy}
+    translate = {dummy: dummy}
+    for var_key, var_row in variables.iterrows():
+        var_prop = var_row["properties"]
+        for name in (
+            "type",
+            "fixed",
+            "original_name",
+            "question",
+            "label",
+            "check",
+            "optional",
+            "gewicht",
+            "no_impute",
+            "info_per_breakdown",
+            "report_number",
+            "section",
+            "keep_options",
+            "eval",
+            "unit",
+        ):
+            try:
+                variables.loc[var_key, name] = var_prop[name]
+            except ValueError:
+                variables.at[var_key, name] = var_prop.get(name)
+            except KeyError:
+                pass
+        try:
+            var_options = var_prop["options"]
+        except KeyError:
+            options[var_key] = None
+        else:
+            options[var_key] = var_options
+
+        try:
+            var_filter = var_prop["filter"]
+        except KeyError:
+            filter_dummy[var_key] = None
+        else:
+            filter_dummy[var_key] = var_filter
+
+        try:
+            var_translate = var_prop["translate"]
+        except KeyError:
+            translate[var_key] = None
+        else:
+            translate[var_key] = var_translate
+
+        if module_info is not None:
+            module_name = var_row[module_key]
+            try:
+                module_label = module_info[module_name]["label"]
+            except KeyError:
+                _logger.warning("failed to get the label from {}".format(module_name))
+            else:
+                variables.loc[var_key, "module_label"] = module_label
+            try:
+                module_include = module_info[module_name]["include"]
+            except KeyError:
+                _logger.warning(
+                    "failed to get the include flag from {}".format(module_name)
+                )
+            else:
+                variables.loc[var_key, "module_include"] = module_include
+
+    opt_df = pd.DataFrame.from_dict(options, orient="index").rename(
+        columns={0: "options"}
+    )
+    opt_df = opt_df[opt_df.index != dummy]
+
+    filter_df = pd.DataFrame.from_dict(filter_dummy, orient="index").rename(
+        columns={0: "filter"}
+    )
+    filter_df = filter_df[filter_df.index != dummy]
+
+    trans_df = pd.DataFrame.from_dict(translate, orient="index").rename(
+        columns={0: "translateopts"}
+    )
+    trans_df = trans_df[trans_df.index != dummy]
+
+    variables.drop(["properties"], inplace=True, axis=1)
+
+    variables = pd.concat([variables, opt_df], axis=1)
+    variables = pd.concat([variables, filter_df], axis=1)
+    variables = pd.concat([variables, trans_df], axis=1)
+
+    is_dict = variables["type"] == "dict"
+    if (is_dict & variables["options"].isnull()).sum() > 0:
+        raise ValueError("Found a dict with no options defined")
+
+    return variables
+
+
+def make_variables_df(variables):
+    """De variabelen tabel zoals variable_dict2df die maakt"""
+    var_df = pd.DataFrame.from_dict(variables).unstack().dropna()
+    var_df = var_df.reset_index()
+    var_df = var_df.rename(
+        columns={"level_0": "module", "level_1": "variable", 0: "properties"}
+    )
+    return var_df.set_index("variable", drop=True)
+
+
+@pytest.mark.parametrize("module_info", [MODULE_INFO, None])
+def test_impose_variable_defaults_equals_row_wise(module_info):
+    expected = impose_variable_defaults_row_wise(
+        make_variables_df(VARIABLES), module_info=module_info, module_key="module"
+    )
+
+    result = impose_variable_defaults(
+        make_variables_df(VARIABLES), module_info=module_info, module_key="module"
+    )
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_without_report_number():
+    variables = dict(tests=dict(tests_a_verdict=dict(type="bool")))
+    expected = impose_variable_defaults_row_wise(make_variables_df(variables))
+
+    result = impose_variable_defaults(make_variables_df(variables))
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert "report_number" not in result.columns
+
+
+def test_dict_without_options():
+    variables = dict(domeinnamen=dict(suffix=dict(type="dict")))
+
+    with pytest.raises(ValueError, match="no options"):
+        impose_variable_defaults(make_variables_df(variables))
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from internetnl_domain_analyse.verdict_matrix import VerdictMatrix
+
+__author__ = "Eelco van Vliet"
+__copyright__ = "Eelco van Vliet"
+__license__ = "MIT"
+
+# geen veelvoud van 8, zodat ook de opvulling van de laatste byte getest wordt
+N_RECORDS = 1003
+
+COLUMNS = ["http", "cert", "tls", "dane", "altijd"]
+
+
+@pytest.fixture
+def dataframe():
+    """Verdicts als in de microdata: alleen 1 is geslaagd, ook 0, 2 en nan komen voor"""
+    rng = np.random.default_rng(3)
+    base = rng.random(N_RECORDS)
+    data = {
+        column: np.where((rng.random(N_RECORDS) + base) / 2 < threshold, 1.0, 0.0)
+        for column, threshold in zip(COLUMNS, [0.3, 0.5, 0.6, 0.2])
+    }
+    data["altijd"] = np.ones(N_RECORDS)
+    dataframe = pd.DataFrame(
+        data, index=pd.Index(np.arange(N_RECORDS) * 7, name="be_id")
+    )
+    dataframe.iloc[::13, 0] = np.nan
+    dataframe.iloc[::17, 1] = 2
+    return dataframe
+
+
+@pytest.fixture
+def passed(dataframe):
+    return dataframe[COLUMNS] == 1
+
+
+def test_to_frame(dataframe, passed):
+    verdicts = VerdictMatrix(dataframe, COLUMNS)
+
+    pd.testing.assert_frame_equal(verdicts.to_frame(), passed)
+
+
+def test_column_counts(dataframe, passed):
+    verdicts = VerdictMatrix(dataframe, COLUMNS)
+    mask = np.arange(N_RECORDS) % 3 == 0
+
+    pd.testing.assert_series_equal(verdicts.column_counts(), passed.sum())
+    pd.testing.assert_series_equal(verdicts.column_counts(mask), passed[mask].sum())
+
+
+def test_column_counts_per_group(dataframe, passed):
+    verdicts = VerdictMatrix(dataframe, COLUMNS)
+    codes = np.arange(N_RECORDS) % 4
+
+    counts = verdicts.column_counts_per_group(codes, n_groups=5)
+
+    expected = passed.groupby(codes).sum().reindex(range(5), fill_value=0)
+    np.testing.assert_array_equal(counts.to_numpy(), expected.to_numpy())
+    assert list(counts.columns) == COLUMNS
+
+
+def test_record_counts(dataframe, passed):
+    verdicts = VerdictMatrix(dataframe, COLUMNS)
+
+    pd.testing.assert_series_equal(verdicts.record_counts(), passed.sum(axis=1))
+    pd.testing.assert_series_equal(
+        verdicts.record_counts(["tls", "http"]), passed[["tls", "http"]].sum(axis=1)
+    )
+
+
+def test_co_occurrence(dataframe, passed):
+    verdicts = VerdictMatrix(dataframe, COLUMNS)
+
+    values = passed.to_numpy(dtype=np.int64)
+    np.testing.assert_array_equal(verdicts.co_occurrence(), values.T @ values)
+
+
+def test_correlations_equal_to_pandas(dataframe, passed):
+    verdicts = VerdictMatrix(dataframe, COLUMNS)
+
+    correlations = verdicts.correlations()
+
+    # de kolom die altijd geslaagd is heeft geen variatie en geeft net als pandas NaN
+    pd.testing.assert_frame_equal(correlations, passed.astype(float).corr(), atol=1e-12)
+    assert correlations["altijd"].isna().all()